@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, TestResult
+from .models import UserProfile, TestResult, PredictionJob, DailyScreeningStats
 
 # Register the UserProfile model so you can change roles
 @admin.register(UserProfile)
@@ -19,5 +19,30 @@ class UserProfileAdmin(admin.ModelAdmin):
 # Register the TestResult model to see patient scans
 @admin.register(TestResult)
 class TestResultAdmin(admin.ModelAdmin):
-    list_display = ('patient', 'result', 'confidence_score', 'date_tested')
-    list_filter = ('result', 'risk_level', 'date_tested')
\ No newline at end of file
+    list_display = ('patient', 'result', 'confidence_score', 'risk_level', 'composite_score', 'date_tested')
+    list_filter = ('result', 'risk_level', 'date_tested')
+    # Derived on save from result, confidence and symptoms
+    readonly_fields = ('risk_level', 'symptom_score', 'composite_score')
+
+# Register PredictionJob to inspect the async prediction queue
+@admin.register(PredictionJob)
+class PredictionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'patient', 'kind', 'status', 'attempts', 'not_before', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    exclude = ('image_data',)
+    actions = ['retry_jobs']
+
+    @admin.action(description='Retry selected failed jobs')
+    def retry_jobs(self, request, queryset):
+        # Only jobs that still have their image (failed upload jobs keep it)
+        retried = queryset.filter(status='failed').exclude(image_data=b'').update(
+            status='pending', attempts=0, not_before=None, finished_at=None
+        )
+        self.message_user(request, f"{retried} job(s) queued again")
+
+# Summary table behind the dashboard totals (maintained automatically)
+@admin.register(DailyScreeningStats)
+class DailyScreeningStatsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'state', 'city', 'result', 'risk_level', 'count')
+    list_filter = ('result', 'risk_level', 'state')
+    date_hierarchy = 'date'
@@ -1,11 +1,218 @@
+import hashlib
+import threading
+import time
+
+import jwt
 from rest_framework import authentication, exceptions
-from supabase import create_client, Client
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from .cache_utils import TTLCache
+from .instrumentation import span
 from .models import UserProfile
+from .supabase_client import get_supabase
+
+# The only algorithms accepted, per key source. The token's own header is
+# attacker-controlled, so it may pick between these but never widen them.
+SECRET_ALGORITHMS = ('HS256',)
+JWKS_ALGORITHMS = ('ES256', 'RS256')
+
+# Verified identities (uid, email) keyed by sha256(token); entries never outlive the token's exp
+_token_cache = TTLCache(
+    maxsize=getattr(settings, 'AUTH_CACHE_SIZE', 4096),
+    ttl=getattr(settings, 'AUTH_CACHE_TTL', 300),
+)
+
+# User + UserProfile pairs live in the shared Django cache (AUTH_USER_CACHE_ALIAS),
+# stored with their uid's version. Profile saves and deletes bump the version
+# after commit (see signals.py), so every worker stops serving the old pair at
+# once. As with the response cache, a process-local LocMemCache would miss the
+# other processes' bumps and is refused unless AUTH_USER_CACHE_ALLOW_LOCAL; each
+# request then loads the pair in its one joined query. Users without a profile
+# are never cached: their next request is likely the one after signing up.
+_warned_local = False
+
+_jwks_client = None
+_jwks_lock = threading.Lock()
+
+
+class LocalVerificationUnavailable(Exception):
+    """The token can't be checked locally (no secret configured, JWKS unreachable)."""
+
+
+def _get_jwks_client():
+    global _jwks_client
+    if _jwks_client is None:
+        with _jwks_lock:
+            if _jwks_client is None:
+                url = getattr(settings, 'SUPABASE_JWKS_URL', None) or f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json"
+                _jwks_client = jwt.PyJWKClient(
+                    url,
+                    cache_keys=True,
+                    lifespan=getattr(settings, 'SUPABASE_JWKS_CACHE_SECONDS', 600),
+                    timeout=getattr(settings, 'SUPABASE_TIMEOUT', 10.0),
+                )
+    return _jwks_client
+
+def verify_token_locally(token):
+    """
+    Verifies a Supabase access token without a network round-trip.
+    HS256 tokens are checked with SUPABASE_JWT_SECRET; asymmetric (ES256/RS256)
+    tokens with the project's JWKS, fetched once and cached.
+    Returns (uid, email, exp). Raises jwt.InvalidTokenError for bad/expired tokens.
+    """
+    alg = jwt.get_unverified_header(token).get('alg', '')
+
+    if alg in SECRET_ALGORITHMS:
+        key = getattr(settings, 'SUPABASE_JWT_SECRET', None)
+        if not key:
+            raise LocalVerificationUnavailable("SUPABASE_JWT_SECRET is not set")
+    elif alg in JWKS_ALGORITHMS:
+        try:
+            signing_key = _get_jwks_client().get_signing_key_from_jwt(token)
+        except jwt.PyJWKClientError as e:
+            raise LocalVerificationUnavailable(f"JWKS lookup failed: {e}") from e
+        # The key decides its algorithm, not the header
+        if signing_key.algorithm_name != alg:
+            raise jwt.InvalidAlgorithmError(f"token alg {alg} does not match its key ({signing_key.algorithm_name})")
+        key = signing_key.key
+    else:
+        raise jwt.InvalidAlgorithmError(f"algorithm {alg or 'none'} is not accepted")
+
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=[alg],
+        audience=getattr(settings, 'SUPABASE_JWT_AUDIENCE', 'authenticated'),
+        leeway=getattr(settings, 'SUPABASE_JWT_LEEWAY', 10),
+        options={"require": ["exp", "sub"]},
+    )
+    return claims['sub'], claims.get('email', ''), claims['exp']
+
+def verify_token_remotely(token):
+    """Asks Supabase Auth who the token belongs to. Returns (uid, email, exp or None)."""
+    # Pooled, shared with storage
+    user_data = get_supabase().auth.get_user(token)
+    if not user_data:
+        raise exceptions.AuthenticationFailed('Invalid token')
+
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get('exp')
+    except jwt.InvalidTokenError:
+        exp = None
+    return user_data.user.id, user_data.user.email, exp
+
+def resolve_token(token):
+    """Local verification first; remote get_user when it's unavailable (if allowed)."""
+    if getattr(settings, 'SUPABASE_JWT_VERIFY_LOCALLY', True):
+        try:
+            return verify_token_locally(token)
+        except LocalVerificationUnavailable as e:
+            if not getattr(settings, 'SUPABASE_AUTH_REMOTE_FALLBACK', True):
+                raise exceptions.AuthenticationFailed(f'Authentication failed: {e}')
+            print(f"⚠️ DEBUG: Local JWT verification unavailable ({e}); asking Supabase")
+        except jwt.ExpiredSignatureError:
+            raise exceptions.AuthenticationFailed('Token expired')
+        except jwt.InvalidTokenError as e:
+            raise exceptions.AuthenticationFailed(f'Invalid token: {e}')
+
+    return verify_token_remotely(token)
+
+def load_user(uid, email):
+    """
+    Returns the Django User for a Supabase uid with its profile already attached,
+    in one joined query (two when the user is new).
+    """
+    user = User.objects.select_related('profile').filter(username=uid).first()
+    if user is None:
+        user, created = User.objects.get_or_create(username=uid, defaults={'email': email})
+        if created:
+            print(f"✅ DEBUG: New Django User Created: {email} ({uid})")
+        # Nothing can point at a brand-new user; cache the miss so
+        # `user.profile` doesn't query again
+        User.profile.related.set_cached_value(user, None)
+    return user
+
+def _user_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+def user_cache_enabled():
+    global _warned_local
+    if getattr(settings, 'AUTH_USER_CACHE_TTL', 30) <= 0:
+        return False
+    if isinstance(_user_cache(), LocMemCache) and not getattr(settings, 'AUTH_USER_CACHE_ALLOW_LOCAL', False):
+        if not _warned_local:
+            _warned_local = True
+            print("⚠️ Auth user cache disabled: AUTH_USER_CACHE_ALIAS is process-local (set REDIS_URL)")
+        return False
+    return True
+
+def _user_keys(uid):
+    return f"auth-user:{uid}", f"auth-user-ver:{uid}"
+
+def get_user(uid, email):
+    """
+    The User (with profile) for a Supabase uid: from the shared cache when its
+    entry is at the uid's current version, otherwise load_user().
+    Every call returns its own copies, so requests never share instances.
+    """
+    if not user_cache_enabled():
+        return load_user(uid, email)
+
+    cache = _user_cache()
+    entry_key, version_key = _user_keys(uid)
+    try:
+        found = cache.get_many([entry_key, version_key])
+        version = found.get(version_key)
+        if version is None:
+            # Never restart at a number an earlier (evicted) version may have used
+            cache.add(version_key, time.time_ns(), timeout=None)
+            version = cache.get(version_key)
+        entry = found.get(entry_key)
+    except Exception as e:
+        print(f"⚠️ Auth user cache unavailable: {e}")
+        return load_user(uid, email)
+
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    # Read before loading: a save that races this load bumps past `version`
+    user = load_user(uid, email)
+    try:
+        user.profile
+    except UserProfile.DoesNotExist:
+        return user
+    try:
+        cache.set(entry_key, (version, user), timeout=getattr(settings, 'AUTH_USER_CACHE_TTL', 30))
+    except Exception as e:
+        print(f"⚠️ Auth user cache unavailable: {e}")
+    return user
+
+def invalidate_user(uid):
+    """Moves the uid to a new version, so no process serves its cached pair again."""
+    if not user_cache_enabled():
+        return
+    cache = _user_cache()
+    _, version_key = _user_keys(uid)
+    try:
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, time.time_ns(), timeout=None)
+    except Exception as e:
+        print(f"⚠️ Auth user cache unavailable: {e}")
+
+def clear_user_cache():
+    """Forgets this process's verified tokens (cached users are dropped with invalidate_user)."""
+    _token_cache.clear()
 
 class SupabaseAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
+        with span('auth'):
+            return self._authenticate(request)
+
+    def _authenticate(self, request):
         # 1. Check if Header exists
         auth_header = request.headers.get('Authorization')
         if not auth_header:
@@ -15,33 +222,29 @@ class SupabaseAuthentication(authentication.BaseAuthentication):
         try:
             # 2. Extract Token
             token = auth_header.split(' ')[1]
-            # print(f"❌ DEBUG: Token received: {token[:10]}...") # Uncomment to see partial token
-
-            # 3. Connect to Supabase
-            supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-            
-            # 4. Verify User
-            print("⏳ DEBUG: Verifying token with Supabase...")
-            user_data = supabase.auth.get_user(token)
-            
-            if not user_data:
-                print("❌ DEBUG: Supabase returned no user data")
-                raise exceptions.AuthenticationFailed('Invalid token')
-            
-            # 5. Get User Details
-            uid = user_data.user.id
-            email = user_data.user.email
-            print(f"✅ DEBUG: Supabase User Found: {email} ({uid})")
-
-            # 6. Get or Create Django User
-            user, created = User.objects.get_or_create(username=uid, defaults={'email': email})
-            if created:
-                print("✅ DEBUG: New Django User Created")
-            else:
-                print("✅ DEBUG: Existing Django User Found")
-                
-            return (user, None)
-            
+
+            # 3. Previously verified? (keyed by hash so raw tokens aren't kept in memory)
+            cache_key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+            identity = _token_cache.get(cache_key)
+            if identity is None:
+                # 4. Verify Token (locally when possible)
+                uid, email, exp = resolve_token(token)
+                identity = (uid, email)
+
+                # Cache until the token expires (or AUTH_CACHE_TTL, whichever is sooner)
+                ttl = _token_cache.ttl
+                if exp:
+                    ttl = min(ttl, exp - time.time())
+                if ttl > 0:
+                    _token_cache.set(cache_key, identity, ttl=ttl)
+
+            # 5. Django User and its profile, resolved together
+            uid, email = identity
+            return (get_user(uid, email), None)
+
+        except exceptions.AuthenticationFailed as e:
+            print(f"❌ DEBUG: Auth Error: {e.detail}")
+            raise
         except Exception as e:
             print(f"❌ DEBUG: Auth Error: {str(e)}")
-            raise exceptions.AuthenticationFailed(f'Authentication failed: {str(e)}')
\ No newline at end of file
+            raise exceptions.AuthenticationFailed(f'Authentication failed: {str(e)}')
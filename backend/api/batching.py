@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Groups concurrent inference calls into a single model forward pass.
+
+    Callers submit an (n, H, W, C) array and block on the returned Future.
+    A single worker thread drains the queue and never runs more than
+    `max_batch_size` rows through the model at once. A request that finds the
+    queue otherwise empty runs immediately (a sync gunicorn worker never has
+    company, so waiting would be pure latency); once several are queued, the
+    worker waits at most `max_wait_ms` for more before running them together.
+
+    With `tagged=True`, predict_fn returns (predictions, tag) and each caller's
+    Future resolves to (its rows, tag): e.g. the version of the model that
+    actually ran the batch.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=10, tagged=False):
+        self.predict_fn = predict_fn
+        self.tagged = tagged
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    # --- Public API ---
+
+    def submit(self, batch):
+        """Queues an (n, ...) array and returns a Future of the (n, classes) predictions (and tag)."""
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append((batch, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def predict(self, batch, timeout=None):
+        return self.submit(batch).result(timeout=timeout)
+
+    def stats(self):
+        """Snapshot of batch-size and queue-wait figures since start (or last reset)."""
+        with self._stats_lock:
+            batches = self._batches
+            waits = sorted(self._waits)
+            return {
+                "batches": batches,
+                "requests": self._requests,
+                "rows": self._rows,
+                "avg_batch_size": round(self._rows / batches, 2) if batches else 0.0,
+                "max_batch_size_seen": self._max_rows,
+                "batch_size_histogram": dict(sorted(self._size_hist.items())),
+                "queue_wait_ms": {
+                    "p50": _percentile(waits, 50),
+                    "p95": _percentile(waits, 95),
+                    "p99": _percentile(waits, 99),
+                    "max": round(waits[-1], 3) if waits else 0.0,
+                },
+                "config": {
+                    "max_batch_size": self.max_batch_size,
+                    "max_wait_ms": self.max_wait * 1000.0,
+                },
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._reset_stats()
+
+    # --- Worker ---
+
+    def _ensure_worker(self):
+        # Started lazily so that forked gunicorn workers each get their own thread.
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="ml-micro-batcher", daemon=True)
+            self._worker.start()
+
+    def _collect(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            items = [self._queue.popleft()]
+            if not self._queue:
+                # Nobody else waiting: no reason to hold this one back
+                return items
+            rows = len(items[0][0])
+            deadline = time.perf_counter() + self.max_wait
+
+            while rows < self.max_batch_size:
+                if not self._queue:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                    continue
+                # Never split a caller's rows across two forward passes.
+                if rows + len(self._queue[0][0]) > self.max_batch_size:
+                    break
+                item = self._queue.popleft()
+                items.append(item)
+                rows += len(item[0])
+            return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            started = time.perf_counter()
+            waits = [(started - enqueued) * 1000.0 for _, _, enqueued in items]
+
+            try:
+                if len(items) == 1:
+                    batch = items[0][0]
+                else:
+                    batch = np.concatenate([arr for arr, _, _ in items], axis=0)
+                output = self.predict_fn(batch)
+                tag = None
+                if self.tagged:
+                    output, tag = output
+                predictions = np.asarray(output)
+            except Exception as e:
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for arr, future, _ in items:
+                rows = predictions[offset:offset + len(arr)]
+                future.set_result((rows, tag) if self.tagged else rows)
+                offset += len(arr)
+
+            self._record(len(items), len(batch), waits)
+
+    # --- Stats ---
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._requests = 0
+        self._rows = 0
+        self._max_rows = 0
+        self._size_hist = {}
+        # Bounded so long-running processes don't grow without limit
+        self._waits = deque(maxlen=10000)
+
+    def _record(self, requests, rows, waits):
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += requests
+            self._rows += rows
+            self._max_rows = max(self._max_rows, rows)
+            self._size_hist[rows] = self._size_hist.get(rows, 0) + 1
+            self._waits.extend(waits)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return round(sorted_values[idx], 3)
@@ -0,0 +1,130 @@
+import json
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+
+# Shared helpers for the `manage.py benchmark_*` commands.
+
+def int_list(value):
+    """Parses a comma-separated option such as --sizes=1,4,16."""
+    return [int(v) for v in str(value).split(',') if v.strip()]
+
+def write_report(options, report):
+    """JSON for the command to print, also written to --output when given."""
+    output = json.dumps(report, indent=2)
+    if options.get('output'):
+        with open(options['output'], 'w') as f:
+            f.write(output)
+    return output
+
+def percentiles(samples_ms):
+    """Summarizes a list of millisecond timings."""
+    if not len(samples_ms):
+        return {"n": 0}
+    values = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "n": int(values.size),
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+def timed(fn, iterations, warmup=1):
+    """Calls fn() `warmup` times untimed, then `iterations` times; returns ms per call."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def environment():
+    import os
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+SEED_STATES = [
+    'Andhra Pradesh', 'Bihar', 'Gujarat', 'Karnataka', 'Kerala', 'Madhya Pradesh',
+    'Maharashtra', 'Punjab', 'Rajasthan', 'Tamil Nadu', 'Uttar Pradesh', 'West Bengal',
+]
+
+def seed_screenings(patients, results, doctors=20, spread_days=None, prefix='bench', seed=42):
+    """
+    Bulk-creates users, profiles and TestResults for benchmarks and plan checks.
+    Bypasses model signals; callers normally run inside a transaction they roll back.
+    With spread_days, date_tested is spread randomly over that many past days.
+    Returns (doctor_profiles, patient_profiles).
+    """
+    import random
+    from datetime import timedelta
+
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from . import scoring
+    from .models import TestResult, UserProfile
+
+    rng = random.Random(seed)
+    users = User.objects.bulk_create([
+        User(username=f"{prefix}-{i}", email=f"{prefix}{i}@example.test")
+        for i in range(patients + doctors)
+    ], batch_size=1000)
+    # Backends without RETURNING leave pks unset
+    if users[0].pk is None:
+        users = list(User.objects.filter(username__startswith=f"{prefix}-").order_by('id'))
+
+    profiles = UserProfile.objects.bulk_create([
+        UserProfile(
+            user=user,
+            role='doctor' if i < doctors else 'patient',
+            full_name='' if i % 5 == 0 else f"Patient {i}",
+            state=rng.choice(SEED_STATES),
+            city=f"City {rng.randrange(50)}",
+            age=rng.randrange(1, 90),
+            gender=rng.choice(('Male', 'Female')),
+        )
+        for i, user in enumerate(users)
+    ], batch_size=1000)
+    if profiles[0].pk is None:
+        profiles = list(UserProfile.objects.filter(user__username__startswith=f"{prefix}-").order_by('id'))
+    doctor_profiles, patient_profiles = profiles[:doctors], profiles[doctors:]
+
+    # bulk_create skips TestResult.save(), so derive the scores here
+    TestResult.objects.bulk_create([
+        scoring.apply(TestResult(
+            patient=rng.choice(patient_profiles),
+            xray_image_url=f"https://example.test/xrays/{i}.png",
+            result=rng.choice(('Positive', 'Negative')),
+            confidence_score=round(rng.uniform(0, 100), 2),
+            symptoms_data={"cough": rng.choice(('yes', 'no')), "fever": rng.choice(('yes', 'no'))},
+        ))
+        for i in range(results)
+    ], batch_size=2000)
+
+    if spread_days:
+        # auto_now_add stamps every row with "now"
+        now = timezone.now()
+        TestResult.objects.bulk_update(
+            [
+                TestResult(pk=pk, date_tested=now - timedelta(minutes=rng.randrange(60 * 24 * spread_days)))
+                for pk in TestResult.objects.values_list('pk', flat=True)
+            ],
+            ['date_tested'], batch_size=2000,
+        )
+    return doctor_profiles, patient_profiles
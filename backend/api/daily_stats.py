@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .filters import filter_city, filter_results, filter_state
+from .models import DailyScreeningStats, TestResult
+
+# Incremental maintenance of DailyScreeningStats.
+#
+# Every TestResult counts once in the bucket (day tested, patient state, city,
+# result, risk level). Saves, deletes and profile moves adjust the affected
+# buckets by +/-1 with F() updates, so concurrent requests don't lose counts.
+# Writes that skip signals (QuerySet.update, bulk_create, raw SQL) need a
+# `manage.py rebuild_daily_stats` afterwards.
+
+
+def is_enabled():
+    return getattr(settings, 'DAILY_STATS_ENABLED', True)
+
+def bucket_for(date_tested, state, city, result, risk_level):
+    return (timezone.localdate(date_tested), state or '', city or '', result, risk_level)
+
+def _bucket_filter(bucket):
+    date, state, city, result, risk_level = bucket
+    return dict(date=date, state=state, city=city, result=result, risk_level=risk_level)
+
+def adjust(bucket, delta):
+    """Adds `delta` to one bucket, creating it on first use."""
+    if not delta:
+        return
+    rows = DailyScreeningStats.objects.filter(**_bucket_filter(bucket))
+    if rows.update(count=F('count') + delta):
+        return
+    try:
+        # Savepoint, so a lost race doesn't break the caller's transaction
+        with transaction.atomic():
+            DailyScreeningStats.objects.create(count=delta, **_bucket_filter(bucket))
+    except IntegrityError:
+        # Another request created it first
+        rows.update(count=F('count') + delta)
+
+def result_bucket(test_result):
+    patient = test_result.patient
+    return bucket_for(test_result.date_tested, patient.state, patient.city,
+                      test_result.result, test_result.risk_level)
+
+def stored_bucket(pk):
+    """The bucket a TestResult currently counts in, read from the database."""
+    row = (
+        TestResult.objects.filter(pk=pk)
+        .values('date_tested', 'patient__state', 'patient__city', 'result', 'risk_level')
+        .first()
+    )
+    if row is None:
+        return None
+    return bucket_for(row['date_tested'], row['patient__state'], row['patient__city'],
+                      row['result'], row['risk_level'])
+
+def move_patient(profile_id, old_location, new_location):
+    """Re-files a patient's results when their state/city changes."""
+    old_state, old_city = old_location
+    new_state, new_city = new_location
+    per_bucket = (
+        TestResult.objects.filter(patient_id=profile_id)
+        .annotate(day=TruncDate('date_tested'))
+        .values('day', 'result', 'risk_level')
+        .annotate(n=Count('id'))
+    )
+    for row in per_bucket:
+        adjust((row['day'], old_state or '', old_city or '', row['result'], row['risk_level']), -row['n'])
+        adjust((row['day'], new_state or '', new_city or '', row['result'], row['risk_level']), row['n'])
+
+@transaction.atomic
+def rebuild():
+    """Recomputes the whole table from TestResult. Returns the number of buckets."""
+    DailyScreeningStats.objects.all().delete()
+    rows = (
+        TestResult.objects.annotate(day=TruncDate('date_tested'))
+        .values('day', 'patient__state', 'patient__city', 'result', 'risk_level')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    DailyScreeningStats.objects.bulk_create([
+        DailyScreeningStats(
+            date=row['day'],
+            state=row['patient__state'] or '',
+            city=row['patient__city'] or '',
+            result=row['result'],
+            risk_level=row['risk_level'],
+            count=row['n'],
+        )
+        for row in rows
+    ], batch_size=1000)
+    return DailyScreeningStats.objects.count()
+
+# --- Reads ---
+
+def _totals(rows, count_expr):
+    totals = rows.aggregate(
+        total=count_expr(),
+        positive=count_expr(filter=Q(result='Positive')),
+        negative=count_expr(filter=Q(result='Negative')),
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+# Filters the summary table can answer; any other filter counts TestResult directly
+SUMMARY_FILTERS = frozenset({'state', 'city', 'result', 'risk', 'date_from', 'date_to'})
+
+def screening_totals(**filters):
+    """
+    {"total", "positive", "negative"} over all results, or those matching the
+    filters from filters.result_filters() (state and city are case-insensitive,
+    dates inclusive). One aggregate query either way.
+    """
+    filters = {name: value for name, value in filters.items() if value not in (None, '')}
+    if is_enabled() and SUMMARY_FILTERS.issuperset(filters):
+        rows = DailyScreeningStats.objects.all()
+        if 'state' in filters:
+            rows = filter_state(rows, filters['state'], field='state')
+        if 'city' in filters:
+            rows = filter_city(rows, filters['city'], field='city')
+        if 'result' in filters:
+            rows = rows.filter(result=filters['result'])
+        if 'risk' in filters:
+            rows = rows.filter(risk_level=filters['risk'])
+        if 'date_from' in filters:
+            rows = rows.filter(date__gte=filters['date_from'])
+        if 'date_to' in filters:
+            rows = rows.filter(date__lte=filters['date_to'])
+        return _totals(rows, lambda **kw: Sum('count', **kw))
+
+    # Conditional aggregation straight over the results table
+    rows = filter_results(TestResult.objects.all(), filters)
+    return _totals(rows, lambda **kw: Count('id', **kw))
@@ -1,11 +1,9 @@
 import os
 import base64
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import (
-    Mail, Attachment, FileContent, FileName, FileType, Disposition
-)
 from django.conf import settings
 
+from .instrumentation import span
+
 # --- CONFIGURATION ---
 # 1. HARDCODE YOUR KEY HERE FOR TESTING (Remove before deploying to GitHub)
 SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY') 
@@ -16,6 +14,12 @@ def send_html_email(subject, recipient_list, html_content, pdf_buffer=None, file
     """
     Sends an email using SendGrid API (Bypasses Gmail SMTP).
     """
+    # Imported lazily; sendgrid is only needed when an email is actually sent
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import (
+        Mail, Attachment, FileContent, FileName, FileType, Disposition
+    )
+
     message = Mail(
         from_email=SENDER_EMAIL,
         to_emails=recipient_list,
@@ -36,7 +40,8 @@ def send_html_email(subject, recipient_list, html_content, pdf_buffer=None, file
     try:
         print(f"🚀 Sending email via SendGrid to {recipient_list}...")
         sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
+        with span('email'):
+            response = sg.send(message)
         print(f"✅ SendGrid Status: {response.status_code}")
     except Exception as e:
         print(f"❌ SendGrid Failed: {str(e)}")
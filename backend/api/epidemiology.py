@@ -0,0 +1,165 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import Count, DateField, F, Min, Sum
+from django.db.models.functions import Lower, TruncWeek
+from django.utils import timezone
+
+from . import daily_stats, response_cache
+from .filters import filter_state, start_of_day
+from .models import DailyScreeningStats, TestResult
+
+# State/city positivity, risk mix and weekly trends for the doctor map view.
+#
+# Everything is a GROUP BY in the database: over the DailyScreeningStats
+# summary (a few rows per place and day, however many results there are), or
+# over TestResult joined to the patient's profile when the summary is disabled.
+#
+# Closed weeks only change when an old result is edited or deleted or a
+# patient moves, so they're cached under the `history` scope and keyed by the
+# current week's start: they roll over on Monday and new scans don't touch
+# them. The open week is a small query of its own, cached under `global`.
+
+RISK_LEVELS = ('High', 'Medium', 'Low')
+
+
+def week_start(day=None):
+    """Monday of the week containing `day` (today, local time), as TruncWeek buckets it."""
+    day = day or timezone.localdate()
+    return day - datetime.timedelta(days=day.weekday())
+
+def _grouped(by, since=None, until=None, state=None):
+    """
+    Rows of {<by>..., "n"} summed over results dated in [since, until).
+    `by` names from: state, city, result, risk, week.
+
+    State and city are grouped on LOWER(), the expression filter_state() and
+    the profile indexes use, so "Delhi" and "delhi" are one place; the row
+    carries one of the spellings seen as its label.
+    """
+    if daily_stats.is_enabled():
+        rows = DailyScreeningStats.objects.all()
+        places = {'state': 'state', 'city': 'city'}
+        columns = {'result': F('result'), 'risk': F('risk_level'), 'week': TruncWeek('date')}
+        if since:
+            rows = rows.filter(date__gte=since)
+        if until:
+            rows = rows.filter(date__lt=until)
+        if state:
+            rows = filter_state(rows, state, field='state')
+        total = Sum('count')
+    else:
+        rows = TestResult.objects.all()
+        places = {'state': 'patient__state', 'city': 'patient__city'}
+        columns = {'result': F('result'), 'risk': F('risk_level'),
+                   'week': TruncWeek('date_tested', output_field=DateField())}
+        if since:
+            rows = rows.filter(date_tested__gte=start_of_day(since))
+        if until:
+            rows = rows.filter(date_tested__lt=start_of_day(until))
+        if state:
+            rows = filter_state(rows, state)
+        total = Count('id')
+
+    columns.update({name: Lower(field) for name, field in places.items()})
+    labels = {f'l_{name}': Min(field) for name, field in places.items() if name in by}
+
+    # Prefixed aliases: an annotation can't reuse a model field's name
+    grouped = rows.values(**{f'g_{name}': columns[name] for name in by}).annotate(n=total, **labels).order_by()
+    return [
+        {**{name: row.get(f'l_{name}', row[f'g_{name}']) for name in by}, "n": row['n']}
+        for row in grouped
+    ]
+
+def _closed_weeks(until, state, weekly_since):
+    """Per-place rows for everything before `until`, and weekly rows from weekly_since."""
+    return {
+        "places": _grouped(('state', 'city', 'result', 'risk'), None, until, state),
+        "weeks": _grouped(('week', 'result'), weekly_since, until, state),
+    }
+
+def _open_week(since, state):
+    places = _grouped(('state', 'city', 'result', 'risk'), since, None, state)
+    # One week, so its trend point is just the place rows summed
+    return {"places": places, "weeks": [{"week": since, "result": row['result'], "n": row['n']} for row in places]}
+
+def _empty():
+    return {"total": 0, "positive": 0, "negative": 0, "risk": dict.fromkeys(RISK_LEVELS, 0)}
+
+def _add(bucket, row):
+    bucket["total"] += row['n']
+    if row['result'] == 'Positive':
+        bucket["positive"] += row['n']
+    elif row['result'] == 'Negative':
+        bucket["negative"] += row['n']
+    if 'risk' in row:
+        bucket["risk"][row['risk']] = bucket["risk"].get(row['risk'], 0) + row['n']
+
+def _finish(bucket, **labels):
+    rate = round(bucket["positive"] / bucket["total"], 4) if bucket["total"] else 0.0
+    return {**labels, "total": bucket["total"], "positive": bucket["positive"],
+            "negative": bucket["negative"], "positive_rate": rate, "risk": bucket["risk"]}
+
+def _label(labels, key, name):
+    # Closed and open weeks can spell a place differently; keep one per place
+    spelled = labels.get(key)
+    labels[key] = name if spelled is None else min(spelled, name)
+    return key
+
+def _ranked(buckets, labels, keys):
+    places = [_finish(bucket, **dict(zip(keys, (labels[part] for part in key)))) for key, bucket in buckets.items()]
+    places.sort(key=lambda place: (-place["total"], *(place[k] for k in keys)))
+    return places
+
+def _summarize(periods, weeks_from, current_week):
+    """Merges the cached closed-week and live open-week aggregates into the response."""
+    overall, states, cities, weekly, labels = _empty(), {}, {}, {}, {}
+    for period in periods:
+        for row in period["places"]:
+            state, city = row['state'] or '', row['city'] or ''
+            state = _label(labels, ('state', state.lower()), state)
+            city = _label(labels, ('city', state[1], city.lower()), city)
+            _add(overall, row)
+            _add(states.setdefault((state,), _empty()), row)
+            _add(cities.setdefault((state, city), _empty()), row)
+        for row in period["weeks"]:
+            _add(weekly.setdefault(row['week'], _empty()), row)
+
+    trend = []
+    week = weeks_from
+    while week <= current_week:
+        bucket = weekly.get(week, _empty())
+        rate = round(bucket["positive"] / bucket["total"], 4) if bucket["total"] else 0.0
+        trend.append({"week_start": week.isoformat(), "total": bucket["total"],
+                      "positive": bucket["positive"], "positive_rate": rate})
+        week += datetime.timedelta(weeks=1)
+
+    totals = _finish(overall)
+    return {
+        "week_start": current_week.isoformat(),
+        "totals": totals,
+        "states": _ranked(states, labels, ('state',)),
+        "cities": _ranked(cities, labels, ('state', 'city')),
+        "weekly": trend,
+    }
+
+def report(params, state=None, weeks=12):
+    """
+    The epidemiology payload for an optional state and the last `weeks` weeks
+    (including this one). Two cache lookups; at most three small GROUP BYs.
+    """
+    current = week_start()
+    weeks_from = current - datetime.timedelta(weeks=weeks - 1)
+
+    closed = response_cache.get_or_build(
+        'epidemiology_history', [response_cache.HISTORY], params,
+        lambda: _closed_weeks(current, state, weeks_from),
+        variant=current.isoformat(),
+        timeout=getattr(settings, 'EPIDEMIOLOGY_HISTORY_TTL', 86400),
+    )
+    open_week = response_cache.get_or_build(
+        'epidemiology_current', [response_cache.GLOBAL], params,
+        lambda: _open_week(current, state),
+        variant=current.isoformat(),
+    )
+    return _summarize([closed, open_week], weeks_from, current)
@@ -0,0 +1,61 @@
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.utils import encoders
+
+from . import listings
+
+# Streaming exports of screening records.
+#
+# Rows come from listings.result_rows() via .iterator(), which uses a
+# server-side cursor on PostgreSQL and fetches chunk_size rows at a time
+# elsewhere, so memory stays flat however many rows match. Each record has
+# the same fields (and, for NDJSON, the same JSON) as the dashboard listing.
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+# Spreadsheet apps run a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back each line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_records(queryset):
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    to_dict = listings.row_formatter()
+    for row in listings.result_rows(queryset).iterator(chunk_size=chunk_size):
+        yield to_dict(row)
+
+def ndjson_lines(queryset):
+    # Compact, non-ASCII-escaping: the same bytes DRF's JSONRenderer produces per record
+    encoder = encoders.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for record in iter_records(queryset):
+        yield encoder.encode(record) + '\n'
+
+def csv_cell(value):
+    """Patient-entered text is prefixed with ' so a name like =HYPERLINK(...) stays text."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def csv_lines(queryset):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(listings.FIELDS)
+    for record in iter_records(queryset):
+        record['symptoms_data'] = json.dumps(record['symptoms_data'], ensure_ascii=False)
+        yield writer.writerow([csv_cell(record[field]) for field in listings.FIELDS])
+
+def stream(queryset, export_type):
+    if export_type == 'csv':
+        return csv_lines(queryset)
+    return ndjson_lines(queryset)
@@ -0,0 +1,97 @@
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the parts of the Supabase HTTP API this backend uses
+# (auth get_user, the JWKS document and storage upload), for offline benchmarks and tests.
+# Point SUPABASE_URL at `server.url` and use any JWT-shaped SUPABASE_KEY.
+
+FAKE_SERVICE_KEY = "fake.service.key"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    # Headers and body go out in separate writes; without TCP_NODELAY, delayed
+    # ACKs add ~40ms to every keep-alive response and swamp the measurement.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.stats['connections'] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self, name):
+        with self.server.stats_lock:
+            self.server.stats[name] += 1
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/auth/v1/.well-known/jwks.json':
+            self._count('jwks_requests')
+            return self._send_json(200, {"keys": self.server.jwks})
+        if self.path.rstrip('/') != '/auth/v1/user':
+            return self._send_json(404, {"message": "not found"})
+        self._count('auth_requests')
+
+        token = self.headers.get('Authorization', '').replace('Bearer ', '', 1)
+        if not token or token in self.server.rejected_tokens:
+            return self._send_json(401, {"code": 401, "msg": "invalid JWT"})
+
+        uid = str(uuid.uuid5(uuid.NAMESPACE_URL, token))
+        self._send_json(200, {
+            "id": uid,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": f"{uid[:8]}@example.test",
+            "app_metadata": {"provider": "email"},
+            "user_metadata": {},
+            "created_at": "2025-01-01T00:00:00Z",
+        })
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        prefix = '/storage/v1/object/'
+        if not self.path.startswith(prefix):
+            return self._send_json(404, {"message": "not found"})
+        self._count('storage_requests')
+        key = self.path[len(prefix):]
+        self._send_json(200, {"Key": key, "Id": str(uuid.uuid4())})
+
+
+class FakeSupabaseServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.stats_lock = threading.Lock()
+        self.stats = {'connections': 0, 'auth_requests': 0, 'storage_requests': 0, 'jwks_requests': 0}
+        self.rejected_tokens = set()
+        # Public JWKs served at /auth/v1/.well-known/jwks.json
+        self.jwks = []
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-supabase', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
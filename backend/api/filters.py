@@ -0,0 +1,162 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .models import UserProfile
+
+# Query helpers shared by the list views, exports and stats.
+
+
+# ?sort= values for the dashboard: (field, descending), each backed by an index
+SORTS = {
+    'newest': ('date_tested', True),
+    'oldest': ('date_tested', False),
+    'composite': ('composite_score', True),
+    'symptom': ('symptom_score', True),
+}
+
+# Longest accepted ?q=
+MAX_SEARCH_LENGTH = 100
+
+
+def filter_state(queryset, state, field='patient__state'):
+    """
+    Case-insensitive state match written as LOWER(state) = 'value', the same
+    expression as api_profile_state_lower_idx. `__iexact` compiles to
+    UPPER(...) on Postgres and LIKE on SQLite, neither of which can use it.
+    """
+    return queryset.alias(_state_lower=Lower(field)).filter(_state_lower=state.strip().lower())
+
+def filter_city(queryset, city, field='patient__city'):
+    """Same as filter_state(), matching api_profile_city_lower_idx."""
+    return queryset.alias(_city_lower=Lower(field)).filter(_city_lower=city.strip().lower())
+
+def search_patients(queryset, text, field='patient'):
+    """
+    Substring match on patient name or email. `__icontains` compiles to
+    UPPER(col::text) LIKE UPPER('%text%') on Postgres, which the trigram
+    indexes from migration 0009 serve; SQLite scans the (small) profile table.
+    """
+    profiles = UserProfile.objects.filter(Q(full_name__icontains=text) | Q(user__email__icontains=text))
+    return queryset.filter(**{f'{field}__in': profiles.values('id')})
+
+def _parse_int(params, name, minimum=0, maximum=150):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or not minimum <= number <= maximum:
+        raise ValidationError({name: f"Use a whole number from {minimum} to {maximum}."})
+    return number
+
+def _parse_day(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({name: "Use YYYY-MM-DD."})
+    return day
+
+def result_filters(params):
+    """
+    Reads the dashboard/export filters from query params:
+      ?state=<name|all>  ?city=<name>  ?result=<positive|negative|all>  ?risk=<high|medium|low|all>
+      ?gender=<male|female|...>  ?age_min=N  ?age_max=N  ?q=<name or email>
+      ?date_from=YYYY-MM-DD  ?date_to=YYYY-MM-DD
+    Dates and ages are inclusive. Returns a dict of the ones that are set.
+    """
+    filters = {}
+    state = (params.get('state') or 'all').strip()
+    if state.lower() != 'all':
+        filters['state'] = state
+
+    city = (params.get('city') or '').strip()
+    if city:
+        filters['city'] = city
+
+    gender = (params.get('gender') or 'all').strip()
+    if gender.lower() != 'all':
+        filters['gender'] = gender
+
+    result = (params.get('result') or 'all').strip().capitalize()
+    if result != 'All':
+        if result not in ('Positive', 'Negative'):
+            raise ValidationError({"result": "Use positive, negative or all."})
+        filters['result'] = result
+
+    risk = (params.get('risk') or 'all').strip().capitalize()
+    if risk != 'All':
+        if risk not in ('High', 'Medium', 'Low'):
+            raise ValidationError({"risk": "Use high, medium, low or all."})
+        filters['risk'] = risk
+
+    for name in ('age_min', 'age_max'):
+        age = _parse_int(params, name)
+        if age is not None:
+            filters[name] = age
+    if filters.get('age_min') is not None and filters.get('age_max') is not None \
+            and filters['age_min'] > filters['age_max']:
+        raise ValidationError({"age_max": "Must not be below age_min."})
+
+    text = (params.get('q') or '').strip()
+    if text:
+        if len(text) > MAX_SEARCH_LENGTH:
+            raise ValidationError({"q": f"At most {MAX_SEARCH_LENGTH} characters."})
+        filters['q'] = text
+
+    for name in ('date_from', 'date_to'):
+        day = _parse_day(params, name)
+        if day:
+            filters[name] = day
+    if filters.get('date_from') and filters.get('date_to') and filters['date_from'] > filters['date_to']:
+        raise ValidationError({"date_to": "Must not be before date_from."})
+    return filters
+
+def start_of_day(day):
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+def filter_results(queryset, filters):
+    """Applies result_filters() to a TestResult queryset, as index-friendly ranges."""
+    if 'state' in filters:
+        queryset = filter_state(queryset, filters['state'])
+    if 'city' in filters:
+        queryset = filter_city(queryset, filters['city'])
+    if 'gender' in filters:
+        queryset = queryset.filter(patient__gender__iexact=filters['gender'])
+    if 'age_min' in filters:
+        queryset = queryset.filter(patient__age__gte=filters['age_min'])
+    if 'age_max' in filters:
+        queryset = queryset.filter(patient__age__lte=filters['age_max'])
+    if 'q' in filters:
+        queryset = search_patients(queryset, filters['q'])
+    if 'result' in filters:
+        queryset = queryset.filter(result=filters['result'])
+    if 'risk' in filters:
+        # The stored, corrected level (see scoring.py)
+        queryset = queryset.filter(risk_level=filters['risk'])
+    # A range on the column rather than date_tested__date, which can't use an index
+    if 'date_from' in filters:
+        queryset = queryset.filter(date_tested__gte=start_of_day(filters['date_from']))
+    if 'date_to' in filters:
+        queryset = queryset.filter(date_tested__lt=start_of_day(filters['date_to'] + datetime.timedelta(days=1)))
+    return queryset
+
+def result_ordering(params):
+    """(field, descending) for ?sort=, defaulting to newest first."""
+    sort = (params.get('sort') or 'newest').strip().lower()
+    if sort not in SORTS:
+        raise ValidationError({"sort": "Use " + ", ".join(SORTS) + "."})
+    return SORTS[sort]
@@ -0,0 +1,220 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseNotFound
+
+# Per-phase timing for the request hot path.
+#
+#   with span('inference'):
+#       ...
+#
+# Each span is added to the current request's breakdown (returned in the
+# Server-Timing header by ServerTimingMiddleware) and to a process-wide
+# histogram exposed in Prometheus text format at /metrics.
+# With INSTRUMENTATION_ENABLED off, span() returns a shared no-op context.
+
+# Upper bounds in seconds, like Prometheus' default buckets plus a longer tail for inference
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_NOOP = contextlib.nullcontext()
+
+# Timings of the request being served on this thread/task
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def is_enabled():
+    return getattr(settings, 'INSTRUMENTATION_ENABLED', False)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (thread-safe), one series per label value."""
+
+    def __init__(self, name, help_text, buckets=BUCKETS, label='span'):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                # per-bucket counts (last slot is +Inf), sum
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for label_value, (counts, total) in sorted(snapshot.items()):
+            labels = f'{self.label}="{label_value}"'
+            running = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                running += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {running}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {running}')
+        return lines
+
+
+span_seconds = Histogram('respirex_span_duration_seconds', "Time spent in each instrumented phase.")
+request_seconds = Histogram('respirex_request_duration_seconds', "Request duration by view.", label='view')
+request_queries = Histogram('respirex_request_db_queries', "ORM queries per request by view.",
+                            buckets=QUERY_BUCKETS, label='view')
+
+
+class RequestTimings:
+    """Accumulated span durations (ms) and query counts for one request."""
+
+    def __init__(self):
+        self.spans = {}
+        self.queries = 0
+        self.query_ms = 0.0
+        self._lock = threading.Lock()  # uploads record from the I/O pool
+
+    def add(self, name, ms):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook: counts and times every query
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_ms += (time.perf_counter() - started) * 1000
+            self.queries += 1
+
+    def header(self, total_ms):
+        with self._lock:
+            parts = [f"{name};dur={ms:.1f}" for name, ms in self.spans.items()]
+        parts.append(f'db;dur={self.query_ms:.1f};desc="{self.queries} queries"')
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+
+@contextlib.contextmanager
+def _timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        span_seconds.observe(name, elapsed)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, elapsed * 1000)
+
+
+def span(name):
+    """Times the enclosed block as phase `name`. A no-op when instrumentation is off."""
+    if not is_enabled():
+        return _NOOP
+    return _timed(name)
+
+
+def propagate(fn):
+    """
+    Wraps fn to run in the caller's context, so spans recorded on an executor
+    thread still land in the submitting request's breakdown.
+    """
+    if not is_enabled():
+        return fn
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return ctx.run(fn, *args, **kwargs)
+    return run
+
+
+class ServerTimingMiddleware:
+    """Adds a Server-Timing header with the request's span breakdown and ORM query count."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_enabled():
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else 'unmatched'
+        request_seconds.observe(view, elapsed)
+        request_queries.observe(view, timings.queries)
+
+        response['Server-Timing'] = timings.header(elapsed * 1000)
+        return response
+
+
+def _runtime_lines():
+    # Counters owned by other modules; only reported once they're in use
+    from . import ml_engine, prediction_cache, report_cache, response_cache
+
+    lines = []
+    cache = prediction_cache.stats()
+    lines.append("# TYPE respirex_prediction_cache_lookups_total counter")
+    for outcome in ('local_hits', 'shared_hits', 'misses'):
+        lines.append(f'respirex_prediction_cache_lookups_total{{outcome="{outcome}"}} {cache.get(outcome, 0)}')
+
+    responses = response_cache.stats()
+    if responses:
+        lines.append("# TYPE respirex_response_cache_lookups_total counter")
+        for view, counts in sorted(responses.items()):
+            for outcome in ('hits', 'misses'):
+                lines.append(f'respirex_response_cache_lookups_total{{view="{view}",outcome="{outcome}"}} {counts[outcome]}')
+        lines.append("# TYPE respirex_response_cache_hit_rate gauge")
+        for view, counts in sorted(responses.items()):
+            lines.append(f'respirex_response_cache_hit_rate{{view="{view}"}} {counts["hit_rate"]}')
+
+    reports = report_cache.stats()
+    lines.append("# TYPE respirex_report_cache_lookups_total counter")
+    for outcome in ('hits', 'misses', 'uncacheable'):
+        lines.append(f'respirex_report_cache_lookups_total{{outcome="{outcome}"}} {reports[outcome]}')
+
+    batching = ml_engine.get_batching_stats()
+    if batching:
+        lines.append("# TYPE respirex_batcher_batches_total counter")
+        lines.append(f"respirex_batcher_batches_total {batching.get('batches', 0)}")
+        lines.append("# TYPE respirex_batcher_queue_wait_ms gauge")
+        waits = batching.get('queue_wait_ms') or {}
+        for key, quantile in (('p50', '0.5'), ('p95', '0.95'), ('p99', '0.99')):
+            lines.append(f'respirex_batcher_queue_wait_ms{{quantile="{quantile}"}} {waits.get(key, 0.0)}')
+    return lines
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the process-level histograms."""
+    if not is_enabled():
+        return HttpResponseNotFound()
+
+    lines = []
+    for histogram in (span_seconds, request_seconds, request_queries):
+        lines.extend(histogram.render())
+    lines.extend(_runtime_lines())
+    return HttpResponse("\n".join(lines) + "\n", content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# Read-only fast path for TestResult lists (dashboard, history).
+#
+# TestResultSerializer walks patient and patient.user per row and runs every
+# field through DRF. Here one values() query fetches exactly the columns the
+# serializer reads, and rows are turned into dicts directly. The output is the
+# same JSON, key for key and byte for byte; keep the two in step when either changes.
+
+COLUMNS = (
+    'id',
+    'patient_id',
+    'patient__full_name',
+    'patient__user__email',
+    'patient__state',
+    'patient__city',
+    'patient__age',
+    'patient__gender',
+    'patient__phone',
+    'xray_image_url',
+    'date_tested',
+    'result',
+    'confidence_score',
+    'risk_level',
+    'symptoms_data',
+    'symptom_score',
+    'composite_score',
+)
+
+# Output keys, in TestResultSerializer's order
+FIELDS = (
+    'id', 'patient_name', 'email', 'state', 'city', 'age', 'gender', 'phone', 'risk_level',
+    'xray_image_url', 'date_tested', 'result', 'confidence_score', 'symptoms_data', 'symptom_score',
+    'composite_score', 'patient',
+)
+
+_datetime_field = serializers.DateTimeField()
+
+
+def result_rows(queryset):
+    """The columns listing() needs, as one joined query (ordering and filters kept)."""
+    return queryset.values(*COLUMNS)
+
+def _datetime_formatter():
+    # DRF's ISO 8601 output, without its per-value settings lookups
+    if api_settings.DATETIME_FORMAT is None or api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+        return _datetime_field.to_representation
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def format_datetime(value):
+        if not value:
+            return None
+        if tz is not None:
+            value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return format_datetime
+
+def _str(value):
+    return None if value is None else str(value)
+
+def row_formatter():
+    """Returns a function mapping one result_rows() row to its serializer-shaped dict."""
+    format_datetime = _datetime_formatter()
+
+    def to_dict(row):
+        return {
+            "id": row['id'],
+            # Use full_name if available, otherwise fallback to email
+            "patient_name": row['patient__full_name'] or row['patient__user__email'],
+            "email": _str(row['patient__user__email']),
+            "state": _str(row['patient__state']),
+            "city": _str(row['patient__city']),
+            "age": None if row['patient__age'] is None else int(row['patient__age']),
+            "gender": _str(row['patient__gender']),
+            "phone": _str(row['patient__phone']),
+            "risk_level": _str(row['risk_level']),
+            "xray_image_url": _str(row['xray_image_url']),
+            "date_tested": format_datetime(row['date_tested']),
+            "result": _str(row['result']),
+            "confidence_score": float(row['confidence_score']),
+            "symptoms_data": row['symptoms_data'],
+            "symptom_score": float(row['symptom_score']),
+            "composite_score": float(row['composite_score']),
+            "patient": row['patient_id'],
+        }
+    return to_dict
+
+def listing(rows):
+    """Dicts shaped exactly like TestResultSerializer(many=True).data."""
+    to_dict = row_formatter()
+    return [to_dict(row) for row in rows]
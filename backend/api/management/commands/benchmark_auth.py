@@ -0,0 +1,94 @@
+import json
+import secrets
+import time
+
+import jwt
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from api import authentication
+from api.benchmarks import environment, percentiles, timed
+from api.fake_supabase import FAKE_SERVICE_KEY, FakeSupabaseServer
+
+
+def make_test_keys():
+    """A throwaway ES256 key pair and HS256 secret, like a Supabase project's signing keys."""
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    public_jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(private_key.public_key()))
+    public_jwk.update({"kid": "bench-key", "alg": "ES256", "use": "sig"})
+    return private_key, public_jwk, secrets.token_urlsafe(32)
+
+
+def make_token(key, algorithm, ttl=3600, kid=None):
+    now = int(time.time())
+    claims = {
+        "sub": "6f1c0d9e-0000-4000-8000-000000000001",
+        "email": "bench@example.test",
+        "aud": "authenticated",
+        "role": "authenticated",
+        "iat": now,
+        "exp": now + ttl,
+    }
+    headers = {"kid": kid} if kid else None
+    return jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks Supabase token verification offline: remote get_user (local stand-in "
+        "server) vs local HS256 and ES256/JWKS verification with a generated test key pair."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        n = options['requests']
+        private_key, public_jwk, secret = make_test_keys()
+        es_token = make_token(private_key, 'ES256', kid=public_jwk['kid'])
+        hs_token = make_token(secret, 'HS256')
+
+        server = FakeSupabaseServer().start()
+        server.jwks = [public_jwk]
+        report = {"environment": environment(), "requests": n}
+
+        try:
+            with override_settings(
+                SUPABASE_URL=server.url,
+                SUPABASE_KEY=FAKE_SERVICE_KEY,
+                SUPABASE_JWKS_URL=None,
+                SUPABASE_JWT_SECRET=secret,
+            ):
+                from api import supabase_client
+                supabase_client.reset_supabase()
+                authentication._jwks_client = None
+
+                report["remote_get_user_ms"] = percentiles(
+                    timed(lambda: authentication.verify_token_remotely(es_token), n)
+                )
+                report["local_hs256_ms"] = percentiles(
+                    timed(lambda: authentication.verify_token_locally(hs_token), n)
+                )
+                report["local_es256_jwks_ms"] = percentiles(
+                    timed(lambda: authentication.verify_token_locally(es_token), n)
+                )
+                report["jwks_fetches"] = server.stats['jwks_requests']
+
+                # Sanity: an expired token must be rejected locally
+                expired = make_token(private_key, 'ES256', ttl=-120, kid=public_jwk['kid'])
+                try:
+                    authentication.verify_token_locally(expired)
+                    report["expired_token_rejected"] = False
+                except jwt.ExpiredSignatureError:
+                    report["expired_token_rejected"] = True
+
+                supabase_client.reset_supabase()
+                authentication._jwks_client = None
+        finally:
+            server.stop()
+
+        remote = report["remote_get_user_ms"]["p50"]
+        report["es256_p50_speedup_vs_remote"] = round(remote / report["local_es256_jwks_ms"]["p50"], 1)
+        self.stdout.write(json.dumps(report, indent=2))
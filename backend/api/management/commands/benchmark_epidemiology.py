@@ -0,0 +1,73 @@
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import override_settings
+
+from api import daily_stats, epidemiology, response_cache
+from api.benchmarks import environment, int_list, percentiles, seed_screenings, timed, write_report
+from api.instrumentation import RequestTimings
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the epidemiology report over seeded data (rolled back afterwards): "
+        "uncached from the daily summary, uncached straight from TestResult, and from "
+        "the response cache. Fails if the two database paths disagree."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100000', help="TestResult rows per run, e.g. 100000,1000000")
+        parser.add_argument('--spread-days', type=int, default=730)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--output', help="Also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        runs = []
+        for size in int_list(options['sizes']):
+            with transaction.atomic():
+                runs.append(self._run(size, options))
+                transaction.set_rollback(True)
+            # Entries built from the rolled-back rows
+            response_cache.bump_all()
+
+        self.stdout.write(write_report(options, {"environment": environment(), "vendor": connection.vendor, "runs": runs}))
+
+    def _run(self, size, options):
+        seed_screenings(max(50, size // 20), size, spread_days=options['spread_days'], prefix=f'epi-{size}')
+        # bulk_create skips the signals that maintain the summary
+        daily_stats.rebuild()
+        params = QueryDict()
+        report = {"rows": size}
+        outputs = {}
+
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            for name, summary in (("summary", True), ("test_results", False)):
+                with override_settings(DAILY_STATS_ENABLED=summary):
+                    queries = RequestTimings()
+                    with connection.execute_wrapper(queries):
+                        outputs[name] = epidemiology.report(params)
+                    repeat = options['iterations'] if summary else 1
+                    report[name] = {
+                        "queries": queries.queries,
+                        "latency_ms": percentiles(timed(lambda: epidemiology.report(params), repeat, warmup=0)),
+                    }
+
+        if outputs["summary"] != outputs["test_results"]:
+            raise CommandError(f"Summary and TestResult aggregates differ at {size} rows")
+
+        # One process, nothing else writing: a local-memory cache is fine here
+        with override_settings(RESPONSE_CACHE_ENABLED=True, RESPONSE_CACHE_ALLOW_LOCAL=True):
+            response_cache.bump_all()
+            epidemiology.report(params)
+            queries = RequestTimings()
+            with connection.execute_wrapper(queries):
+                epidemiology.report(params)
+            report["cached"] = {
+                "queries": queries.queries,
+                "latency_ms": percentiles(timed(lambda: epidemiology.report(params), options['iterations'], warmup=0)),
+            }
+        report["summary_rows"] = daily_stats.DailyScreeningStats.objects.count()
+        report["identical"] = True
+        return report
+
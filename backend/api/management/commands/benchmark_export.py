@@ -0,0 +1,96 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import listings
+from api.benchmarks import environment, int_list, peak_rss_mb, seed_screenings, write_report
+from api.models import TestResult
+from api.views import DoctorExportView
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams /api/doctor/export/ over seeded data (rolled back afterwards) and reports "
+        "time, bytes and peak memory, next to rendering the same rows as one JSON "
+        "document. Fails if the export's peak allocation exceeds --max-peak-mb."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000', help="TestResult rows per run")
+        parser.add_argument('--types', default='ndjson,csv')
+        parser.add_argument('--max-peak-mb', type=float, default=32.0,
+                            help="Upper bound for the export's peak Python allocation")
+        parser.add_argument('--output', help="Also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        runs = []
+        for size in int_list(options['sizes']):
+            with transaction.atomic():
+                runs.append(self._run(size, options))
+                transaction.set_rollback(True)
+
+        self.stdout.write(write_report(options, {"environment": environment(), "vendor": connection.vendor, "runs": runs}))
+
+        over = [
+            f"{run['rows']} rows as {name}: {export['peak_alloc_mb']} MB"
+            for run in runs for name, export in run['exports'].items()
+            if export['peak_alloc_mb'] > options['max_peak_mb']
+        ]
+        if over:
+            raise CommandError(f"Export memory above {options['max_peak_mb']} MB: " + "; ".join(over))
+
+    def _run(self, size, options):
+        doctors, _ = seed_screenings(max(50, size // 20), size, prefix=f'export-{size}')
+        doctor = doctors[0].user
+        factory = APIRequestFactory()
+        view = DoctorExportView.as_view()
+
+        exports = {}
+        for export_type in options['types'].split(','):
+            request = factory.get('/api/doctor/export/', {'type': export_type})
+            force_authenticate(request, user=doctor)
+
+            rss_before = peak_rss_mb()
+            tracemalloc.start()
+            started = time.perf_counter()
+            total_bytes = lines = 0
+            response = view(request)
+            for chunk in response.streaming_content:
+                total_bytes += len(chunk)
+                lines += chunk.count(b'\n')
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # Seeded rows plus anything already in the database
+            expected = TestResult.objects.count() + (1 if export_type == 'csv' else 0)
+            if lines != expected:
+                raise CommandError(f"{export_type} export produced {lines} lines; expected {expected}")
+            exports[export_type] = {
+                "seconds": round(elapsed, 2),
+                "bytes": total_bytes,
+                "rows_per_s": round(size / elapsed),
+                "peak_alloc_mb": round(peak / (1024 * 1024), 2),
+                # Process high-water mark; only moves if the export exceeds earlier peaks
+                "peak_rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+            }
+
+        # For contrast: the same rows materialized and rendered as one document
+        tracemalloc.start()
+        started = time.perf_counter()
+        queryset = TestResult.objects.order_by('-date_tested', '-id')
+        body = JSONRenderer().render(listings.listing(listings.result_rows(queryset)))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del body
+
+        return {
+            "rows": size,
+            "exports": exports,
+            "buffered_json": {"seconds": round(elapsed, 2), "peak_alloc_mb": round(peak / (1024 * 1024), 2)},
+        }
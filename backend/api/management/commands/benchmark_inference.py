@@ -0,0 +1,205 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from PIL import Image
+
+from api import model_registry
+from api.benchmarks import environment, int_list, peak_rss_mb, percentiles, timed, write_report
+from api.ml_engine import IMG_SIZE, _decode, _resize_into, predict_xray_batch
+
+
+def synthetic_radiograph(size, seed=0):
+    """
+    Grayscale chest-X-ray-like image: dark lung fields, bright spine and
+    mediastinum, rib banding and film grain. Portrait, like a PA film.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size, int(size * 1.2)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    x /= width
+    y /= height
+
+    img = np.full((height, width), 170.0, dtype=np.float32)
+    for cx in (0.3, 0.7):
+        lung = ((x - cx) / 0.17) ** 2 + ((y - 0.5) / 0.32) ** 2
+        img -= 90.0 * np.clip(1.0 - lung, 0.0, 1.0) ** 0.5
+    img += 60.0 * np.exp(-((x - 0.5) / 0.05) ** 2)
+    img += 12.0 * np.sin(y * 60.0) * (np.abs(x - 0.5) > 0.08)
+    img += rng.normal(0.0, 6.0, img.shape).astype(np.float32)
+    return Image.fromarray(np.clip(img, 0, 255).astype(np.uint8), mode='L')
+
+
+def encode(img, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'jpeg':
+        img.save(buffer, format='JPEG', quality=90)
+    else:
+        img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks X-ray decode, preprocessing, inference and end-to-end predict_xray_batch "
+        "latency on synthetic radiographs. Prints JSON. Works offline with random weights."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='512,1024,2048,4096', help="Image widths in px")
+        parser.add_argument('--formats', default='png,jpeg')
+        parser.add_argument('--batch-sizes', default='1,8')
+        parser.add_argument('--threads', default='1,%d' % (os.cpu_count() or 1),
+                            help="CPU thread counts; each runs in a fresh process")
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--backend', choices=['keras', 'tflite'], default=None,
+                            help="Defaults to ML_BACKEND")
+        parser.add_argument('--random-weights', action='store_true',
+                            help="Use a randomly initialized EfficientNet-B0 even if weights exist")
+        parser.add_argument('--output', help="Also write the JSON report to this file")
+        # Internal: set when the parent re-invokes itself for one thread count
+        parser.add_argument('--child', action='store_true', help="(internal)")
+
+    def handle(self, *args, **options):
+        thread_counts = int_list(options['threads'])
+
+        if options['child']:
+            report = self._run(thread_counts[0], options)
+            self.stdout.write(json.dumps(report))
+            return
+
+        # TensorFlow's thread pools can't be resized after start-up, so each
+        # thread count is measured in its own interpreter.
+        runs = [self._spawn(threads, options) for threads in thread_counts]
+        report = {
+            "environment": environment(),
+            "config": {
+                "sizes": int_list(options['sizes']),
+                "formats": options['formats'].split(','),
+                "batch_sizes": int_list(options['batch_sizes']),
+                "iterations": options['iterations'],
+            },
+            "runs": runs,
+        }
+        self.stdout.write(write_report(options, report))
+
+    def _spawn(self, threads, options):
+        cmd = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_inference', '--child',
+            '--threads', str(threads),
+            '--sizes', options['sizes'],
+            '--formats', options['formats'],
+            '--batch-sizes', options['batch_sizes'],
+            '--iterations', str(options['iterations']),
+        ]
+        if options['backend']:
+            cmd += ['--backend', options['backend']]
+        if options['random_weights']:
+            cmd.append('--random-weights')
+        out = subprocess.run(cmd, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True).stdout
+        # Model loading may print before the report; the report is the last line
+        return json.loads(out.strip().splitlines()[-1])
+
+    def _load_model(self, threads, options):
+        backend = options['backend'] or getattr(settings, 'ML_BACKEND', 'keras')
+        if backend == 'keras':
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+
+        if options['random_weights'] or not os.path.exists(model_registry.model_path()):
+            if backend != 'keras':
+                raise SystemExit("Random weights are only available for the keras backend")
+            import tensorflow as tf
+            model = tf.keras.applications.EfficientNetB0(
+                weights=None, input_shape=(IMG_SIZE[1], IMG_SIZE[0], 3), classes=2
+            )
+            model_registry.register_model(model, "random-init")
+            return "random-init"
+
+        model_registry.get_model()
+        return model_registry.model_path()
+
+    def _run(self, threads, options):
+        iterations = options['iterations']
+        batch_sizes = int_list(options['batch_sizes'])
+
+        overrides = dict(
+            ML_NUM_THREADS=threads,
+            ML_PREDICTION_CACHE_ENABLED=False,  # measure real work, not cache hits
+            ML_SERVER_SOCKET=None,
+            ML_MODEL_RELOAD_CHECK_SECONDS=0,
+        )
+        if options['backend']:
+            overrides['ML_BACKEND'] = options['backend']
+
+        with override_settings(**overrides):
+            weights = self._load_model(threads, options)
+            model = model_registry.get_model()
+
+            # Inference alone, on already-normalized tensors
+            inference = []
+            for batch_size in batch_sizes:
+                batch = np.random.default_rng(batch_size).random(
+                    (batch_size, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32
+                )
+                samples = timed(lambda: model.predict(batch, verbose=0), iterations)
+                stats = percentiles(samples)
+                inference.append({
+                    "batch_size": batch_size,
+                    "latency_ms": stats,
+                    "throughput_img_s": round(batch_size * 1000.0 / stats["mean"], 2),
+                })
+
+            # Per image: decode, preprocessing, and predict_xray_batch end to end
+            images = []
+            out = np.empty((IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+            for size in int_list(options['sizes']):
+                source = synthetic_radiograph(size, seed=size)
+                for fmt in options['formats'].split(','):
+                    data = encode(source, fmt)
+                    decoded = _decode(io.BytesIO(data))
+
+                    def preprocess():
+                        _resize_into(decoded, out)
+                        np.divide(out, 255.0, out=out)
+
+                    entry = {
+                        "width": source.width,
+                        "height": source.height,
+                        "format": fmt,
+                        "bytes": len(data),
+                        "decode_ms": percentiles(timed(lambda: _decode(io.BytesIO(data)), iterations)),
+                        "preprocess_ms": percentiles(timed(preprocess, iterations)),
+                        "end_to_end": [],
+                    }
+                    for batch_size in batch_sizes:
+                        samples = timed(
+                            lambda: predict_xray_batch([io.BytesIO(data) for _ in range(batch_size)]),
+                            iterations,
+                        )
+                        stats = percentiles(samples)
+                        entry["end_to_end"].append({
+                            "batch_size": batch_size,
+                            "latency_ms": stats,
+                            "throughput_img_s": round(batch_size * 1000.0 / stats["mean"], 2),
+                        })
+                    images.append(entry)
+
+        return {
+            "threads": threads,
+            "backend": options['backend'] or getattr(settings, 'ML_BACKEND', 'keras'),
+            "weights": weights,
+            "micro_batching": {
+                "enabled": getattr(settings, 'ML_BATCHING_ENABLED', True),
+                "max_wait_ms": getattr(settings, 'ML_BATCH_MAX_WAIT_MS', 10),
+            },
+            "inference": inference,
+            "images": images,
+            "peak_rss_mb": peak_rss_mb(),
+        }
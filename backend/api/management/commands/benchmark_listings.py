@@ -0,0 +1,74 @@
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+
+from api import listings
+from api.benchmarks import environment, int_list, percentiles, seed_screenings, timed, write_report
+from api.instrumentation import RequestTimings
+from api.models import TestResult
+from api.serializers import TestResultSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares TestResultSerializer with the flat values() listing path at several "
+        "table sizes: latency, query count and rendered bytes. Seeds data in a "
+        "transaction that is rolled back. Fails if the JSON differs or the fast path "
+        "takes more than one query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help="TestResult rows per run")
+        parser.add_argument('--iterations', type=int, default=3)
+        parser.add_argument('--output', help="Also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        runs = []
+        for size in int_list(options['sizes']):
+            with transaction.atomic():
+                runs.append(self._run(size, options['iterations']))
+                transaction.set_rollback(True)
+
+        self.stdout.write(write_report(options, {"environment": environment(), "vendor": connection.vendor, "runs": runs}))
+
+    def _run(self, size, iterations):
+        seed_screenings(max(50, size // 20), size, prefix=f'listing-{size}')
+        queryset = TestResult.objects.order_by('-date_tested', '-id')
+        renderer = JSONRenderer()
+
+        variants = {
+            # What the dashboard did before: patient joined, patient.user per row
+            "serializer_select_patient": lambda: TestResultSerializer(
+                queryset.select_related('patient'), many=True).data,
+            "serializer_select_patient_user": lambda: TestResultSerializer(
+                queryset.select_related('patient__user'), many=True).data,
+            "listing": lambda: listings.listing(listings.result_rows(queryset)),
+        }
+
+        report = {"rows": size}
+        rendered = {}
+        for name, build in variants.items():
+            # Counted with an execute wrapper; CaptureQueriesContext caps its log at 9000
+            queries = RequestTimings()
+            with connection.execute_wrapper(queries):
+                rendered[name] = renderer.render(build())
+            # The N+1 variant is too slow to repeat at large sizes
+            repeat = 1 if name == "serializer_select_patient" and size > 10000 else iterations
+            report[name] = {
+                "queries": queries.queries,
+                "latency_ms": percentiles(timed(lambda: renderer.render(build()), repeat, warmup=0)),
+                "bytes": len(rendered[name]),
+            }
+
+        if report["listing"]["queries"] != 1:
+            raise CommandError(f"listing path ran {report['listing']['queries']} queries for {size} rows; expected 1")
+        for name, body in rendered.items():
+            if body != rendered["listing"]:
+                raise CommandError(f"{name} JSON differs from the listing path at {size} rows")
+
+        report["identical_json"] = True
+        report["speedup_vs_serializer_p50"] = round(
+            report["serializer_select_patient_user"]["latency_ms"]["p50"] / report["listing"]["latency_ms"]["p50"], 2
+        )
+        return report
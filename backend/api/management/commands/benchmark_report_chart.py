@@ -0,0 +1,109 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import environment, write_report
+
+# Each path runs in a fresh interpreter, so peak RSS covers only its own
+# figures and Agg buffers (which tracemalloc can't see).
+CHART_PROBE = """
+import json, os, resource, sys, time, tracemalloc
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'respirex_backend.settings')
+import django
+django.setup()
+from api import pdf_generator
+from api.benchmarks import percentiles, timed
+
+path, iterations = sys.argv[1], int(sys.argv[2])
+chart = pdf_generator.generate_scatter_plot if path == 'blitted' else pdf_generator.render_scatter_plot
+pdf_generator._pyplot()
+import PIL.PngImagePlugin
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+baseline = rss_mb()
+started = time.perf_counter()
+chart(50.0, 50.0)
+first_ms = (time.perf_counter() - started) * 1000
+
+# Spread the patient over the plot, as real reports would
+points = [((i * 37) % 101, (i * 53) % 101) for i in range(iterations)]
+calls = iter(points)
+samples = timed(lambda: chart(*next(calls)), iterations, warmup=0)
+# Separately: tracing slows Python-heavy code too much to time under it
+tracemalloc.start()
+for point in points[:5]:
+    chart(*point)
+_, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+print(json.dumps({
+    'first_call_ms': round(first_ms, 1),
+    'latency_ms': percentiles(samples),
+    'png_bytes': len(chart(90.0, 25.0)) * 3 // 4,
+    'peak_alloc_mb': round(peak / (1024 * 1024), 1),
+    'rss_growth_mb': round(rss_mb() - baseline, 1),
+}))
+"""
+
+PIXEL_CHECK = [(0.0, 0.0), (25.0, 90.0), (62.5, 12.5), (100.0, 100.0), (120.0, -5.0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the report's scatter chart drawn from scratch (render_scatter_plot) against "
+        "the cached background with the patient overlay blitted on (generate_scatter_plot), "
+        "each in a fresh interpreter, and reports latency and memory. Fails if the two "
+        "charts' pixels differ."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--output', help="Also write the JSON report to this file")
+
+    def _probe(self, path, iterations):
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+        out = subprocess.run(
+            [sys.executable, '-c', CHART_PROBE, path, str(iterations)], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        return json.loads(out.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        mismatched = self._compare_pixels()
+        if mismatched:
+            raise CommandError(f"Blitted chart differs from the full render at {mismatched}")
+
+        iterations = max(1, options['iterations'])
+        paths = {path: self._probe(path, iterations) for path in ('full', 'blitted')}
+        speedup = paths['full']['latency_ms']['p50'] / paths['blitted']['latency_ms']['p50']
+        self.stdout.write(write_report(options, {
+            "environment": environment(),
+            "iterations": iterations,
+            "paths": paths,
+            "p50_speedup": round(speedup, 2),
+            "identical_pixels": True,
+        }))
+
+    def _compare_pixels(self):
+        import base64
+        import io
+
+        import numpy as np
+        from PIL import Image
+
+        from api import pdf_generator
+
+        def pixels(data_uri):
+            image = Image.open(io.BytesIO(base64.b64decode(data_uri.split(',', 1)[1])))
+            return np.asarray(image.convert('RGB'))
+
+        return [
+            point for point in PIXEL_CHECK
+            if not np.array_equal(pixels(pdf_generator.render_scatter_plot(*point)),
+                                  pixels(pdf_generator.generate_scatter_plot(*point)))
+        ]
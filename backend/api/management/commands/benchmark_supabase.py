@@ -0,0 +1,71 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from api.benchmarks import environment, percentiles, timed
+from api.fake_supabase import FAKE_SERVICE_KEY, FakeSupabaseServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures per-request Supabase overhead (auth get_user + storage upload) with a client "
+        "built per request vs the pooled process-wide client, against a local stand-in server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--upload-kb', type=int, default=256, help="Size of the fake X-ray upload")
+
+    def handle(self, *args, **options):
+        from supabase import create_client
+        from api import supabase_client
+        from api.storage import upload_bytes_to_supabase
+
+        n = options['requests']
+        payload = b'\0' * (options['upload_kb'] * 1024)
+        server = FakeSupabaseServer().start()
+        report = {"environment": environment(), "requests": n, "server": server.url}
+
+        try:
+            with override_settings(SUPABASE_URL=server.url, SUPABASE_KEY=FAKE_SERVICE_KEY):
+                # Before: what authentication.py and storage.py used to do per request
+                def per_request_auth():
+                    create_client(server.url, FAKE_SERVICE_KEY).auth.get_user("bench-token")
+
+                def per_request_upload():
+                    client = create_client(server.url, FAKE_SERVICE_KEY)
+                    client.storage.from_("xrays").upload(
+                        file=payload, path="bench.png", file_options={"content-type": "image/png"}
+                    )
+
+                report["per_request_client"] = self._measure(server, n, per_request_auth, per_request_upload)
+
+                # After: shared pooled client
+                supabase_client.reset_supabase()
+
+                def pooled_auth():
+                    supabase_client.get_supabase().auth.get_user("bench-token")
+
+                def pooled_upload():
+                    upload_bytes_to_supabase(payload, "bench.png", "image/png")
+
+                report["pooled_client"] = self._measure(server, n, pooled_auth, pooled_upload)
+                supabase_client.reset_supabase()
+        finally:
+            server.stop()
+
+        before = report["per_request_client"]["auth_ms"]["p50"]
+        after = report["pooled_client"]["auth_ms"]["p50"]
+        report["auth_p50_speedup"] = round(before / after, 2) if after else None
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _measure(self, server, n, auth_fn, upload_fn):
+        connections_before = server.stats['connections']
+        result = {
+            "auth_ms": percentiles(timed(auth_fn, n)),
+            "upload_ms": percentiles(timed(upload_fn, n)),
+        }
+        # Includes the warmup call for each of the two operations
+        result["tcp_connections"] = server.stats['connections'] - connections_before
+        return result
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api import query_plans
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a large synthetic dataset inside a transaction that is rolled back, then "
+        "EXPLAINs the dashboard, history and appointment queries and fails if any of them "
+        "doesn't use its index. Works on SQLite and PostgreSQL. The test suite runs the "
+        "same checks on a smaller seed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--results', type=int, default=50000)
+        parser.add_argument('--appointments', type=int, default=10000)
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"Unsupported database vendor: {connection.vendor}")
+
+        failures = []
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                sample = query_plans.seed(options['patients'], options['results'], options['appointments'])
+                self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s; analyzing...")
+                query_plans.analyze()
+                for name, queryset, expected in query_plans.checks(sample):
+                    plan, used, failure = query_plans.check(name, queryset, expected)
+                    if options['verbose_plans'] or failure:
+                        self.stdout.write(f"--- {name}\n{plan}")
+                    if failure:
+                        failures.append(failure)
+                    else:
+                        self.stdout.write(f"✅ {name}: {used}")
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+        if failures:
+            raise CommandError("Query plan regressions:\n" + "\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("All query plans use their indexes."))
@@ -0,0 +1,131 @@
+import json
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ml_engine import IMG_SIZE, _interpret, _load_into
+from api.model_registry import MODEL_PATH
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class Command(BaseCommand):
+    help = (
+        "Converts model/efficientnet_b0.h5 to float16 and int8 TFLite models, calibrating on "
+        "a directory of sample X-rays, and writes an agreement report against the Keras model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calibration-dir', required=True, help="Directory of sample X-ray images")
+        parser.add_argument('--eval-dir', help="Images for the agreement report (default: calibration dir)")
+        parser.add_argument('--out-dir', default=os.path.dirname(MODEL_PATH))
+        parser.add_argument('--max-samples', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=None, help="Interpreter threads for the report")
+
+    def handle(self, *args, **options):
+        import tensorflow as tf
+        from api.tflite_backend import TFLiteModel
+
+        calibration = self._load_images(options['calibration_dir'], options['max_samples'])
+        evaluation = calibration
+        if options['eval_dir']:
+            evaluation = self._load_images(options['eval_dir'], options['max_samples'])
+
+        keras_model = tf.keras.models.load_model(MODEL_PATH)
+        os.makedirs(options['out_dir'], exist_ok=True)
+        base = os.path.splitext(os.path.basename(MODEL_PATH))[0]
+
+        outputs = {
+            'float16': os.path.join(options['out_dir'], f"{base}_fp16.tflite"),
+            'int8': os.path.join(options['out_dir'], f"{base}_int8.tflite"),
+        }
+
+        # float16: weights stored as fp16, compute stays float32 on CPU
+        converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+        self._write(outputs['float16'], converter.convert())
+
+        # int8: weights and activations quantized using calibration ranges.
+        # Input/output stay float32 so callers don't change.
+        def representative_dataset():
+            for row in calibration:
+                yield [row[np.newaxis, ...]]
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+            tf.lite.OpsSet.TFLITE_BUILTINS,
+        ]
+        self._write(outputs['int8'], converter.convert())
+
+        # Agreement report against the Keras model
+        reference, keras_ms = self._run(keras_model, evaluation)
+        report = {
+            'keras_model': MODEL_PATH,
+            'samples': len(evaluation),
+            'keras': {
+                'size_mb': round(os.path.getsize(MODEL_PATH) / 1e6, 2),
+                'mean_latency_ms': keras_ms,
+            },
+        }
+        for name, path in outputs.items():
+            predictions, latency_ms = self._run(TFLiteModel(path, num_threads=options['threads']), evaluation)
+            report[name] = dict(
+                path=path,
+                size_mb=round(os.path.getsize(path) / 1e6, 2),
+                mean_latency_ms=latency_ms,
+                **self._agreement(reference, predictions),
+            )
+
+        report_path = os.path.join(options['out_dir'], f"{base}_tflite_report.json")
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Report written to {report_path}"))
+
+    def _load_images(self, directory, limit):
+        if not os.path.isdir(directory):
+            raise CommandError(f"Not a directory: {directory}")
+        paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )[:limit]
+        if not paths:
+            raise CommandError(f"No images found in {directory}")
+
+        batch = np.empty((len(paths), IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+        for row, path in zip(batch, paths):
+            with open(path, 'rb') as f:
+                _load_into(f, row)
+        np.divide(batch, 255.0, out=batch)
+        return batch
+
+    def _run(self, model, images):
+        # One image per call: that's the latency a single /predict/ request sees
+        outputs = []
+        started = time.perf_counter()
+        for row in images:
+            outputs.append(np.asarray(model.predict(row[np.newaxis, ...], verbose=0))[0])
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(images)
+        return np.stack(outputs), round(elapsed_ms, 2)
+
+    def _agreement(self, reference, predictions):
+        ref = [_interpret(p) for p in reference]
+        got = [_interpret(p) for p in predictions]
+        diff = np.abs(reference - predictions)
+        return {
+            'result_agreement': round(sum(a[0] == b[0] for a, b in zip(ref, got)) / len(ref), 4),
+            'risk_level_agreement': round(sum(a[2] == b[2] for a, b in zip(ref, got)) / len(ref), 4),
+            'mean_abs_prob_diff': round(float(diff.mean()), 5),
+            'max_abs_prob_diff': round(float(diff.max()), 5),
+        }
+
+    def _write(self, path, content):
+        with open(path, 'wb') as f:
+            f.write(content)
+        self.stdout.write(f"Wrote {path} ({len(content) / 1e6:.2f} MB)")
@@ -0,0 +1,77 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Each probe runs in a fresh interpreter so nothing is already imported.
+IMPORT_PROBE = """
+import os, resource, sys, time, json
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'respirex_backend.settings')
+import django
+django.setup()
+import api.urls
+elapsed = time.perf_counter() - started
+heavy = [m for m in ('tensorflow', 'matplotlib', 'xhtml2pdf', 'sendgrid', 'supabase') if m in sys.modules]
+print(json.dumps({
+    'import_ms': elapsed * 1000,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules_loaded': heavy,
+}))
+"""
+
+COLD_START_PROBE = """
+import os, resource, time, json
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'respirex_backend.settings')
+import django
+django.setup()
+from api.model_registry import warmup
+timings = warmup(batch_sizes=(1,))
+started = time.perf_counter()
+from api.model_registry import get_model
+import numpy as np
+model = get_model()
+if model is not None:
+    model.predict(np.zeros((1, 128, 128, 3), dtype=np.float32), verbose=0)
+timings['second_predict_batch_1_ms'] = round((time.perf_counter() - started) * 1000, 1)
+timings['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(timings))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measures Django import time and model cold-start in fresh interpreters; prints JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Import-time repetitions (median reported)")
+        parser.add_argument('--skip-model', action='store_true', help="Only measure import time")
+
+    def _probe(self, code):
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+        out = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        # The probe's JSON is always the last line; model loading may print before it
+        return json.loads(out.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        runs = [self._probe(IMPORT_PROBE) for _ in range(max(1, options['runs']))]
+        report = {
+            'python': sys.version.split()[0],
+            'import': {
+                'runs': len(runs),
+                'median_ms': round(statistics.median(r['import_ms'] for r in runs), 1),
+                'min_ms': round(min(r['import_ms'] for r in runs), 1),
+                'max_rss_mb': round(max(r['max_rss_mb'] for r in runs), 1),
+                'heavy_modules_loaded': runs[-1]['heavy_modules_loaded'],
+            },
+        }
+        if not options['skip_model']:
+            report['cold_start'] = self._probe(COLD_START_PROBE)
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import daily_stats, public_stats, response_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the DailyScreeningStats summary from TestResult. Run after bulk "
+        "imports or QuerySet.update() calls, which bypass the incremental signals. "
+        "Also reconciles the cached /api/stats/ counters and drops cached dashboard/history responses."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        buckets = daily_stats.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} daily stats buckets in {elapsed:.2f}s"))
+        response_cache.bump_all()
+        counts = public_stats.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Public stats counters: {counts}"))
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import report_cache
+from api.models import TestResult
+
+
+class Command(BaseCommand):
+    help = (
+        "Maintains stored PDF reports. prune: drop reports for deleted results and "
+        "superseded renders. purge: drop stored reports. regenerate: render and store "
+        "reports again (e.g. after bumping REPORT_TEMPLATE_VERSION)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['prune', 'purge', 'regenerate'])
+        parser.add_argument('--ids', help="Only these TestResult ids, e.g. 12,15 (default: all)")
+
+    def handle(self, *args, **options):
+        if not report_cache.is_enabled():
+            raise CommandError("REPORT_CACHE_ENABLED is off")
+        try:
+            ids = [int(v) for v in options['ids'].split(',') if v.strip()] if options['ids'] else None
+        except ValueError:
+            raise CommandError("--ids takes comma-separated integers")
+
+        started = time.perf_counter()
+        getattr(self, options['action'])(ids)
+        self.stdout.write(f"Done in {time.perf_counter() - started:.2f}s")
+
+    def _stored_ids(self, ids):
+        return ids if ids is not None else report_cache.get_store().result_ids()
+
+    def _results(self, ids):
+        results = TestResult.objects.select_related('patient__user').order_by('id')
+        return results.filter(id__in=ids) if ids is not None else results
+
+    def purge(self, ids):
+        stored = self._stored_ids(ids)
+        for result_id in stored:
+            report_cache.delete(result_id)
+        self.stdout.write(self.style.SUCCESS(f"Purged stored reports for {len(stored)} results"))
+
+    def prune(self, ids):
+        store = report_cache.get_store()
+        stored = self._stored_ids(ids)
+        current = {result.id: report_cache.current_key(result) for result in self._results(stored).iterator()}
+        removed = 0
+        for result_id in stored:
+            stale = [key for key in store.keys(result_id) if key != current.get(result_id)]
+            store.delete(stale)
+            removed += len(stale)
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} stale reports"))
+
+    def regenerate(self, ids):
+        cached = skipped = failed = 0
+        for result in self._results(ids).iterator():
+            try:
+                if report_cache.regenerate(result):
+                    cached += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"⚠️ Report {result.id}: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Regenerated {cached} reports ({skipped} left uncached: X-ray unavailable, {failed} failed)"
+        ))
+        if failed:
+            raise CommandError(f"{failed} reports failed to render")
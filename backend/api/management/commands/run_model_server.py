@@ -0,0 +1,46 @@
+import os
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.model_registry import warmup
+from api.model_server import create_server
+
+
+def _exit(signum, frame):
+    # Unwinds serve_forever() so the socket file is removed on `docker stop`
+    raise SystemExit(0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the shared inference server: one process owns the X-ray model and web "
+        "workers (with ML_SERVER_SOCKET set) send it preprocessed batches over a Unix socket."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=getattr(settings, 'ML_SERVER_SOCKET', None))
+
+    def handle(self, *args, **options):
+        path = options['socket']
+        if not path:
+            raise CommandError("Pass --socket or set ML_SERVER_SOCKET")
+
+        # Load and trace the model before accepting connections
+        warmup(batch_sizes=sorted({1, getattr(settings, 'ML_BATCH_MAX_SIZE', 16)}))
+
+        server = create_server(path)
+        # Web workers run as the same user in the container; keep others out
+        os.chmod(path, 0o660)
+        signal.signal(signal.SIGTERM, _exit)
+
+        self.stdout.write(self.style.SUCCESS(f"🧠 Model server listening on {path}"))
+        try:
+            server.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            server.server_close()
+            if os.path.exists(path):
+                os.unlink(path)
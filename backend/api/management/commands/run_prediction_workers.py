@@ -0,0 +1,40 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from api.prediction_jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Runs background workers that process prediction jobs submitted with mode=async."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Worker threads in this process")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write("Stopping after current jobs...")
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        threads = [
+            threading.Thread(
+                target=run_worker, args=(stop_event, options['poll_interval']),
+                name=f"prediction-worker-{i}", daemon=True
+            )
+            for i in range(max(1, options['workers']))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(self.style.SUCCESS(f"⚙️ {len(threads)} prediction worker(s) running"))
+
+        # Join with a timeout so the main thread stays responsive to signals
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1.0)
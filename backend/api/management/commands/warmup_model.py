@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.model_registry import warmup
+
+
+class Command(BaseCommand):
+    help = "Loads the X-ray model and runs dummy inferences so the first request is not slow."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-sizes', default=None,
+            help="Comma-separated batch sizes to trace (default: 1 and ML_BATCH_MAX_SIZE)"
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_sizes']:
+            sizes = [int(s) for s in options['batch_sizes'].split(',') if s.strip()]
+        else:
+            sizes = sorted({1, getattr(settings, 'ML_BATCH_MAX_SIZE', 16)})
+
+        timings = warmup(batch_sizes=sizes)
+        if len(timings) == 1:
+            self.stdout.write(self.style.WARNING("Model unavailable; running in dummy mode."))
+        for name, value in timings.items():
+            self.stdout.write(f"{name}: {value}")
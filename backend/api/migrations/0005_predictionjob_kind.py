@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-17 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_predictionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='kind',
+            field=models.CharField(choices=[('predict', 'Predict'), ('upload', 'Upload')], default='predict', max_length=10),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.11 on 2026-10-17 15:05
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def populate(apps, schema_editor):
+    # Same as daily_stats.rebuild(), against the historical models
+    TestResult = apps.get_model('api', 'TestResult')
+    DailyScreeningStats = apps.get_model('api', 'DailyScreeningStats')
+    rows = (
+        TestResult.objects.annotate(day=TruncDate('date_tested'))
+        .values('day', 'patient__state', 'patient__city', 'result', 'risk_level')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    DailyScreeningStats.objects.bulk_create([
+        DailyScreeningStats(
+            date=row['day'],
+            state=row['patient__state'] or '',
+            city=row['patient__city'] or '',
+            result=row['result'],
+            risk_level=row['risk_level'],
+            count=row['n'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_predictionjob_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyScreeningStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('result', models.CharField(max_length=20)),
+                ('risk_level', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyscreeningstats',
+            constraint=models.UniqueConstraint(fields=('date', 'state', 'city', 'result', 'risk_level'), name='api_daily_stats_bucket_uniq'),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.11 on 2026-10-17 15:16
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+# Frozen copy of the scoring in api/scoring.py when this migration was written,
+# so later changes there don't change what the backfill writes on a fresh database.
+SYMPTOM_QUESTIONS = 8
+DERIVED = ['composite_score', 'risk_level', 'symptom_score']
+
+
+def effective_risk_level(result, confidence_score):
+    if result == 'Negative':
+        return 'Low'
+    if confidence_score > 80:
+        return 'High'
+    elif confidence_score >= 50:
+        return 'Medium'
+    return 'Low'
+
+def symptom_score(symptoms_data):
+    if not isinstance(symptoms_data, dict):
+        return 0
+    yes_count = sum(1 for ans in symptoms_data.values() if isinstance(ans, str) and ans.lower() == 'yes')
+    return (yes_count / SYMPTOM_QUESTIONS) * 100
+
+def composite_score(confidence_score, symptom_score):
+    return (confidence_score + symptom_score) / 2
+
+def apply_scores(result):
+    confidence = float(result.confidence_score)
+    result.risk_level = effective_risk_level(result.result, confidence)
+    result.symptom_score = symptom_score(result.symptoms_data)
+    result.composite_score = composite_score(confidence, result.symptom_score)
+    return result
+
+
+def backfill(apps, schema_editor):
+    # Historical models don't run TestResult.save(), so apply the scoring here.
+    # This also corrects stored risk levels, which moves rows between daily buckets.
+    TestResult = apps.get_model('api', 'TestResult')
+    DailyScreeningStats = apps.get_model('api', 'DailyScreeningStats')
+
+    batch = []
+    for result in TestResult.objects.only('id', 'result', 'confidence_score', 'symptoms_data').iterator(chunk_size=2000):
+        batch.append(apply_scores(result))
+        if len(batch) >= 2000:
+            TestResult.objects.bulk_update(batch, DERIVED)
+            batch = []
+    if batch:
+        TestResult.objects.bulk_update(batch, DERIVED)
+
+    # Same as daily_stats.rebuild(), against the historical models
+    DailyScreeningStats.objects.all().delete()
+    rows = (
+        TestResult.objects.annotate(day=TruncDate('date_tested'))
+        .values('day', 'patient__state', 'patient__city', 'result', 'risk_level')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    DailyScreeningStats.objects.bulk_create([
+        DailyScreeningStats(
+            date=row['day'],
+            state=row['patient__state'] or '',
+            city=row['patient__city'] or '',
+            result=row['result'],
+            risk_level=row['risk_level'],
+            count=row['n'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testresult',
+            name='composite_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testresult',
+            name='symptom_score',
+            field=models.FloatField(default=0),
+        ),
+        # Before the indexes, so they're built once over the final values
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['risk_level', '-date_tested', '-id'], name='api_result_risk_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['-symptom_score', '-id'], name='api_result_symptom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testresult',
+            index=models.Index(fields=['-composite_score', '-id'], name='api_result_composite_idx'),
+        ),
+    ]
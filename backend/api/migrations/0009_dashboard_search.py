@@ -0,0 +1,50 @@
+# Generated by Django 4.2.11 on 2026-10-17 15:23
+
+from django.db import DatabaseError, migrations, models, transaction
+import django.db.models.functions.text
+
+# filters.search_patients() uses __icontains, which PostgreSQL compiles to
+# UPPER(col::text) LIKE UPPER('%...%'); these trigram indexes are on exactly
+# that expression. Other databases have no trigram indexes, and search there
+# scans the profile and user tables instead.
+TRIGRAM_INDEXES = (
+    ('api_profile_name_trgm_idx', 'api_userprofile', 'full_name'),
+    ('api_user_email_trgm_idx', 'auth_user', 'email'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except DatabaseError as e:
+        print(f"⚠️ pg_trgm unavailable, patient search will not be indexed: {e}")
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)"
+        )
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_derived_scores'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(django.db.models.functions.text.Lower('city'), name='api_profile_city_lower_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.11 on 2026-10-17 16:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_predictionjob_not_before'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='predictionjob',
+            name='test_result',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='api.testresult'),
+        ),
+    ]
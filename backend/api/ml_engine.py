@@ -1,69 +1,212 @@
-import os
+import io
+import threading
 import numpy as np
-import tensorflow as tf
 from PIL import Image
 from django.conf import settings
 
-# Define the path to the model
-MODEL_PATH = os.path.join(settings.BASE_DIR, 'model', 'efficientnet_b0.h5')
-model = None
+from . import model_server, prediction_cache
+from .batching import MicroBatcher
+from .instrumentation import span
+from .model_registry import current
 
-# Load the model once when the server starts
-try:
-    model = tf.keras.models.load_model(MODEL_PATH)
-    print("✅ ML Model Loaded Successfully")
-except Exception as e:
-    print(f"⚠️ ML Model not found or error loading: {e}. Using dummy mode.")
+# Concurrent requests are grouped into one forward pass (see batching.py)
+_batcher = None
+_batcher_lock = threading.Lock()
 
-def predict_xray(image_file):
+def get_batcher():
+    global _batcher
+    if not getattr(settings, 'ML_BATCHING_ENABLED', True):
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    _run_current_model,
+                    max_batch_size=getattr(settings, 'ML_BATCH_MAX_SIZE', 16),
+                    max_wait_ms=getattr(settings, 'ML_BATCH_MAX_WAIT_MS', 10),
+                    tagged=True,
+                )
+    return _batcher
+
+def get_batching_stats():
+    """Batch-size and queue-wait stats used to tune ML_BATCH_MAX_WAIT_MS."""
+    return _batcher.stats() if _batcher else None
+
+def _run_current_model(batch):
+    # Model and version resolved together when the batch runs, so a reloaded
+    # model is picked up and its output is never filed under the old version
+    model, version = current()
+    if model is None:
+        raise RuntimeError("ML model is not loaded")
+    return model.predict(batch, verbose=0), version
+
+def predict_in_process(batch):
     """
-    Predicts if an X-ray image is Positive (Tuberculosis) or Negative (Normal).
+    Runs a normalized (n, 128, 128, 3) batch through the model loaded in this
+    process, via the micro-batcher when enabled.
+    Returns (predictions, version of the model that produced them).
     """
-    if not model:
-        # Dummy fallback if model didn't load
-        return "Negative", 85.5, "Low" 
-        
-    try:
-        # 1. Load and Preprocess Image
-        # Convert to RGB to ensure 3 channels
-        img = Image.open(image_file).convert('RGB')
-        
-        # Resize to 128x128 (Must match your training notebook size)
-        img = img.resize((128, 128))
-        
-        # Convert to array and add batch dimension
-        img_array = tf.keras.preprocessing.image.img_to_array(img)
-        img_array = np.expand_dims(img_array, axis=0)
-        
-        # CRITICAL FIX: Normalize pixel values to 0-1 range
-        img_array = img_array / 255.0
-        
-        # 2. Make Prediction
-        # Expected output shape: [[prob_normal, prob_tb]]
-        prediction = model.predict(img_array)
-        
-        # Get the class with the highest probability
-        # Class 0 = Normal, Class 1 = Tuberculosis
-        class_idx = np.argmax(prediction, axis=1)[0]
-        confidence = float(np.max(prediction))
-        
-        # 3. Interpret Results
-        if class_idx == 1:
-            result = "Positive"  # Tuberculosis detected
-            
-            if confidence > 0.8:
-                risk_level = "High"
-            elif confidence >= 0.5:
-                risk_level = "Medium"
-            else:
-                risk_level = "Low"
+    batcher = get_batcher()
+    if batcher:
+        return batcher.predict(batch)
+    return _run_current_model(batch)
+
+def _select_engine():
+    """
+    Picks where inference runs for this call: the shared model server when
+    ML_SERVER_SOCKET is set and reachable, otherwise this process.
+    Returns (predict_fn, model_version), or (None, "dummy") if no model is available.
+    predict_fn returns (predictions, version) with the version of the model that
+    ran, which differs from model_version if the model was swapped in between.
+    """
+    client = model_server.get_client()
+    if client is not None:
+        try:
+            version = client.model_version()
+            if version != "dummy":
+                return _server_predict(client), version
+        except model_server.ModelServerUnavailable as e:
+            print(f"⚠️ Model server unavailable ({e}); using in-process inference.")
+
+    # Model and version from one snapshot, so a reload can't split them
+    model, version = current()
+    if model is None:
+        return None, "dummy"
+    return predict_in_process, version
+
+def _server_predict(client):
+    def predict(batch):
+        try:
+            return client.predict(batch)
+        except model_server.ModelServerUnavailable as e:
+            print(f"⚠️ Model server unavailable ({e}); using in-process inference.")
+            return predict_in_process(batch)
+    return predict
+
+# Input size the network was trained on (see training notebook)
+IMG_SIZE = (128, 128)
+
+def _decode(image_file):
+    """
+    Opens and decodes one image as RGB, at reduced scale where the format allows.
+    """
+    img = Image.open(image_file)
+
+    # For JPEGs, ask libjpeg to decode at a reduced scale (1/2 .. 1/8) so we
+    # don't decode megapixels of a radiograph only to throw them away.
+    img.draft('RGB', IMG_SIZE)
+
+    # Convert to RGB to ensure 3 channels
+    return img.convert('RGB')
+
+def _resize_into(img, out):
+    """
+    Resizes a decoded image and writes it straight into `out` (a 128x128x3 float32 slice).
+    """
+    # Resize to 128x128; reducing_gap lets PIL box-reduce large images first
+    img = img.resize(IMG_SIZE, reducing_gap=3.0)
+
+    out[...] = np.asarray(img, dtype=np.float32)
+
+def _load_into(image_file, out):
+    _resize_into(_decode(image_file), out)
+
+def _interpret(prediction):
+    """
+    Maps one [prob_normal, prob_tb] row to (result, confidence, risk_level).
+    """
+    # Class 0 = Normal, Class 1 = Tuberculosis
+    class_idx = int(np.argmax(prediction))
+    confidence = float(np.max(prediction))
+
+    if class_idx == 1:
+        result = "Positive"  # Tuberculosis detected
+
+        if confidence > 0.8:
+            risk_level = "High"
+        elif confidence >= 0.5:
+            risk_level = "Medium"
         else:
-            result = "Negative"  # Normal
             risk_level = "Low"
+    else:
+        result = "Negative"  # Normal
+        risk_level = "Low"
+
+    return (result, round(confidence * 100, 2), risk_level)
+
+def predict_xray_batch(image_files):
+    """
+    Predicts a list of X-ray images with a single forward pass.
+
+    Returns one (result, confidence, risk_level) tuple per input, in order.
+    Images that fail to decode get ("Error", 0.0, "Low") without affecting the rest.
+    Images already seen with the current model version are served from
+    prediction_cache without running inference.
+    """
+    predict, version = _select_engine()
+    if predict is None:
+        # Dummy fallback if model didn't load
+        return [("Negative", 85.5, "Low") for _ in image_files]
+
+    results = [("Error", 0.0, "Low")] * len(image_files)
+
+    # 1. Answer repeat uploads of the same image from the prediction cache
+    use_cache = prediction_cache.is_enabled()
+    pending = []
+    for idx, image_file in enumerate(image_files):
+        digest = None
+        if use_cache:
+            data = image_file.read()
+            digest = prediction_cache.digest(data)
+            cached = prediction_cache.get(prediction_cache.make_key(digest, version))
+            if cached is not None:
+                results[idx] = cached
+                continue
+            image_file = io.BytesIO(data)
+        pending.append((idx, digest, image_file))
 
-        return (result, round(confidence * 100, 2), risk_level)
+    if not pending:
+        return results
 
+    # 2. Decode the rest into one preallocated NHWC batch
+    batch = np.empty((len(pending), IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+    decoded = []
+    with span('preprocess'):
+        for idx, digest, image_file in pending:
+            try:
+                _load_into(image_file, batch[len(decoded)])
+                decoded.append((idx, digest))
+            except Exception as e:
+                print(f"❌ Error processing image: {e}")
+
+    if not decoded:
+        return results
+
+    # Only the rows that decoded; a view, not a copy
+    batch = batch[:len(decoded)]
+
+    # CRITICAL FIX: Normalize pixel values to 0-1 range (in place)
+    with span('preprocess'):
+        np.divide(batch, 255.0, out=batch)
+
+    # 3. Make Prediction
+    # Expected output shape: [[prob_normal, prob_tb], ...]
+    try:
+        with span('inference'):
+            predictions, ran_version = predict(batch)
     except Exception as e:
-        print(f"❌ Error processing image: {e}")
-        # Return error state or safe default
-        return "Error", 0.0, "Low"
\ No newline at end of file
+        print(f"❌ Error running inference: {e}")
+        return results
+
+    # 4. Interpret Results, cached under the version that actually produced them
+    for (idx, digest), prediction in zip(decoded, predictions):
+        results[idx] = _interpret(prediction)
+        if digest and ran_version != "dummy":
+            prediction_cache.set(prediction_cache.make_key(digest, ran_version), results[idx])
+    return results
+
+def predict_xray(image_file):
+    """
+    Predicts if an X-ray image is Positive (Tuberculosis) or Negative (Normal).
+    """
+    return predict_xray_batch([image_file])[0]
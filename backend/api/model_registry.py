@@ -0,0 +1,153 @@
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+
+# Define the path to the model
+MODEL_PATH = getattr(settings, 'ML_MODEL_PATH', None) or os.path.join(settings.BASE_DIR, 'model', 'efficientnet_b0.h5')
+
+# Quantized model produced by `manage.py convert_tflite`, used when ML_BACKEND='tflite'
+TFLITE_MODEL_PATH = getattr(settings, 'ML_TFLITE_MODEL_PATH', None) or os.path.join(settings.BASE_DIR, 'model', 'efficientnet_b0_fp16.tflite')
+
+_lock = threading.Lock()
+# (model, version), replaced as one tuple so no reader ever pairs a new model
+# with the old version (cached predictions are keyed by the version)
+_current = (None, None)
+_loaded = False
+_signature = None
+_last_check = 0.0
+
+def get_model():
+    """
+    Returns the EfficientNet model, loading TensorFlow and the weights on first use.
+    Returns None (dummy mode) if the model cannot be loaded.
+
+    If the model file is swapped on disk it is reloaded, checked at most once
+    every ML_MODEL_RELOAD_CHECK_SECONDS (0 disables the check).
+    """
+    return current()[0]
+
+def current():
+    """The loaded model and its version, as one consistent pair (see get_model)."""
+    if _loaded and not _file_changed():
+        return _current
+
+    with _lock:
+        # Re-checked under the lock so concurrent callers reload only once
+        if not _loaded or _file_signature() != _signature:
+            _reload()
+    return _current
+
+def is_loaded():
+    return _loaded
+
+def register_model(model, version):
+    """
+    Installs an already-built model (e.g. a randomly initialized network for
+    benchmarks) in place of loading the weights file.
+    """
+    global _current, _loaded, _signature
+    with _lock:
+        _current = (model, version)
+        _signature = _file_signature()
+        _loaded = True
+
+def model_version():
+    """
+    Content hash of the weights file backing the loaded model ("dummy" if none).
+    Anything derived from model output (e.g. cached predictions) should key on this.
+    """
+    return current()[1]
+
+def backend():
+    return getattr(settings, 'ML_BACKEND', 'keras')
+
+def model_path():
+    """Path of the weights file for the configured backend."""
+    return TFLITE_MODEL_PATH if backend() == 'tflite' else MODEL_PATH
+
+def _file_signature():
+    try:
+        stat = os.stat(model_path())
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def _file_changed():
+    global _last_check
+    interval = getattr(settings, 'ML_MODEL_RELOAD_CHECK_SECONDS', 30)
+    if not interval:
+        return False
+    now = time.monotonic()
+    if now - _last_check < interval:
+        return False
+    _last_check = now
+    return _file_signature() != _signature
+
+def _file_digest():
+    digest = hashlib.sha256()
+    with open(model_path(), 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def _reload():
+    global _current, _loaded, _signature, _last_check
+    _signature = _file_signature()
+    _last_check = time.monotonic()
+    # Both built first, then published together
+    model = _load_model()
+    version = _file_digest() if model is not None else "dummy"
+    _current = (model, version)
+    _loaded = True
+
+def _load_model():
+    try:
+        if backend() == 'tflite':
+            from .tflite_backend import TFLiteModel
+
+            model = TFLiteModel(TFLITE_MODEL_PATH, num_threads=getattr(settings, 'ML_NUM_THREADS', None))
+            print(f"✅ ML Model Loaded Successfully (TFLite: {os.path.basename(TFLITE_MODEL_PATH)})")
+            return model
+
+        # Imported here so that manage.py commands (migrate, collectstatic, ...)
+        # don't pay for TensorFlow unless they actually need the model.
+        import tensorflow as tf
+
+        threads = getattr(settings, 'ML_NUM_THREADS', None)
+        if threads:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+
+        model = tf.keras.models.load_model(MODEL_PATH)
+        print("✅ ML Model Loaded Successfully")
+        return model
+    except Exception as e:
+        print(f"⚠️ ML Model not found or error loading: {e}. Using dummy mode.")
+        return None
+
+def warmup(batch_sizes=(1,)):
+    """
+    Loads the model and runs dummy inferences so the first real request
+    doesn't absorb model loading and graph tracing. Returns timings in ms.
+    """
+    import numpy as np
+    from .ml_engine import IMG_SIZE
+
+    timings = {}
+    started = time.perf_counter()
+    model = get_model()
+    timings['load_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    if model is None:
+        return timings
+
+    for size in batch_sizes:
+        dummy = np.zeros((size, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+        started = time.perf_counter()
+        model.predict(dummy, verbose=0)
+        timings[f'first_predict_batch_{size}_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    print(f"🔥 ML Model warmed up: {timings}")
+    return timings
@@ -0,0 +1,192 @@
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+# Wire format (all integers big-endian):
+#   request  'V'                                   -> model version
+#            'P' + !4I (n, h, w, c) + float32 data -> predictions
+#   response 'K' + payload  |  'E' + !I len + utf-8 error message
+#            version payload:     !I len + utf-8 string
+#            prediction payload:  !2I (rows, cols) + float32 data
+#                                 + !I len + utf-8 version of the model that ran
+
+_SHAPE4 = struct.Struct('!4I')
+_SHAPE2 = struct.Struct('!2I')
+_LEN = struct.Struct('!I')
+
+
+class ModelServerUnavailable(Exception):
+    pass
+
+
+class ModelServerError(ModelServerUnavailable):
+    """The server answered with an error ('E'); the connection itself is fine."""
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("model server closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _send_error(sock, message):
+    data = message.encode('utf-8')
+    sock.sendall(b'E' + _LEN.pack(len(data)) + data)
+
+
+# --- Client (used by ml_engine inside web workers) ---
+
+class ModelServerClient:
+    """
+    Sends preprocessed batches to the model server over a Unix socket.
+    Each thread keeps one persistent connection; any socket failure is
+    raised as ModelServerUnavailable, and an error reported by the server as
+    its subclass ModelServerError, so the caller can fall back either way.
+    """
+
+    def __init__(self, socket_path, timeout=30.0, version_ttl=5.0, retry_after=5.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.version_ttl = version_ttl
+        self.retry_after = retry_after
+        self._local = threading.local()
+        self._version = None
+        self._version_checked = 0.0
+        self._down_until = 0.0
+
+    def model_version(self):
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked > self.version_ttl:
+            payload = self._call(b'V')
+            (length,) = _LEN.unpack(payload[:_LEN.size])
+            self._version = payload[_LEN.size:_LEN.size + length].decode('utf-8')
+            self._version_checked = now
+        return self._version
+
+    def predict(self, batch):
+        """Returns (predictions, version of the server's model that produced them)."""
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self._call(b'P' + _SHAPE4.pack(*batch.shape) + batch.tobytes(), expect_predictions=True)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            try:
+                conn.connect(self.socket_path)
+            except OSError:
+                conn.close()
+                raise
+            self._local.conn = conn
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _call(self, message, expect_predictions=False):
+        if time.monotonic() < self._down_until:
+            raise ModelServerUnavailable("model server marked down")
+        try:
+            conn = self._connection()
+            conn.sendall(message)
+            status = _recv_exact(conn, 1)
+            if status == b'E':
+                (length,) = _LEN.unpack(_recv_exact(conn, _LEN.size))
+                raise ModelServerError(_recv_exact(conn, length).decode('utf-8'))
+            if expect_predictions:
+                rows, cols = _SHAPE2.unpack(_recv_exact(conn, _SHAPE2.size))
+                data = _recv_exact(conn, rows * cols * 4)
+                (length,) = _LEN.unpack(_recv_exact(conn, _LEN.size))
+                version = _recv_exact(conn, length).decode('utf-8')
+                return np.frombuffer(data, dtype=np.float32).reshape(rows, cols), version
+            (length,) = _LEN.unpack(_recv_exact(conn, _LEN.size))
+            return _LEN.pack(length) + _recv_exact(conn, length)
+        except (OSError, ConnectionError) as e:
+            # socket.timeout is an OSError too; the connection state is unknown, drop it
+            self._close()
+            self._down_until = time.monotonic() + self.retry_after
+            raise ModelServerUnavailable(str(e)) from e
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the shared client if ML_SERVER_SOCKET is configured, else None."""
+    global _client
+    path = getattr(settings, 'ML_SERVER_SOCKET', None)
+    if not path:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ModelServerClient(path, timeout=getattr(settings, 'ML_SERVER_TIMEOUT', 30.0))
+    return _client
+
+
+# --- Server (run with `manage.py run_model_server`) ---
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        from .ml_engine import predict_in_process
+        from .model_registry import model_version
+
+        sock = self.request
+        while True:
+            try:
+                kind = sock.recv(1)
+            except OSError:
+                return
+            if not kind:
+                return
+
+            try:
+                if kind == b'V':
+                    data = model_version().encode('utf-8')
+                    sock.sendall(b'K' + _LEN.pack(len(data)) + data)
+                elif kind == b'P':
+                    shape = _SHAPE4.unpack(_recv_exact(sock, _SHAPE4.size))
+                    size = int(np.prod(shape)) * 4
+                    batch = np.frombuffer(_recv_exact(sock, size), dtype=np.float32).reshape(shape)
+                    try:
+                        # Goes through the micro-batcher, so requests from all
+                        # web workers share forward passes.
+                        predictions, version = predict_in_process(batch)
+                        predictions = np.ascontiguousarray(predictions, dtype=np.float32)
+                    except Exception as e:
+                        _send_error(sock, f"inference failed: {e}")
+                        continue
+                    version = version.encode('utf-8')
+                    sock.sendall(b'K' + _SHAPE2.pack(*predictions.shape) + predictions.tobytes()
+                                 + _LEN.pack(len(version)) + version)
+                else:
+                    _send_error(sock, f"unknown request {kind!r}")
+                    return
+            except (OSError, ConnectionError):
+                return
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(socket_path):
+    # A stale socket file from a previous run would make bind() fail
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    return ModelServer(socket_path, _Handler)
@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
+from . import scoring
 
 class UserProfile(models.Model):
     ROLE_CHOICES = (('patient', 'Patient'), ('doctor', 'Doctor'))
@@ -24,6 +26,14 @@ class UserProfile(models.Model):
     age = models.IntegerField(null=True, blank=True)
     gender = models.CharField(max_length=20, blank=True)
 
+    class Meta:
+        indexes = [
+            # Case-insensitive state filter (filters.filter_state matches this expression)
+            models.Index(Lower('state'), name='api_profile_state_lower_idx'),
+            models.Index(Lower('city'), name='api_profile_city_lower_idx'),
+            # Name/email search adds PostgreSQL-only trigram indexes in migration 0009
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.role}"
 
@@ -43,6 +53,28 @@ class TestResult(models.Model):
     # Storing symptoms as a JSON object for flexibility
     symptoms_data = models.JSONField(default=dict)
 
+    # Derived on save (see scoring.py); risk_level above is corrected the same way
+    symptom_score = models.FloatField(default=0)
+    composite_score = models.FloatField(default=0)
+
+    class Meta:
+        # Match the keyset orderings in pagination.py: (date_tested, id), newest first
+        indexes = [
+            models.Index(fields=['-date_tested', '-id'], name='api_result_date_idx'),
+            models.Index(fields=['patient', '-date_tested', '-id'], name='api_result_patient_date_idx'),
+            models.Index(fields=['result', '-date_tested', '-id'], name='api_result_result_date_idx'),
+            models.Index(fields=['risk_level', '-date_tested', '-id'], name='api_result_risk_date_idx'),
+            models.Index(fields=['-symptom_score', '-id'], name='api_result_symptom_idx'),
+            models.Index(fields=['-composite_score', '-id'], name='api_result_composite_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        scoring.apply(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and scoring.INPUTS.intersection(update_fields):
+            kwargs['update_fields'] = set(update_fields) | scoring.DERIVED
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.patient.user.username} - {self.result} ({self.date_tested})"
 
@@ -62,5 +94,79 @@ class Appointment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'date_time', 'id'], name='api_appt_doctor_time_idx'),
+            models.Index(fields=['patient', 'date_time', 'id'], name='api_appt_patient_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"Appt: {self.patient.user.username} with {self.doctor.user.username} on {self.date_time}"
+
+class PredictionJob(models.Model):
+    """
+    An X-ray submitted with mode=async. The image is kept in the row until a
+    `run_prediction_workers` process claims the job, uploads it, runs inference
+    and links the resulting TestResult.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    )
+    # 'upload' jobs retry a storage upload for a TestResult whose prediction is already saved
+    KIND_CHOICES = (('predict', 'Predict'), ('upload', 'Upload'))
+
+    patient = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='prediction_jobs')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='predict')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+
+    # Upload payload (cleared once the job finishes; kept when an upload job
+    # fails for good, so it can be retried from the admin)
+    image_data = models.BinaryField(blank=True)
+    image_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    symptoms_data = models.JSONField(default=dict)
+
+    # Not one-to-one: an async predict job and the upload job retrying its X-ray share the result
+    test_result = models.ForeignKey(TestResult, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    # A failed attempt waits until then before it can be claimed again
+    not_before = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Workers claim the oldest pending job
+        indexes = [models.Index(fields=['status', 'created_at'], name='api_job_status_created_idx')]
+
+    def __str__(self):
+        return f"Job {self.id}: {self.patient.user.username} ({self.status})"
+
+class DailyScreeningStats(models.Model):
+    """
+    Number of TestResults per (day, patient state, city, result, risk level).
+    Kept up to date by signals on TestResult/UserProfile (see daily_stats.py),
+    so dashboard and public totals read O(days) rows instead of every result.
+    Rebuild with `python manage.py rebuild_daily_stats` after bulk edits.
+    """
+    date = models.DateField()
+    state = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    result = models.CharField(max_length=20)
+    risk_level = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'state', 'city', 'result', 'risk_level'], name='api_daily_stats_bucket_uniq'
+            )
+        ]
+
     def __str__(self):
-        return f"Appt: {self.patient.user.username} with {self.doctor.user.username} on {self.date_time}"
\ No newline at end of file
+        return f"{self.date} {self.state}/{self.city} {self.result} {self.risk_level}: {self.count}"
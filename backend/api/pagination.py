@@ -0,0 +1,91 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+# Keyset ("seek") pagination for the list endpoints.
+#
+# Rows are ordered by a sort key (a timestamp, or a score for the dashboard's
+# ?sort=) plus the primary key as a tie-breaker, and the cursor carries the
+# last row's (key, id). The next page is then
+#   WHERE ts <= cursor_ts AND (ts < cursor_ts OR id < cursor_id)
+#   ORDER BY ts DESC, id DESC LIMIT n
+# so page 1000 costs the same as page 1, unlike OFFSET.
+#
+# Cursors are opaque to clients: base64 of the JSON position.
+
+
+def is_requested(request):
+    """True when the client asked for a paginated response (?cursor= or ?page_size=)."""
+    params = request.query_params
+    return 'cursor' in params or 'page_size' in params
+
+def get_page_size(request):
+    default = getattr(settings, 'PAGINATION_PAGE_SIZE', 50)
+    maximum = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 200)
+    try:
+        size = int(request.query_params.get('page_size', default))
+    except (TypeError, ValueError):
+        raise ValidationError({"page_size": "Must be an integer."})
+    return max(1, min(size, maximum))
+
+def encode_cursor(value, pk):
+    # Timestamps as ISO 8601, numeric keys as JSON numbers (floats round-trip exactly)
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    position = json.dumps([value, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, numeric=False):
+    """Returns (value, pk); `numeric` for cursors over a number rather than a timestamp."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if numeric:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(cursor)
+        else:
+            value = parse_datetime(value)
+        if value is None or not isinstance(pk, int):
+            raise ValueError(cursor)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+    return value, pk
+
+def _is_numeric(queryset, field):
+    return queryset.model._meta.get_field(field).get_internal_type() in (
+        'FloatField', 'IntegerField', 'BigIntegerField', 'DecimalField'
+    )
+
+def paginate(queryset, request, field, descending=True):
+    """
+    Returns (rows, next_cursor) for one page of `queryset`, ordered by
+    (`field`, id) in the given direction. next_cursor is None on the last page.
+    """
+    direction = '-' if descending else ''
+    lookup = 'lt' if descending else 'gt'
+    queryset = queryset.order_by(f'{direction}{field}', f'{direction}id')
+
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        value, pk = decode_cursor(cursor, numeric=_is_numeric(queryset, field))
+        # The redundant leading range (ts <= cursor_ts) is what lets the planner
+        # seek into the (ts, id) index; the OR alone makes SQLite give up on it
+        queryset = queryset.filter(**{f'{field}__{lookup}e': value}).filter(
+            Q(**{f'{field}__{lookup}': value}) | Q(**{f'id__{lookup}': pk})
+        )
+
+    page_size = get_page_size(request)
+    # One extra row tells us whether there's a next page without a COUNT
+    rows = list(queryset[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    # Model instances, or dicts from a values() queryset
+    if isinstance(last, dict):
+        return rows, encode_cursor(last[field], last['id'])
+    return rows, encode_cursor(getattr(last, field), last.pk)
@@ -1,14 +1,24 @@
-import matplotlib
-matplotlib.use('Agg')  # Required for server-side plotting
-import matplotlib.pyplot as plt
-import matplotlib.patheffects as pe
 import numpy as np
 import io
 import base64
+import threading
 import requests
-from xhtml2pdf import pisa
 from django.template import Context, Template
 
+from .instrumentation import span
+
+# Bump whenever the report's layout, wording or chart changes; cached reports
+# (report_cache.py) rendered with an older template are then regenerated.
+REPORT_TEMPLATE_VERSION = 1
+
+def _pyplot():
+    # matplotlib and xhtml2pdf are imported on first report, not at startup,
+    # so manage.py commands and workers that never render a PDF skip them.
+    import matplotlib
+    matplotlib.use('Agg')  # Required for server-side plotting
+    import matplotlib.pyplot as plt
+    return plt
+
 def get_base64_image(url):
     """Fetches image from URL and converts to base64 for PDF embedding."""
     if not url: return None
@@ -21,12 +31,13 @@ def get_base64_image(url):
         return None
     return None
 
-def generate_scatter_plot(model_conf, symptom_score):
+def _draw_chart(fig, model_conf, symptom_score):
     """
-    Generates a Linear Regression style plot with a SCIENTIFIC GRID.
+    Generates a Linear Regression style plot with a SCIENTIFIC GRID on a
+    6x4in, 300-dpi figure. Returns (ax, patient_dot, guide_line).
     """
-    # 1. Setup Figure
-    fig, ax = plt.subplots(figsize=(6, 4), dpi=300)
+    # 1. Setup Axes
+    ax = fig.subplots()
 
     # 2. Formal Gridding (Scientific Look)
     ax.minorticks_on()
@@ -61,7 +72,7 @@ def generate_scatter_plot(model_conf, symptom_score):
     ax.plot(pop_x, pop_x * 0.3, color='#27ae60', linestyle='--', alpha=0.6, linewidth=1.5, zorder=4)
 
     # 4. Patient Dot (Red, Off the Line based on Risk)
-    ax.scatter(
+    patient_dot = ax.scatter(
         [symptom_score], 
         [model_conf], 
         c='#ef4444',   # Red
@@ -74,7 +85,7 @@ def generate_scatter_plot(model_conf, symptom_score):
 
     # 5. Visual Guide for Distance
     normal_y_at_x = symptom_score * 0.3
-    ax.plot(
+    guide_line, = ax.plot(
         [symptom_score, symptom_score], 
         [model_conf, normal_y_at_x], 
         color='#ef4444', 
@@ -93,36 +104,84 @@ def generate_scatter_plot(model_conf, symptom_score):
     ax.set_xlim(0, 105) 
     ax.set_ylim(0, 105)   
 
+    fig.tight_layout()
+    return ax, patient_dot, guide_line
+
+def render_scatter_plot(model_conf, symptom_score):
+    """The chart drawn from scratch: a whole figure per call. Kept as the benchmark baseline."""
+    plt = _pyplot()
+    fig = plt.figure(figsize=(6, 4), dpi=300)
+    _draw_chart(fig, model_conf, symptom_score)
+
     # 7. Save
     buffer = io.BytesIO()
-    plt.tight_layout()
     plt.savefig(buffer, format='png', facecolor='white', edgecolor='none')
     buffer.seek(0)
     plt.close(fig)
     
     return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
 
+# Everything but the patient's dot and guide line is the same in every report,
+# so the figure is drawn once per process and kept with a snapshot of its
+# pixels. Each chart restores the snapshot, draws the two patient artists on
+# top (blitting) and encodes the canvas: no figure, layout or population redraw.
+_chart = None
+_chart_lock = threading.Lock()
+
+def _chart_template():
+    global _chart
+    if _chart is None:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        # Not a pyplot figure: nothing to close, and it lives as long as the process
+        fig = Figure(figsize=(6, 4), dpi=300)
+        FigureCanvasAgg(fig)
+        ax, patient_dot, guide_line = _draw_chart(fig, 0, 0)
+        # Animated artists are skipped by draw() but still appear in the legend
+        patient_dot.set_animated(True)
+        guide_line.set_animated(True)
+        fig.canvas.draw()
+        background = fig.canvas.copy_from_bbox(fig.bbox)
+        _chart = (fig, ax, patient_dot, guide_line, background)
+    return _chart
+
+def generate_scatter_plot(model_conf, symptom_score):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    with _chart_lock:
+        fig, ax, patient_dot, guide_line, background = _chart_template()
+        canvas = fig.canvas
+        canvas.restore_region(background)
+        patient_dot.set_offsets([[symptom_score, model_conf]])
+        guide_line.set_data([symptom_score, symptom_score], [model_conf, symptom_score * 0.3])
+        # zorder: guide line (9) under the dot (10)
+        ax.draw_artist(guide_line)
+        ax.draw_artist(patient_dot)
+        width, height = canvas.get_width_height()
+        # The background is opaque white, so alpha carries nothing; the copy
+        # also frees the canvas for the next chart while this one is encoded
+        pixels = Image.frombuffer('RGBA', (width, height), canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1).convert('RGB')
+    # xhtml2pdf decodes the PNG straight away, so favour encode speed over size
+    pixels.save(buffer, format='png', compress_level=1)
+    
+    return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
+
 def generate_medical_pdf(test_result):
+    return render_report(test_result)[0]
+
+def render_report(test_result):
+    """
+    Returns (pdf_buffer, complete). `complete` is False when the X-ray couldn't
+    be fetched and the report went out without it, so it shouldn't be cached.
+    """
     # --- 1. Data Calculation ---
     model_conf = float(test_result.confidence_score)
-    symptoms = test_result.symptoms_data or {}
-    yes_count = sum(1 for ans in symptoms.values() if isinstance(ans, str) and ans.lower() == 'yes')
-    symptom_score = (yes_count / 8) * 100
-    mean_score = (model_conf + symptom_score) / 2
+    # Stored on save (see scoring.py), including the corrected risk level
+    symptom_score = test_result.symptom_score
+    mean_score = test_result.composite_score
+    current_risk_level = test_result.risk_level
     is_positive = test_result.result == 'Positive'
-
-    # --- DYNAMIC RISK RECALCULATION (Fix for PDF) ---
-    # This ensures old "Low" records show as "Medium" if score is 50-80%
-    if is_positive:
-        if model_conf > 80:
-            current_risk_level = "High"
-        elif model_conf >= 50:
-            current_risk_level = "Medium"
-        else:
-            current_risk_level = "Low"
-    else:
-        current_risk_level = "Low"
-    # ------------------------------------------------
     
     # --- 2. Theme Configuration ---
     theme_color = '#3498db'   
@@ -132,8 +191,10 @@ def generate_medical_pdf(test_result):
     status_text = 'POSITIVE FOR ABNORMALITIES' if is_positive else 'NO ABNORMALITIES DETECTED'
 
     # --- 3. Fetch Assets ---
-    xray_img_b64 = get_base64_image(test_result.xray_image_url)
-    scatter_plot_b64 = generate_scatter_plot(model_conf, symptom_score)
+    with span('pdf_fetch'):
+        xray_img_b64 = get_base64_image(test_result.xray_image_url)
+    with span('pdf_chart'):
+        scatter_plot_b64 = generate_scatter_plot(model_conf, symptom_score)
 
     # --- 4. Medication Logic ---
     if is_positive:
@@ -373,12 +434,15 @@ def generate_medical_pdf(test_result):
         'scatter_plot': scatter_plot_b64
     })
     
-    html = template.render(context)
-    result = io.BytesIO()
-    pisa_status = pisa.CreatePDF(io.BytesIO(html.encode("UTF-8")), dest=result)
+    with span('pdf_render'):
+        html = template.render(context)
+        from xhtml2pdf import pisa
+        result = io.BytesIO()
+        pisa_status = pisa.CreatePDF(io.BytesIO(html.encode("UTF-8")), dest=result)
     
     if pisa_status.err:
         raise Exception("PDF Generation Error")
         
     result.seek(0)
-    return result
\ No newline at end of file
+    complete = xray_img_b64 is not None or not test_result.xray_image_url
+    return result, complete
\ No newline at end of file
@@ -0,0 +1,81 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .cache_utils import TTLCache
+
+# Re-uploads of the same radiograph (network retries, form re-submits) are
+# answered from here instead of re-running preprocessing and inference.
+# Keys include the loaded model's version, so swapping the weights file
+# invalidates every entry, locally and in the shared tier.
+
+_local = TTLCache(
+    maxsize=getattr(settings, 'ML_PREDICTION_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'ML_PREDICTION_CACHE_TTL', 3600),
+)
+_counter_lock = threading.Lock()
+_counters = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+def is_enabled():
+    return getattr(settings, 'ML_PREDICTION_CACHE_ENABLED', True)
+
+def digest(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def make_key(image_digest, model_version):
+    return f"xray-pred:{model_version}:{image_digest}"
+
+def _shared_cache():
+    alias = getattr(settings, 'ML_PREDICTION_CACHE_SHARED_ALIAS', None)
+    return caches[alias] if alias else None
+
+def get(key):
+    """Returns the cached (result, confidence, risk_level) tuple, or None."""
+    value = _local.get(key)
+    if value is not None:
+        _count("local_hits")
+        return value
+
+    shared = _shared_cache()
+    if shared is not None:
+        try:
+            value = shared.get(key)
+        except Exception as e:
+            print(f"⚠️ Prediction cache (shared) unavailable: {e}")
+            value = None
+        if value is not None:
+            value = tuple(value)
+            _local.set(key, value)
+            _count("shared_hits")
+            return value
+
+    _count("misses")
+    return None
+
+def set(key, value):
+    _local.set(key, value)
+
+    shared = _shared_cache()
+    if shared is not None:
+        try:
+            shared.set(key, value, timeout=_local.ttl)
+        except Exception as e:
+            print(f"⚠️ Prediction cache (shared) unavailable: {e}")
+
+def clear():
+    _local.clear()
+
+def stats():
+    with _counter_lock:
+        counters = dict(_counters)
+    lookups = sum(counters.values())
+    hits = counters["local_hits"] + counters["shared_hits"]
+    counters["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+    counters["local"] = _local.stats()
+    return counters
+
+def _count(name):
+    with _counter_lock:
+        _counters[name] += 1
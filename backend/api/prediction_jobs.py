@@ -0,0 +1,241 @@
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import response_cache
+from .instrumentation import propagate, span
+from .models import PredictionJob, TestResult
+from .ml_engine import predict_xray
+from .storage import upload_bytes_to_supabase
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    # Created lazily so each forked gunicorn worker gets its own threads
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PREDICTION_IO_WORKERS', 4),
+                    thread_name_prefix='prediction-io'
+                )
+    return _executor
+
+def parse_symptoms(symptoms):
+    return json.loads(symptoms) if isinstance(symptoms, str) else symptoms
+
+def run_prediction(profile, image_bytes, image_name, content_type, symptoms):
+    """
+    Uploads the X-ray and runs inference concurrently, then stores the TestResult.
+    Shared by the synchronous PredictionView path and the background workers.
+
+    The prediction is never thrown away because of storage: if the upload fails
+    or takes longer than PREDICTION_UPLOAD_TIMEOUT, the TestResult is saved with
+    an empty xray_image_url and the upload is finished later (the in-flight
+    upload fills the URL in when it completes, otherwise an 'upload' job retries it).
+    """
+    with span('predict'):
+        # 1. Upload on the I/O pool while this thread runs inference
+        upload = _get_executor().submit(propagate(upload_bytes_to_supabase), image_bytes, image_name, content_type)
+
+        try:
+            result, confidence, risk_level = predict_xray(io.BytesIO(image_bytes))
+        except Exception:
+            upload.cancel()
+            raise
+
+        # 2. Collect the upload
+        image_url = ''
+        upload_error = None
+        try:
+            image_url = upload.result(timeout=getattr(settings, 'PREDICTION_UPLOAD_TIMEOUT', 15))
+        except FuturesTimeout:
+            upload_error = 'timeout'
+        except Exception as e:
+            upload_error = str(e)
+
+        # 3. Persist
+        with span('db_insert'):
+            test_record = TestResult.objects.create(
+                patient=profile,
+                xray_image_url=image_url,
+                result=result,
+                confidence_score=confidence,
+                risk_level=risk_level,
+                symptoms_data=symptoms
+            )
+
+    if upload_error == 'timeout':
+        print(f"⚠️ Upload for result {test_record.id} still running; URL will be filled in when it finishes")
+        # The callback runs inline if the upload has finished by now, so hand the
+        # work to the pool: _finish_late_upload closes its thread's DB connection.
+        upload.add_done_callback(lambda future: _get_executor().submit(
+            _finish_late_upload, future, test_record, image_bytes, image_name, content_type
+        ))
+    elif upload_error:
+        print(f"⚠️ Upload for result {test_record.id} failed ({upload_error}); queued for retry")
+        _enqueue_upload_retry(test_record, image_bytes, image_name, content_type, upload_error)
+
+    return test_record
+
+def _store_image_url(result_id, url):
+    TestResult.objects.filter(pk=result_id).update(xray_image_url=url)
+    # update() skips the post_save signal that bumps cached listings showing the URL
+    located = TestResult.objects.filter(pk=result_id).values_list('patient_id', 'patient__state').first()
+    if located:
+        patient_id, state = located
+        response_cache.bump(response_cache.GLOBAL, response_cache.state_scope(state),
+                            response_cache.patient_scope(patient_id))
+
+def _finish_late_upload(future, test_record, image_bytes, image_name, content_type):
+    try:
+        try:
+            url = future.result()
+        except Exception as e:
+            _enqueue_upload_retry(test_record, image_bytes, image_name, content_type, str(e))
+            return
+        _store_image_url(test_record.pk, url)
+    finally:
+        # Runs on an I/O pool thread, which Django's request cycle never cleans up
+        connection.close()
+
+def _enqueue_upload_retry(test_record, image_bytes, image_name, content_type, error):
+    return PredictionJob.objects.create(
+        kind='upload',
+        patient_id=test_record.patient_id,
+        test_result=test_record,
+        image_data=image_bytes,
+        image_name=image_name,
+        content_type=content_type or '',
+        symptoms_data=test_record.symptoms_data,
+        error=error
+    )
+
+def enqueue(profile, image_file, symptoms):
+    return PredictionJob.objects.create(
+        patient=profile,
+        image_data=image_file.read(),
+        image_name=image_file.name,
+        content_type=image_file.content_type or '',
+        symptoms_data=symptoms
+    )
+
+# --- Worker side ---
+
+def claim_next():
+    """
+    Claims the oldest pending job (or one whose worker died mid-run) and marks it running.
+    Returns None when the queue is empty.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=getattr(settings, 'PREDICTION_JOB_STALE_SECONDS', 300))
+    claimable = (
+        Q(status='pending') & (Q(not_before__isnull=True) | Q(not_before__lte=now))
+    ) | Q(status='running', started_at__lt=stale_before)
+
+    with transaction.atomic():
+        # skip_locked lets several workers poll without blocking on each other's
+        # rows (Postgres). Backends without row locks (SQLite) ignore it.
+        job = (
+            PredictionJob.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by('created_at')
+            .defer('image_data')
+            .first()
+        )
+        if job is None:
+            return None
+
+        # Compare-and-set so two workers can't both claim the same job where
+        # select_for_update is a no-op.
+        claimed = PredictionJob.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts).update(
+            status='running', started_at=timezone.now(), attempts=job.attempts + 1
+        )
+    if not claimed:
+        return None
+    return PredictionJob.objects.select_related('patient').get(pk=job.pk)
+
+def retry_delay(attempts):
+    """Seconds to wait after the given number of failed attempts: doubling, capped."""
+    base = getattr(settings, 'PREDICTION_JOB_RETRY_DELAY', 10)
+    return min(base * 2 ** max(0, attempts - 1), getattr(settings, 'PREDICTION_JOB_MAX_RETRY_DELAY', 600))
+
+def process(job):
+    try:
+        if job.kind == 'upload':
+            url = upload_bytes_to_supabase(bytes(job.image_data), job.image_name, job.content_type)
+            _store_image_url(job.test_result_id, url)
+            test_record = job.test_result
+        else:
+            test_record = run_prediction(
+                job.patient,
+                bytes(job.image_data),
+                job.image_name,
+                job.content_type,
+                job.symptoms_data
+            )
+    except Exception as e:
+        print(f"❌ Prediction job {job.id} failed (attempt {job.attempts}): {e}")
+        if job.attempts >= getattr(settings, 'PREDICTION_JOB_MAX_ATTEMPTS', 3):
+            failed = {'status': 'failed', 'error': str(e), 'finished_at': timezone.now()}
+            if job.kind != 'upload':
+                # An upload job's image is the only copy of the X-ray; keep it for a manual retry
+                failed['image_data'] = b''
+            PredictionJob.objects.filter(pk=job.pk).update(**failed)
+        else:
+            # Back off so a short storage outage doesn't use up every attempt at once
+            PredictionJob.objects.filter(pk=job.pk).update(
+                status='pending', error=str(e),
+                not_before=timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            )
+        return
+
+    PredictionJob.objects.filter(pk=job.pk).update(
+        status='done', test_result=test_record, error='', finished_at=timezone.now(), image_data=b''
+    )
+
+def run_worker(stop_event, poll_interval=1.0):
+    """Claims and processes jobs until stop_event is set."""
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            job = claim_next()
+        except Exception as e:
+            print(f"❌ Prediction worker could not claim a job: {e}")
+            job = None
+
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+        try:
+            process(job)
+        except Exception as e:
+            # process() records ordinary failures itself; this is a bug or a lost
+            # database. Fail the job rather than let the thread die, and don't
+            # hand it back to the queue: its TestResult may already exist.
+            print(f"❌ Prediction worker crashed on job {job.id}: {e}")
+            try:
+                PredictionJob.objects.filter(pk=job.pk, status='running').update(
+                    status='failed', error=f"worker error: {e}", finished_at=timezone.now()
+                )
+            except Exception as e:
+                print(f"❌ Could not mark job {job.id} failed: {e}")
+
+def wait_for(job, timeout):
+    """Long-poll helper: re-reads the job until it finishes or `timeout` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while job.status in ('pending', 'running') and time.monotonic() < deadline:
+        time.sleep(min(0.5, max(0.0, deadline - time.monotonic())))
+        job.refresh_from_db(fields=['status', 'test_result', 'error'])
+    return job
@@ -0,0 +1,78 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import daily_stats
+
+# Counters behind the unauthenticated /api/stats/ endpoint.
+#
+# Totals live in the default cache, one key per counter, and are bumped with
+# cache.incr() as results are created or deleted (after commit, so rolled-back
+# saves never count). Keys expire after PUBLIC_STATS_RECONCILE_SECONDS; the next
+# read recomputes them with one aggregate query, which also corrects any drift
+# from bulk writes, an evicted key or a bump racing a recompute.
+#
+# Every process that saves results (web and prediction workers, management
+# commands) has to bump the same counters, so they're only used when the default
+# cache is shared (REDIS_URL). With a process-local LocMemCache each worker would
+# count only its own saves and serve its own ETag, so reads go to the database
+# instead (one aggregate over the daily summary) unless PUBLIC_STATS_ALLOW_LOCAL
+# says this is the only process.
+
+KEYS = {
+    "total": "public-stats:total",
+    "positive": "public-stats:positive",
+    "negative": "public-stats:negative",
+}
+
+
+def is_shared():
+    return not isinstance(caches['default'], LocMemCache) or getattr(settings, 'PUBLIC_STATS_ALLOW_LOCAL', False)
+
+def _reconcile_seconds():
+    return getattr(settings, 'PUBLIC_STATS_RECONCILE_SECONDS', 300)
+
+def reconcile():
+    """Recomputes every counter from the database and stores it."""
+    totals = daily_stats.screening_totals()
+    counts = {name: totals[name] for name in KEYS}
+    if not is_shared():
+        return counts
+    cache.set_many({KEYS[name]: value for name, value in counts.items()}, _reconcile_seconds())
+    return counts
+
+def get_counts():
+    """{"total", "positive", "negative"}: one cache round trip, a query only on a miss."""
+    if not is_shared():
+        return reconcile()
+    cached = cache.get_many(KEYS.values())
+    if len(cached) != len(KEYS):
+        return reconcile()
+    return {name: cached[key] for name, key in KEYS.items()}
+
+def _bump(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Not cached (expired or evicted); the next read reconciles
+        pass
+
+def record(result, delta):
+    """Adjusts the counters for one result created (delta=1) or deleted (delta=-1)."""
+    if not is_shared():
+        return
+    _bump(KEYS["total"], delta)
+    key = KEYS.get(str(result).lower())
+    if key:
+        _bump(key, delta)
+
+def invalidate():
+    if not is_shared():
+        return
+    cache.delete_many(KEYS.values())
+
+def etag(counts):
+    digest = hashlib.sha1(":".join(str(counts[name]) for name in KEYS).encode()).hexdigest()
+    return f'"{digest[:16]}"'
@@ -0,0 +1,130 @@
+import random
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .benchmarks import SEED_STATES, seed_screenings
+from .filters import filter_city, filter_state, search_patients
+from .models import Appointment, TestResult, UserProfile
+
+# Index-usage checks for the dashboard, history and appointment queries, shared
+# by `manage.py check_query_plans` (large seed, any database) and api/tests.py.
+# Each check EXPLAINs a query and requires one of its expected indexes in the
+# plan and no full scan of a big table. SQLite and PostgreSQL.
+
+# A full scan of these tables means a query stopped using its index
+BIG_TABLES = ('api_testresult', 'api_appointment')
+
+
+def full_scans(plan, vendor):
+    if vendor == 'postgresql':
+        return [table for table in BIG_TABLES if re.search(rf'Seq Scan on {table}\b', plan)]
+    # SQLite: "SCAN t" is a table scan, "SCAN t USING INDEX i" walks an index in order
+    return [table for table in BIG_TABLES if re.search(rf'\bSCAN {table}\b(?! USING)', plan)]
+
+def seed(patients, results, appointments, prefix='plan-check'):
+    """Bulk-creates the dataset the checks run against; returns the sample they filter on."""
+    rng = random.Random(42)
+    now = timezone.now()
+    doctors, patient_profiles = seed_screenings(patients, results, spread_days=730, prefix=prefix)
+
+    Appointment.objects.bulk_create([
+        Appointment(
+            patient=rng.choice(patient_profiles),
+            doctor=rng.choice(doctors),
+            date_time=now + timedelta(hours=rng.randrange(-24 * 365, 24 * 365)),
+        )
+        for _ in range(appointments)
+    ], batch_size=2000)
+
+    middle = TestResult.objects.order_by('-date_tested', '-id')[results // 2]
+    by_score = TestResult.objects.order_by('-composite_score', '-id')[results // 2]
+    return {
+        'patient': patient_profiles[0],
+        'doctor': doctors[0],
+        'state': SEED_STATES[0],
+        'city': patient_profiles[0].city,
+        'cursor': (middle.date_tested, middle.pk),
+        'score_cursor': (by_score.composite_score, by_score.pk),
+    }
+
+def analyze():
+    """Refreshes planner statistics after seeding."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for table in ('api_userprofile', 'api_testresult', 'api_appointment'):
+                cursor.execute(f"ANALYZE {table}")
+        else:
+            cursor.execute("ANALYZE")
+
+def checks(sample):
+    """(name, queryset, indexes any of which the plan must use)."""
+    page = 51
+    date_tested, pk = sample['cursor']
+    score, score_pk = sample['score_cursor']
+    results = TestResult.objects.select_related('patient__user')
+    return [
+        ("dashboard, all states",
+         results.order_by('-date_tested', '-id')[:page],
+         ['api_result_date_idx']),
+        ("dashboard, deep page",
+         results.filter(date_tested__lte=date_tested)
+         .filter(Q(date_tested__lt=date_tested) | Q(id__lt=pk))
+         .order_by('-date_tested', '-id')[:page],
+         ['api_result_date_idx']),
+        ("dashboard, one state",
+         filter_state(results, sample['state']).order_by('-date_tested', '-id')[:page],
+         ['api_profile_state_lower_idx', 'api_result_date_idx']),
+        ("results by outcome",
+         results.filter(result='Positive').order_by('-date_tested', '-id')[:page],
+         ['api_result_result_date_idx']),
+        ("results by risk level",
+         results.filter(risk_level='High').order_by('-date_tested', '-id')[:page],
+         ['api_result_risk_date_idx']),
+        ("highest composite scores",
+         results.order_by('-composite_score', '-id')[:page],
+         ['api_result_composite_idx']),
+        ("composite scores, deep page",
+         results.filter(composite_score__lte=score)
+         .filter(Q(composite_score__lt=score) | Q(id__lt=score_pk))
+         .order_by('-composite_score', '-id')[:page],
+         ['api_result_composite_idx']),
+        ("dashboard, one city",
+         filter_city(results, sample['city']).order_by('-date_tested', '-id')[:page],
+         ['api_profile_city_lower_idx', 'api_result_date_idx']),
+        ("patient name/email search",
+         search_patients(results, 'Patient 1').order_by('-date_tested', '-id')[:page],
+         # Trigram indexes exist on PostgreSQL only (migration 0009)
+         ['api_profile_name_trgm_idx', 'api_user_email_trgm_idx'] if connection.vendor == 'postgresql'
+         # Elsewhere: matching profiles first, then their results by patient
+         else ['api_result_patient_date_idx', 'api_testresult_patient_id', 'api_result_date_idx']),
+        ("highest symptom scores",
+         results.order_by('-symptom_score', '-id')[:page],
+         ['api_result_symptom_idx']),
+        ("patient history",
+         results.filter(patient=sample['patient']).order_by('-date_tested', '-id')[:page],
+         ['api_result_patient_date_idx']),
+        ("profiles in a state",
+         filter_state(UserProfile.objects.all(), sample['state'], field='state'),
+         ['api_profile_state_lower_idx']),
+        ("doctor appointments",
+         Appointment.objects.filter(doctor=sample['doctor']).order_by('date_time', 'id')[:page],
+         ['api_appt_doctor_time_idx']),
+        ("patient appointments",
+         Appointment.objects.filter(patient=sample['patient']).order_by('date_time', 'id')[:page],
+         ['api_appt_patient_time_idx']),
+    ]
+
+def check(name, queryset, expected):
+    """Returns (plan, index used, failure message or None)."""
+    plan = queryset.explain()
+    used = [index for index in expected if index in plan]
+    scans = full_scans(plan, connection.vendor)
+    if not used:
+        return plan, None, f"{name}: expected one of {expected}"
+    if scans:
+        return plan, used[0], f"{name}: full scan of {', '.join(scans)}"
+    return plan, used[0], None
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+from . import pdf_generator
+from .instrumentation import span
+
+# Generated PDF reports, persisted so download and email don't re-render them.
+#
+# A report is a pure function of a few TestResult and patient fields plus the
+# template, so each one is stored under <result id>/<fingerprint>.pdf, where the
+# fingerprint hashes exactly those inputs and REPORT_TEMPLATE_VERSION. Editing
+# the result or the patient's details, or bumping the template version, changes
+# the fingerprint; the stale file is replaced the next time the report is
+# requested (or by `manage.py report_cache prune`). The fingerprint doubles
+# as the download's ETag.
+#
+# REPORT_CACHE_BACKEND picks where files live: 'local' (REPORT_CACHE_DIR on
+# this machine) or 'supabase' (the private REPORT_CACHE_BUCKET bucket, shared
+# by every worker and surviving redeploys).
+
+_counter_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "uncacheable": 0}
+
+
+def is_enabled():
+    return getattr(settings, 'REPORT_CACHE_ENABLED', True)
+
+def fingerprint(test_result):
+    """Hash of everything the rendered report depends on."""
+    patient = test_result.patient
+    inputs = [
+        pdf_generator.REPORT_TEMPLATE_VERSION,
+        test_result.id,
+        test_result.date_tested.isoformat(),
+        test_result.xray_image_url,
+        test_result.result,
+        test_result.confidence_score,
+        test_result.risk_level,
+        test_result.symptom_score,
+        test_result.composite_score,
+        patient.id,
+        # The name falls back to the account email
+        patient.full_name or patient.user.email,
+        patient.age,
+        patient.gender,
+        patient.city,
+    ]
+    return hashlib.sha256(json.dumps(inputs, default=str).encode()).hexdigest()[:32]
+
+def etag(test_result):
+    return f'"{fingerprint(test_result)}"'
+
+def _key(result_id, digest):
+    return f"{result_id}/{digest}.pdf"
+
+def current_key(test_result):
+    return _key(test_result.id, fingerprint(test_result))
+
+
+class LocalStore:
+    """Files under REPORT_CACHE_DIR; one directory per result."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.root, key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename, so a concurrent reader never sees half a PDF
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def keys(self, result_id):
+        try:
+            names = os.listdir(os.path.join(self.root, str(result_id)))
+        except FileNotFoundError:
+            return []
+        return [f"{result_id}/{name}" for name in names if name.endswith('.pdf')]
+
+    def result_ids(self):
+        try:
+            return [int(name) for name in os.listdir(self.root) if name.isdigit()]
+        except FileNotFoundError:
+            return []
+
+    def delete(self, keys):
+        for key in keys:
+            path = os.path.join(self.root, key)
+            try:
+                os.remove(path)
+                # Drop the result's directory once it's empty
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+
+class SupabaseStore:
+    """Objects in a private Supabase Storage bucket."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def _bucket(self):
+        from .supabase_client import get_supabase
+        return get_supabase().storage.from_(self.bucket)
+
+    def get(self, key):
+        try:
+            return self._bucket().download(key)
+        except Exception:
+            # Missing objects raise too; either way, render it
+            return None
+
+    def put(self, key, data):
+        self._bucket().upload(
+            file=data,
+            path=key,
+            file_options={"content-type": "application/pdf", "upsert": "true"}
+        )
+
+    def keys(self, result_id):
+        entries = self._bucket().list(str(result_id))
+        return [f"{result_id}/{entry['name']}" for entry in entries if entry['name'].endswith('.pdf')]
+
+    def result_ids(self):
+        entries = self._bucket().list('', {"limit": 100000})
+        return [int(entry['name']) for entry in entries if entry['name'].isdigit()]
+
+    def delete(self, keys):
+        if keys:
+            self._bucket().remove(list(keys))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if getattr(settings, 'REPORT_CACHE_BACKEND', 'local') == 'supabase':
+                    _store = SupabaseStore(getattr(settings, 'REPORT_CACHE_BUCKET', 'reports'))
+                else:
+                    _store = LocalStore(getattr(settings, 'REPORT_CACHE_DIR', 'report_cache'))
+    return _store
+
+def get_report(test_result):
+    """The report's PDF bytes, from the cache or freshly rendered (and then cached)."""
+    if not is_enabled():
+        return pdf_generator.generate_medical_pdf(test_result).getvalue()
+
+    store = get_store()
+    key = current_key(test_result)
+    try:
+        with span('pdf_cache'):
+            data = store.get(key)
+    except Exception as e:
+        print(f"⚠️ Report cache unavailable: {e}")
+        data = None
+    if data is not None:
+        _count("hits")
+        return data
+
+    buffer, complete = pdf_generator.render_report(test_result)
+    data = buffer.getvalue()
+    if not complete:
+        # Missing X-ray (fetch failed); try again on the next request
+        _count("uncacheable")
+        return data
+
+    _count("misses")
+    try:
+        _replace(store, test_result.id, key, data)
+    except Exception as e:
+        print(f"⚠️ Report cache unavailable: {e}")
+    return data
+
+def _replace(store, result_id, key, data):
+    store.put(key, data)
+    # Earlier renders of this result are stale now
+    store.delete([k for k in store.keys(result_id) if k != key])
+
+def regenerate(test_result):
+    """Renders and stores the report even if a current copy exists. Returns True if cached."""
+    buffer, complete = pdf_generator.render_report(test_result)
+    if complete:
+        _replace(get_store(), test_result.id, current_key(test_result), buffer.getvalue())
+    return complete
+
+def delete(result_id):
+    """Removes every stored report for a result."""
+    store = get_store()
+    store.delete(store.keys(result_id))
+
+def stats():
+    with _counter_lock:
+        counters = dict(_counters)
+    lookups = counters["hits"] + counters["misses"] + counters["uncacheable"]
+    counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+    return counters
+
+def _count(name):
+    with _counter_lock:
+        _counters[name] += 1
@@ -0,0 +1,142 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+# Response-level cache for the doctor dashboard, patient history and epidemiology views.
+#
+# Entries are keyed by view, query parameters and the version of each scope the
+# response depends on:
+#   global         any result or profile change (the unfiltered dashboard)
+#   state:<name>   results or profiles in that state (?state= dashboards)
+#   patient:<id>   one patient's results or profile (their history)
+#   history        results dated before this week, or where patients live
+#                  (the epidemiology view's closed weeks; new scans don't touch it)
+# Writes bump versions after commit rather than deleting entries, so a stale
+# response is never looked up again and just ages out after RESPONSE_CACHE_TTL.
+# Versions are read before the response is built: one that races a write is
+# stored under the old version and never served.
+#
+# Versions must be visible to every process that writes (web workers, prediction
+# workers, management commands), so RESPONSE_CACHE_ALIAS has to be a shared
+# cache such as Redis (REDIS_URL). A process-local LocMemCache never sees the
+# other processes' bumps and is refused unless RESPONSE_CACHE_ALLOW_LOCAL says
+# this is the only process (benchmarks, tests).
+
+GLOBAL = 'global'
+HISTORY = 'history'
+# Bumped by bump_all() after writes that skip signals (bulk imports, rebuilds)
+_EPOCH = 'epoch'
+
+_counter_lock = threading.Lock()
+_counters = {}
+_warned_local = False
+
+
+def is_enabled():
+    global _warned_local
+    if not getattr(settings, 'RESPONSE_CACHE_ENABLED', False):
+        return False
+    if isinstance(_cache(), LocMemCache) and not getattr(settings, 'RESPONSE_CACHE_ALLOW_LOCAL', False):
+        if not _warned_local:
+            _warned_local = True
+            print("⚠️ Response cache disabled: RESPONSE_CACHE_ALIAS is process-local (set REDIS_URL)")
+        return False
+    return True
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+def state_scope(state):
+    return f"state:{(state or '').strip().lower()}"
+
+def patient_scope(profile_id):
+    return f"patient:{profile_id}"
+
+def _version_key(scope):
+    return f"resp-ver:{scope}"
+
+def _versions(cache, scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Never restart at a number an earlier (evicted) version may have used
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+def make_key(view, scopes, params, versions, variant=''):
+    query = "&".join(f"{name}={value}" for name, values in sorted(params.lists()) for value in values)
+    scoped = ",".join(f"{scope}@{version}" for scope, version in zip(scopes, versions))
+    digest = hashlib.sha256(f"{scoped}?{query}#{variant}".encode()).hexdigest()
+    return f"resp:{view}:{digest}"
+
+def get_or_build(view, scopes, params, build, variant='', timeout=None):
+    """
+    Returns the cached data for `view` under `scopes` and query `params`, or
+    calls build() and caches its result. `variant` adds anything else the data
+    depends on (e.g. the current week); `timeout` overrides RESPONSE_CACHE_TTL.
+    Falls back to build() if the cache is down.
+    """
+    if not is_enabled():
+        return build()
+
+    cache = _cache()
+    scopes = [_EPOCH, *scopes]
+    try:
+        key = make_key(view, scopes, params, _versions(cache, scopes), variant)
+        data = cache.get(key)
+    except Exception as e:
+        print(f"⚠️ Response cache unavailable: {e}")
+        return build()
+
+    if data is not None:
+        _count(view, "hits")
+        return data
+
+    _count(view, "misses")
+    data = build()
+    try:
+        cache.set(key, data, timeout=timeout or getattr(settings, 'RESPONSE_CACHE_TTL', 300))
+    except Exception as e:
+        print(f"⚠️ Response cache unavailable: {e}")
+    return data
+
+def bump(*scopes):
+    """Moves each scope to a new version, orphaning every response cached under the old one."""
+    if not is_enabled():
+        return
+    cache = _cache()
+    for scope in set(scopes):
+        key = _version_key(scope)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+        except Exception as e:
+            print(f"⚠️ Response cache unavailable: {e}")
+
+def bump_all():
+    bump(_EPOCH)
+
+def stats():
+    with _counter_lock:
+        counters = {view: dict(counts) for view, counts in _counters.items()}
+    for counts in counters.values():
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+    return counters
+
+def reset_stats():
+    with _counter_lock:
+        _counters.clear()
+
+def _count(view, outcome):
+    with _counter_lock:
+        counts = _counters.setdefault(view, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
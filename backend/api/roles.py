@@ -0,0 +1,21 @@
+from .models import UserProfile
+
+# Role lookups for views. SupabaseAuthentication attaches the profile to
+# request.user, so these don't touch the database on authenticated requests.
+
+def get_profile(user):
+    """The user's UserProfile, or None if they haven't completed one."""
+    try:
+        return user.profile
+    except (UserProfile.DoesNotExist, AttributeError):
+        return None
+
+def get_role(user):
+    """'doctor', 'patient', or None when there's no profile."""
+    profile = get_profile(user)
+    if profile is None or not profile.role:
+        return None
+    return str(profile.role).strip().lower()
+
+def is_doctor(user):
+    return get_role(user) == 'doctor'
@@ -0,0 +1,48 @@
+# Scores derived from a TestResult's inputs (result, confidence, symptoms).
+#
+# They're stored on the row by TestResult.save() instead of being recomputed
+# per row on every read, so the database can filter, sort and aggregate on
+# them. Writes that skip save() (QuerySet.update, bulk_create) must call
+# apply() themselves.
+
+SYMPTOM_QUESTIONS = 8
+
+# Saving any of INPUTS (e.g. via update_fields) also writes DERIVED
+INPUTS = frozenset({'result', 'confidence_score', 'symptoms_data'})
+DERIVED = frozenset({'risk_level', 'symptom_score', 'composite_score'})
+
+
+def effective_risk_level(result, confidence_score):
+    """
+    Risk level from the confidence score (stored as 0-100): Medium for 50-80%,
+    whatever the model's own label said.
+    """
+    if result == 'Negative':
+        return 'Low'
+
+    if confidence_score > 80:
+        return 'High'
+    elif confidence_score >= 50:
+        return 'Medium'
+    else:
+        return 'Low'
+
+def symptom_score(symptoms_data):
+    """Share of the questionnaire answered 'yes', 0-100."""
+    if not isinstance(symptoms_data, dict):
+        # Older clients may send a list or string; stored as-is, but not a questionnaire
+        return 0
+    yes_count = sum(1 for ans in symptoms_data.values() if isinstance(ans, str) and ans.lower() == 'yes')
+    return (yes_count / SYMPTOM_QUESTIONS) * 100
+
+def composite_score(confidence_score, symptom_score):
+    """Mean of model confidence and symptom score, the report's headline figure."""
+    return (confidence_score + symptom_score) / 2
+
+def apply(test_result):
+    """Sets the derived fields on an unsaved or modified TestResult."""
+    confidence = float(test_result.confidence_score)
+    test_result.risk_level = effective_risk_level(test_result.result, confidence)
+    test_result.symptom_score = symptom_score(test_result.symptoms_data)
+    test_result.composite_score = composite_score(confidence, test_result.symptom_score)
+    return test_result
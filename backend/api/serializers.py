@@ -23,8 +23,9 @@ class TestResultSerializer(serializers.ModelSerializer):
     gender = serializers.CharField(source='patient.gender', read_only=True)
     phone = serializers.CharField(source='patient.phone', read_only=True)
 
-    # OVERRIDE the model field to dynamically calculate risk level for ALL records (old and new)
-    risk_level = serializers.SerializerMethodField()
+    # Declared here to keep its place in the output; the stored value is kept
+    # current on save (see scoring.py), so it's no longer recalculated per row
+    risk_level = serializers.CharField(read_only=True)
 
     class Meta:
         model = TestResult
@@ -36,23 +37,6 @@ class TestResultSerializer(serializers.ModelSerializer):
             return obj.patient.full_name
         return obj.patient.user.email
 
-    def get_risk_level(self, obj):
-        """
-        Dynamically calculates Risk Level based on Confidence Score.
-        This ensures 'Medium' is returned for 50-80% even if the DB says 'Low'.
-        """
-        if obj.result == 'Negative':
-            return 'Low'
-        
-        # Positive Case Logic
-        # obj.confidence_score is stored as 0-100 float
-        if obj.confidence_score > 80:
-            return 'High'
-        elif obj.confidence_score >= 50:
-            return 'Medium'
-        else:
-            return 'Low'
-
 from .models import Appointment # Make sure to import Appointment
 
 class AppointmentSerializer(serializers.ModelSerializer):
@@ -0,0 +1,130 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import daily_stats, public_stats, report_cache, response_cache
+from .models import TestResult, UserProfile
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_user(sender, instance, raw=False, **kwargs):
+    # Authentication caches each user together with their profile
+    if raw:
+        return
+    from .authentication import invalidate_user
+    uid = instance.user.username
+    transaction.on_commit(lambda: invalidate_user(uid))
+
+# --- DailyScreeningStats maintenance ---
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+@receiver(pre_save, sender=TestResult)
+def remember_result_bucket(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._stats_bucket = None
+    if raw or not daily_stats.is_enabled() or instance.pk is None:
+        return
+    if _touches(update_fields, ('date_tested', 'result', 'risk_level', 'patient')):
+        instance._stats_bucket = daily_stats.stored_bucket(instance.pk)
+
+@receiver(post_save, sender=TestResult)
+def count_result(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not daily_stats.is_enabled():
+        return
+    if not created and not _touches(update_fields, ('date_tested', 'result', 'risk_level', 'patient')):
+        return
+    old = getattr(instance, '_stats_bucket', None)
+    new = daily_stats.result_bucket(instance)
+    if old != new:
+        if old is not None:
+            daily_stats.adjust(old, -1)
+        daily_stats.adjust(new, 1)
+
+@receiver(post_delete, sender=TestResult)
+def uncount_result(sender, instance, **kwargs):
+    if daily_stats.is_enabled():
+        daily_stats.adjust(daily_stats.result_bucket(instance), -1)
+
+@receiver(pre_save, sender=UserProfile)
+def remember_location(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._stats_location = None
+    if raw or instance.pk is None or not (daily_stats.is_enabled() or response_cache.is_enabled()):
+        return
+    if _touches(update_fields, ('state', 'city')):
+        instance._stats_location = UserProfile.objects.filter(pk=instance.pk).values_list('state', 'city').first()
+
+@receiver(post_save, sender=UserProfile)
+def refile_results(sender, instance, created, raw=False, **kwargs):
+    old = getattr(instance, '_stats_location', None)
+    new = (instance.state, instance.city)
+    if raw or created or old is None or tuple(old) == new or not daily_stats.is_enabled():
+        return
+    daily_stats.move_patient(instance.pk, old, new)
+
+# --- Public stats counters ---
+
+@receiver(post_save, sender=TestResult)
+def count_public_result(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        result = instance.result
+        transaction.on_commit(lambda: public_stats.record(result, 1))
+    elif _touches(update_fields, ('result',)):
+        # The old value isn't known here; recount on the next read
+        transaction.on_commit(public_stats.invalidate)
+
+@receiver(post_delete, sender=TestResult)
+def uncount_public_result(sender, instance, **kwargs):
+    result = instance.result
+    transaction.on_commit(lambda: public_stats.record(result, -1))
+
+# --- Response cache versions ---
+
+def _bump_after_commit(*scopes):
+    transaction.on_commit(lambda: response_cache.bump(*scopes))
+
+@receiver(post_save, sender=TestResult)
+@receiver(post_delete, sender=TestResult)
+def bump_result_scopes(sender, instance, raw=False, created=False, **kwargs):
+    if raw or not response_cache.is_enabled():
+        return
+    scopes = [response_cache.GLOBAL, response_cache.state_scope(instance.patient.state),
+              response_cache.patient_scope(instance.patient_id)]
+    if not created:
+        # Edits and deletes can reach back into closed weeks; new scans are always dated now
+        scopes.append(response_cache.HISTORY)
+    _bump_after_commit(*scopes)
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def bump_profile_scopes(sender, instance, raw=False, **kwargs):
+    # Names, locations and contact details appear in every listing row
+    if raw or not response_cache.is_enabled():
+        return
+    scopes = [response_cache.GLOBAL, response_cache.state_scope(instance.state),
+              response_cache.patient_scope(instance.pk)]
+    old = getattr(instance, '_stats_location', None)
+    if old is not None:
+        scopes.append(response_cache.state_scope(old[0]))
+    if kwargs.get('signal') is post_delete or (old is not None and tuple(old) != (instance.state, instance.city)):
+        # Their past results now count somewhere else (or nowhere)
+        scopes.append(response_cache.HISTORY)
+    _bump_after_commit(*scopes)
+
+# --- Stored PDF reports ---
+
+@receiver(post_delete, sender=TestResult)
+def delete_stored_report(sender, instance, **kwargs):
+    if not report_cache.is_enabled():
+        return
+    result_id = instance.pk
+
+    def delete():
+        try:
+            report_cache.delete(result_id)
+        except Exception as e:
+            print(f"⚠️ Could not delete stored report {result_id}: {e}")
+    transaction.on_commit(delete)
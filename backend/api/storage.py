@@ -1,15 +1,19 @@
-from supabase import create_client
-from django.conf import settings
 import uuid
 
+from .instrumentation import span
+from .supabase_client import get_supabase
+
 def upload_to_supabase(image_file):
-    supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-    filename = f"{uuid.uuid4()}.{image_file.name.split('.')[-1]}"
-    file_content = image_file.read()
+    return upload_bytes_to_supabase(image_file.read(), image_file.name, image_file.content_type)
+
+def upload_bytes_to_supabase(file_content, original_name, content_type):
+    supabase = get_supabase()
+    filename = f"{uuid.uuid4()}.{original_name.split('.')[-1]}"
     
-    supabase.storage.from_("xrays").upload(
-        file=file_content,
-        path=filename,
-        file_options={"content-type": image_file.content_type}
-    )
-    return supabase.storage.from_("xrays").get_public_url(filename)
\ No newline at end of file
+    with span('upload'):
+        supabase.storage.from_("xrays").upload(
+            file=file_content,
+            path=filename,
+            file_options={"content-type": content_type}
+        )
+    return supabase.storage.from_("xrays").get_public_url(filename)
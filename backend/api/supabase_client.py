@@ -0,0 +1,68 @@
+import os
+import threading
+
+from django.conf import settings
+
+# One Supabase client per process, shared by authentication and storage.
+# Building a client per request re-creates its HTTP session and repeats
+# TCP/TLS setup; this keeps a keep-alive connection pool instead.
+
+_client = None
+_http_client = None
+_lock = threading.Lock()
+
+def get_supabase():
+    """Returns the process-wide Supabase client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = _create()
+    return _client
+
+def reset_supabase():
+    """Closes the pooled connections; the next get_supabase() builds a fresh client."""
+    global _client, _http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _client = None
+        _http_client = None
+
+def _create():
+    global _http_client
+    import httpx
+    from supabase import ClientOptions, create_client
+
+    pool_size = getattr(settings, 'SUPABASE_POOL_SIZE', 10)
+    timeout = getattr(settings, 'SUPABASE_TIMEOUT', 10.0)
+
+    _http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=getattr(settings, 'SUPABASE_KEEPALIVE_EXPIRY', 30.0),
+        ),
+        timeout=httpx.Timeout(timeout, connect=getattr(settings, 'SUPABASE_CONNECT_TIMEOUT', 5.0)),
+    )
+    options = ClientOptions(
+        # Server-side use: no session to persist or refresh in the background
+        auto_refresh_token=False,
+        persist_session=False,
+        postgrest_client_timeout=timeout,
+        storage_client_timeout=int(timeout),
+        httpx_client=_http_client,
+    )
+    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY, options=options)
+
+def _after_fork_in_child():
+    # A forked worker must not share the parent's sockets (or TLS sessions).
+    # Drop the references without closing, which would also tear down the
+    # parent's connections.
+    global _client, _http_client, _lock
+    _client = None
+    _http_client = None
+    _lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
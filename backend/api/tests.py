@@ -0,0 +1,1033 @@
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+import jwt
+import numpy as np
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.query import QuerySet
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from . import (daily_stats, epidemiology, listings, ml_engine, model_registry, model_server, pagination, pdf_generator,
+               prediction_cache, prediction_jobs, public_stats, query_plans, report_cache, response_cache, scoring,
+               supabase_client)
+from .authentication import clear_user_cache, invalidate_user, verify_token_locally, verify_token_remotely
+from .batching import MicroBatcher
+from .benchmarks import seed_screenings
+from .fake_supabase import FAKE_SERVICE_KEY, FakeSupabaseServer
+from .models import DailyScreeningStats, PredictionJob, TestResult, UserProfile
+from .serializers import TestResultSerializer
+from .storage import upload_bytes_to_supabase
+from .views import DoctorExportView
+
+TEST_JWT_SECRET = 'test-secret-for-hs256-tokens-only-000000'
+
+
+def make_token(uid, email):
+    claims = {'sub': uid, 'email': email, 'aud': 'authenticated', 'exp': int(time.time()) + 3600}
+    return jwt.encode(claims, TEST_JWT_SECRET, algorithm='HS256')
+
+
+@override_settings(
+    SUPABASE_JWT_SECRET=TEST_JWT_SECRET,
+    SUPABASE_JWT_VERIFY_LOCALLY=True,
+    SUPABASE_AUTH_REMOTE_FALLBACK=False,
+    AUTH_USER_CACHE_ALLOW_LOCAL=True,
+    # Keeps each view's own query count fixed between the cold and warm requests
+    RESPONSE_CACHE_ENABLED=False,
+)
+class AuthQueryCountTests(TestCase):
+    """Authentication costs one query with cold caches and none once the user is cached."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = cls._user('patient-uid', 'patient')
+        cls.doctor = cls._user('doctor-uid', 'doctor')
+        for result, confidence in (('Positive', 91.0), ('Negative', 12.0)):
+            TestResult.objects.create(
+                patient=cls.patient.profile, xray_image_url='https://example.com/x.jpg',
+                result=result, confidence_score=confidence, symptoms_data={'cough': 'yes'}
+            )
+
+    @staticmethod
+    def _user(uid, role):
+        user = User.objects.create(username=uid, email=f'{role}@example.com')
+        UserProfile.objects.create(user=user, role=role, full_name=role.title(), state='Kerala', city='Kochi')
+        return user
+
+    def setUp(self):
+        clear_user_cache()
+        cache.clear()
+
+    def _client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {make_token(user.username, user.email)}')
+        return client
+
+    def _assert_auth_queries(self, user, path, view_queries):
+        client = self._client(user)
+        with self.assertNumQueries(view_queries + 1):
+            self.assertEqual(client.get(path).status_code, 200)
+        with self.assertNumQueries(view_queries):
+            self.assertEqual(client.get(path).status_code, 200)
+
+    def test_profile(self):
+        # The profile comes attached to the user
+        self._assert_auth_queries(self.patient, '/api/profile/', 0)
+
+    def test_history(self):
+        self._assert_auth_queries(self.patient, '/api/history/', 1)
+
+    def test_doctor_dashboard(self):
+        self._assert_auth_queries(self.doctor, '/api/doctor/dashboard/', 2)
+
+    @override_settings(PUBLIC_STATS_ALLOW_LOCAL=True)
+    def test_public_stats(self):
+        public_stats.reconcile()
+        self._assert_auth_queries(self.patient, '/api/stats/', 0)
+
+    def test_expired_token_rejected_without_queries(self):
+        claims = {'sub': self.patient.username, 'aud': 'authenticated', 'exp': int(time.time()) - 60}
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {jwt.encode(claims, TEST_JWT_SECRET, algorithm='HS256')}")
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/api/profile/').status_code, 403)
+
+
+@override_settings(
+    SUPABASE_JWT_SECRET=TEST_JWT_SECRET,
+    SUPABASE_JWT_VERIFY_LOCALLY=True,
+    SUPABASE_AUTH_REMOTE_FALLBACK=False,
+    AUTH_USER_CACHE_ALLOW_LOCAL=True,
+    RESPONSE_CACHE_ENABLED=False,
+)
+class UserCacheTests(TestCase):
+    """Cached users are shared through the Django cache, so every worker sees profile changes."""
+
+    def setUp(self):
+        clear_user_cache()
+        cache.clear()
+        self.user = User.objects.create(username='cache-uid', email='cache@example.com')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {make_token(self.user.username, self.user.email)}')
+
+    def test_user_without_profile_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 404)
+        # Created by another process: no signal reaches this one
+        UserProfile.objects.bulk_create([UserProfile(user=self.user, role='patient')])
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+
+    def test_profile_save_invalidates_cached_user(self):
+        profile = UserProfile.objects.create(user=self.user, role='patient', state='Kerala')
+        self.assertEqual(self.client.get('/api/profile/').json()['state'], 'Kerala')
+
+        profile.state = 'Goa'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/profile/').json()['state'], 'Goa')
+
+    def test_stale_entry_ignored_after_bump(self):
+        UserProfile.objects.create(user=self.user, role='patient')
+        self.client.get('/api/profile/')
+        # Another process changed the role and bumped the shared version
+        UserProfile.objects.filter(user=self.user).update(role='doctor')
+        invalidate_user(self.user.username)
+        self.assertEqual(self.client.get('/api/profile/').json()['role'], 'doctor')
+
+    @override_settings(AUTH_USER_CACHE_ALLOW_LOCAL=False)
+    def test_process_local_cache_refused(self):
+        UserProfile.objects.create(user=self.user, role='patient')
+        self.client.get('/api/profile/')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+
+
+def _with_header(token, **header):
+    """Re-labels a token's header (e.g. alg) without re-signing it."""
+    _, payload, signature = token.split('.')
+    encoded = base64.urlsafe_b64encode(json.dumps(header).encode()).rstrip(b'=').decode()
+    return '.'.join((encoded, payload, signature))
+
+
+@override_settings(SUPABASE_JWT_SECRET=TEST_JWT_SECRET)
+class TokenAlgorithmTests(TestCase):
+    """Only HS256 (with the secret) and ES256/RS256 (with a matching JWKS key) are accepted."""
+
+    claims = {'sub': 'uid', 'email': 'a@example.com', 'aud': 'authenticated'}
+
+    def setUp(self):
+        self.claims = {**self.claims, 'exp': int(time.time()) + 3600}
+        self.ec_key = ec.generate_private_key(ec.SECP256R1())
+        jwk = jwt.PyJWK(jwt.algorithms.ECAlgorithm.to_jwk(self.ec_key.public_key(), as_dict=True))
+        jwks = mock.Mock()
+        jwks.get_signing_key_from_jwt.return_value = jwk
+        patcher = mock.patch('api.authentication._get_jwks_client', return_value=jwks)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hs256_with_secret(self):
+        token = jwt.encode(self.claims, TEST_JWT_SECRET, algorithm='HS256')
+        self.assertEqual(verify_token_locally(token)[0], 'uid')
+
+    def test_es256_with_jwks_key(self):
+        token = jwt.encode(self.claims, self.ec_key, algorithm='ES256')
+        self.assertEqual(verify_token_locally(token)[0], 'uid')
+
+    def test_other_algorithms_rejected(self):
+        hs512 = jwt.encode(self.claims, TEST_JWT_SECRET, algorithm='HS512')
+        unsigned = _with_header(jwt.encode(self.claims, TEST_JWT_SECRET, algorithm='HS256'), alg='none', typ='JWT')
+        for token in (hs512, unsigned):
+            with self.assertRaises(jwt.InvalidAlgorithmError):
+                verify_token_locally(token)
+
+    def test_header_cannot_override_the_keys_algorithm(self):
+        # An ES256 JWKS key presented as RS256
+        token = _with_header(jwt.encode(self.claims, self.ec_key, algorithm='ES256'), alg='RS256', typ='JWT')
+        with self.assertRaises(jwt.InvalidAlgorithmError):
+            verify_token_locally(token)
+
+    def test_rejected_algorithm_is_a_403(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {jwt.encode(self.claims, TEST_JWT_SECRET, algorithm='HS512')}")
+        self.assertEqual(client.get('/api/profile/').status_code, 403)
+
+
+class SupabaseClientTests(TestCase):
+    """Auth and storage share one pooled client (see benchmark_supabase), against the local stand-in."""
+
+    def setUp(self):
+        self.server = FakeSupabaseServer().start()
+        self.addCleanup(self.server.stop)
+        overrides = override_settings(SUPABASE_URL=self.server.url, SUPABASE_KEY=FAKE_SERVICE_KEY)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        supabase_client.reset_supabase()
+        self.addCleanup(supabase_client.reset_supabase)
+
+    def test_requests_reuse_one_connection(self):
+        client = supabase_client.get_supabase()
+        for _ in range(3):
+            verify_token_remotely('some-token')
+            upload_bytes_to_supabase(b'xray', 'scan.png', 'image/png')
+
+        self.assertIs(supabase_client.get_supabase(), client)
+        self.assertEqual(self.server.stats['auth_requests'], 3)
+        self.assertEqual(self.server.stats['storage_requests'], 3)
+        self.assertEqual(self.server.stats['connections'], 1)
+
+    def test_reset_rebuilds_the_client(self):
+        client = supabase_client.get_supabase()
+        verify_token_remotely('some-token')
+        http_client = supabase_client._http_client
+
+        supabase_client.reset_supabase()
+        self.assertTrue(http_client.is_closed)
+        self.assertIsNot(supabase_client.get_supabase(), client)
+        verify_token_remotely('some-token')
+        self.assertEqual(self.server.stats['connections'], 2)
+
+    @skipUnless(hasattr(os, 'fork'), "needs os.fork")
+    def test_forked_child_drops_the_inherited_client(self):
+        parent = supabase_client.get_supabase()
+        verify_token_remotely('some-token')
+
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Child: report whether it built its own client, then leave without test teardown
+            try:
+                os.write(write_end, b'ok' if supabase_client.get_supabase() is not parent else b'shared')
+            finally:
+                os._exit(0)
+        os.close(write_end)
+        os.waitpid(pid, 0)
+        with os.fdopen(read_end, 'rb') as f:
+            self.assertEqual(f.read(), b'ok')
+
+        # The parent's pool is untouched by the child
+        self.assertIs(supabase_client.get_supabase(), parent)
+        verify_token_remotely('some-token')
+        self.assertEqual(self.server.stats['connections'], 1)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class CsvExportTests(TestCase):
+
+    def test_formula_cells_are_escaped(self):
+        doctor = User.objects.create(username='doctor-uid', email='doctor@example.com')
+        UserProfile.objects.create(user=doctor, role='doctor')
+        patient = User.objects.create(username='patient-uid', email='@patient@example.com')
+        profile = UserProfile.objects.create(
+            user=patient, role='patient', full_name='=HYPERLINK("http://evil.example","open")',
+            city='+cmd', state='-Kerala', phone='\t0123',
+        )
+        TestResult.objects.create(
+            patient=profile, xray_image_url='', result='Negative', confidence_score=12.0, symptoms_data={}
+        )
+
+        client = APIClient()
+        client.force_authenticate(doctor)
+        response = client.get('/api/doctor/export/', {'type': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        row = next(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual(row['patient_name'], '\'=HYPERLINK("http://evil.example","open")')
+        self.assertEqual(row['email'], "'@patient@example.com")
+        self.assertEqual(row['city'], "'+cmd")
+        self.assertEqual(row['state'], "'-Kerala")
+        self.assertEqual(row['phone'], "'\t0123")
+        # Numbers and ordinary text are untouched
+        self.assertEqual(row['confidence_score'], '12.0')
+        self.assertEqual(row['result'], 'Negative')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class ExportMemoryTests(TestCase):
+    """Exports stream: peak allocation stays flat however many rows match (see benchmark_export)."""
+
+    ROWS = 20000
+    # Streaming peaks near 4 MB; the same rows rendered as one JSON document near 46 MB
+    MAX_PEAK_MB = 16
+
+    @classmethod
+    def setUpTestData(cls):
+        doctors, _ = seed_screenings(cls.ROWS // 20, cls.ROWS, doctors=2, prefix='export')
+        cls.doctor = doctors[0].user
+
+    def _stream(self, export_type):
+        request = APIRequestFactory().get('/api/doctor/export/', {'type': export_type})
+        force_authenticate(request, user=self.doctor)
+        tracemalloc.start()
+        try:
+            lines = sum(chunk.count(b'\n') for chunk in DoctorExportView.as_view()(request).streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return lines, peak / (1024 * 1024)
+
+    def test_large_export_streams_under_ceiling(self):
+        for export_type, header in (('ndjson', 0), ('csv', 1)):
+            with self.subTest(export_type):
+                lines, peak_mb = self._stream(export_type)
+                self.assertEqual(lines, self.ROWS + header)
+                self.assertLess(peak_mb, self.MAX_PEAK_MB)
+
+
+class ScoringTests(TestCase):
+
+    def test_symptom_score_counts_yes_answers(self):
+        self.assertEqual(scoring.symptom_score({'cough': 'Yes', 'fever': 'no', 'sweats': 'yes'}), 25.0)
+
+    def test_non_questionnaire_symptoms_score_zero(self):
+        for symptoms in (['cough'], 'cough', None, 3):
+            self.assertEqual(scoring.symptom_score(symptoms), 0)
+
+    def test_result_with_list_symptoms_saves(self):
+        user = User.objects.create(username='patient-uid', email='patient@example.com')
+        profile = UserProfile.objects.create(user=user, role='patient')
+        result = TestResult.objects.create(
+            patient=profile, xray_image_url='', result='Positive', confidence_score=80.0, symptoms_data=['cough']
+        )
+        self.assertEqual(result.symptom_score, 0)
+        self.assertEqual(result.composite_score, 40.0)
+
+
+@override_settings(
+    SUPABASE_JWT_SECRET=TEST_JWT_SECRET,
+    SUPABASE_JWT_VERIFY_LOCALLY=True,
+    SUPABASE_AUTH_REMOTE_FALLBACK=False,
+    AUTH_USER_CACHE_ALLOW_LOCAL=True,
+    RESPONSE_CACHE_ENABLED=False,
+)
+class ListingQueryTests(TestCase):
+    """Listings take one query whatever their size, and every page costs the same (see benchmark_listings)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        doctors, patients = seed_screenings(20, 300, doctors=2, prefix='listing')
+        daily_stats.rebuild()
+        cls.doctor = doctors[0].user
+        cls.patient = patients[0].user
+
+    def setUp(self):
+        clear_user_cache()
+        cache.clear()
+
+    def _client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {make_token(user.username, user.email)}')
+        # Warms the user cache so only the view's own queries are counted
+        client.get('/api/profile/')
+        return client
+
+    def test_listing_is_one_query_with_serializer_json(self):
+        queryset = TestResult.objects.order_by('-date_tested', '-id')
+        with self.assertNumQueries(1):
+            rows = listings.listing(listings.result_rows(queryset))
+        serialized = TestResultSerializer(queryset.select_related('patient__user'), many=True).data
+        self.assertEqual(len(rows), 300)
+        self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(serialized))
+
+    def _walk(self, client, path, key, view_queries):
+        seen = []
+        params = {'page_size': 10}
+        while True:
+            with self.assertNumQueries(view_queries):
+                body = client.get(path, params).json()
+            seen.extend(row['id'] for row in body[key])
+            if not body['next_cursor']:
+                return seen
+            params['cursor'] = body['next_cursor']
+
+    def test_dashboard_pages_cost_the_same_at_any_depth(self):
+        # Records and totals
+        seen = self._walk(self._client(self.doctor), '/api/doctor/dashboard/', 'records', 2)
+        self.assertEqual(sorted(seen), sorted(TestResult.objects.values_list('id', flat=True)))
+
+    def test_history_pages_cost_the_same_at_any_depth(self):
+        seen = self._walk(self._client(self.patient), '/api/history/', 'results', 1)
+        self.assertEqual(len(seen), TestResult.objects.filter(patient__user=self.patient).count())
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class QueryPlanTests(TestCase):
+    """The dashboard, history and appointment queries use their indexes (see check_query_plans)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Big enough that the planner prefers the indexes to a scan
+        cls.sample = query_plans.seed(patients=400, results=8000, appointments=2000)
+        query_plans.analyze()
+
+    def test_queries_use_their_indexes(self):
+        for name, queryset, expected in query_plans.checks(self.sample):
+            with self.subTest(name):
+                plan, _, failure = query_plans.check(name, queryset, expected)
+                self.assertIsNone(failure, plan)
+
+
+def _patient(uid, state='Kerala', city='Kochi'):
+    user = User.objects.create(username=uid, email=f'{uid}@example.com')
+    return UserProfile.objects.create(user=user, role='patient', state=state, city=city)
+
+
+def _result(profile, result='Negative', risk_level='Low'):
+    return TestResult.objects.create(
+        patient=profile, xray_image_url='', result=result, confidence_score=50.0,
+        risk_level=risk_level, symptoms_data={}
+    )
+
+
+class PaginationTests(TestCase):
+
+    def test_cursor_round_trip(self):
+        when = timezone.now()
+        self.assertEqual(pagination.decode_cursor(pagination.encode_cursor(when, 7)), (when, 7))
+        self.assertEqual(pagination.decode_cursor(pagination.encode_cursor(0.1 + 0.2, 7), numeric=True), (0.1 + 0.2, 7))
+
+    def test_invalid_cursors_rejected(self):
+        def raw(position):
+            return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+        timestamp = timezone.now().isoformat()
+        for cursor, numeric in (
+            ('not a cursor', False),
+            (raw([timestamp]), False),
+            (raw(['yesterday', 7]), False),
+            (raw([timestamp, '7']), False),
+            (raw(['12.5', 7]), True),
+            (raw([True, 7]), True),
+        ):
+            with self.subTest(cursor=cursor), self.assertRaises(ValidationError):
+                pagination.decode_cursor(cursor, numeric=numeric)
+
+    def _walk(self, field, descending):
+        seen = []
+        params = {'page_size': '4'}
+        while True:
+            rows, cursor = pagination.paginate(TestResult.objects.all(), mock.Mock(query_params=params), field, descending)
+            seen.extend(row.pk for row in rows)
+            if cursor is None:
+                return seen
+            params = {**params, 'cursor': cursor}
+
+    def test_ties_split_across_pages(self):
+        profile = _patient('patient-uid')
+        ids = [_result(profile).pk for _ in range(10)]
+        # Every row shares one timestamp; the id tie-breaker has to carry the pages
+        TestResult.objects.update(date_tested=timezone.now())
+
+        self.assertEqual(self._walk('date_tested', True), sorted(ids, reverse=True))
+        self.assertEqual(self._walk('date_tested', False), sorted(ids))
+        # Numeric sort keys too (equal composite scores)
+        self.assertEqual(self._walk('composite_score', True), sorted(ids, reverse=True))
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True, RESPONSE_CACHE_ALLOW_LOCAL=True)
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def _get(self, scopes, query=''):
+        def build():
+            self.builds += 1
+            return {'build': self.builds}
+        return response_cache.get_or_build('view', scopes, QueryDict(query), build)
+
+    def test_cached_until_a_scope_is_bumped(self):
+        scopes = [response_cache.state_scope('Kerala')]
+        first = self._get(scopes)
+        self.assertEqual(self._get(scopes), first)
+        # Query parameters are part of the key
+        self.assertNotEqual(self._get(scopes, 'page_size=10'), first)
+
+        response_cache.bump(response_cache.state_scope('Goa'))
+        self.assertEqual(self._get(scopes), first)
+        response_cache.bump(response_cache.state_scope(' kerala '))
+        self.assertNotEqual(self._get(scopes), first)
+
+    def test_bump_all_orphans_every_scope(self):
+        first = self._get([response_cache.GLOBAL])
+        response_cache.bump_all()
+        self.assertNotEqual(self._get([response_cache.GLOBAL]), first)
+
+    def test_version_survives_eviction(self):
+        first = self._get([response_cache.GLOBAL])
+        # An evicted version restarts from the clock, never from a number already used
+        cache.delete('resp-ver:global')
+        self.assertNotEqual(self._get([response_cache.GLOBAL]), first)
+
+    @override_settings(RESPONSE_CACHE_ALLOW_LOCAL=False)
+    def test_process_local_cache_refused(self):
+        self.assertFalse(response_cache.is_enabled())
+        self._get([response_cache.GLOBAL])
+        self._get([response_cache.GLOBAL])
+        self.assertEqual(self.builds, 2)
+
+    def test_result_writes_bump_their_scopes(self):
+        kerala = _patient('kerala-uid')
+        scopes = {
+            'global': [response_cache.GLOBAL],
+            'kerala': [response_cache.state_scope('Kerala')],
+            'goa': [response_cache.state_scope('Goa')],
+            'kerala patient': [response_cache.patient_scope(kerala.pk)],
+            'history': [response_cache.HISTORY],
+        }
+        before = {name: self._get(s) for name, s in scopes.items()}
+        with self.captureOnCommitCallbacks(execute=True):
+            result = _result(kerala)
+        changed = {name for name, s in scopes.items() if self._get(s) != before[name]}
+        # A new scan is dated now, so the closed weeks stay cached
+        self.assertEqual(changed, {'global', 'kerala', 'kerala patient'})
+
+        before = {name: self._get(s) for name, s in scopes.items()}
+        with self.captureOnCommitCallbacks(execute=True):
+            result.delete()
+        changed = {name for name, s in scopes.items() if self._get(s) != before[name]}
+        self.assertEqual(changed, {'global', 'kerala', 'kerala patient', 'history'})
+
+    def test_moving_patient_bumps_both_states(self):
+        profile = _patient('patient-uid')
+        kerala, goa = [response_cache.state_scope('Kerala')], [response_cache.state_scope('Goa')]
+        before = self._get(kerala), self._get(goa)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.state = 'Goa'
+            profile.save()
+        self.assertNotEqual(self._get(kerala), before[0])
+        self.assertNotEqual(self._get(goa), before[1])
+
+
+class DailyStatsTests(TestCase):
+    """Signal-maintained buckets always match a rebuild from scratch."""
+
+    def _buckets(self):
+        return sorted(
+            DailyScreeningStats.objects.exclude(count=0)
+            .values_list('date', 'state', 'city', 'result', 'risk_level', 'count')
+        )
+
+    def assertMatchesRebuild(self):
+        maintained = self._buckets()
+        daily_stats.rebuild()
+        self.assertEqual(maintained, self._buckets())
+
+    def test_signals_keep_buckets_in_step(self):
+        kerala, goa = _patient('kerala-uid'), _patient('goa-uid', state='Goa', city='Panaji')
+        results = [_result(kerala), _result(kerala, 'Positive', 'High'), _result(goa)]
+        self.assertMatchesRebuild()
+        self.assertEqual(daily_stats.screening_totals(state='kerala')['total'], 2)
+
+        results[0].result, results[0].risk_level = 'Positive', 'High'
+        results[0].save()
+        self.assertMatchesRebuild()
+
+        results[1].date_tested = timezone.now() - timedelta(days=3)
+        results[1].save(update_fields=['date_tested'])
+        self.assertMatchesRebuild()
+
+        results[2].confidence_score = 99.0
+        results[2].save(update_fields=['confidence_score'])
+        self.assertMatchesRebuild()
+
+        kerala.state, kerala.city = 'Goa', 'Panaji'
+        kerala.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(daily_stats.screening_totals(state='goa')['total'], 3)
+
+        results[2].delete()
+        self.assertMatchesRebuild()
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class EpidemiologyTests(TestCase):
+    """Places that differ only in letter case are one row, from the summary or from TestResult."""
+
+    def setUp(self):
+        for uid, state, city in [('a', 'Delhi', 'New Delhi'), ('b', 'delhi', 'new delhi'), ('c', 'DELHI', 'New Delhi')]:
+            _result(_patient(uid, state=state, city=city), 'Positive', 'High')
+        _result(_patient('d', state='Goa', city='Panaji'))
+
+    def assertOnePlacePerName(self, report):
+        self.assertEqual([(s['state'].lower(), s['total'], s['positive']) for s in report['states']],
+                         [('delhi', 3, 3), ('goa', 1, 0)])
+        self.assertEqual([(c['state'].lower(), c['city'].lower(), c['total']) for c in report['cities']],
+                         [('delhi', 'new delhi', 3), ('goa', 'panaji', 1)])
+
+    def test_mixed_case_places_grouped_from_summary(self):
+        self.assertOnePlacePerName(epidemiology.report(QueryDict()))
+        self.assertEqual(len(epidemiology.report(QueryDict(), state='delhi')['states']), 1)
+
+    @override_settings(DAILY_STATS_ENABLED=False)
+    def test_mixed_case_places_grouped_from_results(self):
+        self.assertOnePlacePerName(epidemiology.report(QueryDict()))
+        self.assertEqual(len(epidemiology.report(QueryDict(), state='Delhi')['states']), 1)
+
+
+class PublicStatsTests(TestCase):
+    """/api/stats/ counts exactly, and every process agrees on its ETag."""
+
+    def setUp(self):
+        cache.clear()
+        patient = _patient('stats-uid')
+        _result(patient, 'Positive', 'High')
+        _result(patient)
+
+    def test_process_local_cache_reads_the_database(self):
+        public_stats.reconcile()
+        # Saved by another process, whose counter bump this one never sees
+        TestResult.objects.bulk_create([scoring.apply(TestResult(
+            patient=UserProfile.objects.get(), result='Positive', confidence_score=90.0, symptoms_data={}
+        ))])
+        daily_stats.rebuild()
+        with self.assertNumQueries(1):
+            res = APIClient().get('/api/stats/')
+        self.assertEqual(res.json(), {"total_tests": 3, "positive": 2, "negative": 1})
+        self.assertEqual(res['ETag'], public_stats.etag({"total": 3, "positive": 2, "negative": 1}))
+        self.assertEqual(APIClient().get('/api/stats/', HTTP_IF_NONE_MATCH=res['ETag']).status_code, 304)
+
+    @override_settings(PUBLIC_STATS_ALLOW_LOCAL=True)
+    def test_shared_counters_follow_saves(self):
+        self.assertEqual(public_stats.get_counts(), {"total": 2, "positive": 1, "negative": 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            _result(UserProfile.objects.get(), 'Positive', 'High')
+        with self.assertNumQueries(0):
+            self.assertEqual(public_stats.get_counts(), {"total": 3, "positive": 2, "negative": 1})
+
+
+class ReportCacheTests(TestCase):
+    """Downloads revalidate by ETag, and any change to the report's inputs re-renders it."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = report_cache.LocalStore(directory.name)
+        store = mock.patch.object(report_cache, '_store', self.store)
+        store.start()
+        self.addCleanup(store.stop)
+        # xhtml2pdf stays out of the test: each render is a distinct tiny "PDF"
+        render = mock.patch.object(pdf_generator, 'render_report', autospec=True,
+                                   side_effect=lambda result: (io.BytesIO(f'%PDF-{time.time_ns()}'.encode()), True))
+        self.render = render.start()
+        self.addCleanup(render.stop)
+
+        self.profile = _patient('report-uid')
+        self.profile.full_name = 'Asha'
+        self.profile.save()
+        self.result = _result(self.profile, 'Positive', 'High')
+        self.client = APIClient()
+        self.client.force_authenticate(self.profile.user)
+        self.url = f'/api/report/{self.result.pk}/'
+
+    def test_matching_etag_is_a_304_without_rendering(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['ETag'], report_cache.etag(self.result))
+
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], first['ETag'])
+        self.assertEqual(revalidated.content, b'')
+        # A plain re-download comes from the store
+        self.assertEqual(self.client.get(self.url).content, first.content)
+        self.assertEqual(self.render.call_count, 1)
+
+    def assertInvalidates(self, change):
+        first = self.client.get(self.url)
+        change()
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 200)
+        self.assertNotEqual(again['ETag'], first['ETag'])
+        self.assertNotEqual(again.content, first.content)
+        # The stale render is replaced, not kept alongside
+        self.assertEqual(len(self.store.keys(self.result.pk)), 1)
+
+    def test_edited_result_rerenders(self):
+        def edit():
+            self.result.confidence_score = 95.0
+            self.result.save()
+        self.assertInvalidates(edit)
+
+    def test_edited_patient_rerenders(self):
+        def edit():
+            self.profile.full_name = 'Asha Menon'
+            self.profile.save()
+        self.assertInvalidates(edit)
+
+    def test_template_version_bump_rerenders(self):
+        bump = mock.patch.object(pdf_generator, 'REPORT_TEMPLATE_VERSION', pdf_generator.REPORT_TEMPLATE_VERSION + 1)
+        self.addCleanup(bump.stop)
+        self.assertInvalidates(bump.start)
+
+
+class MicroBatcherTests(TestCase):
+
+    def _blocking(self):
+        """A predict_fn that holds its first batch until released; records every batch size."""
+        started, release, sizes = threading.Event(), threading.Event(), []
+
+        def predict(batch):
+            sizes.append(len(batch))
+            if len(sizes) == 1:
+                started.set()
+                release.wait(5)
+            return batch * 2
+
+        return predict, started, release, sizes
+
+    def test_queued_requests_share_a_forward_pass(self):
+        predict, started, release, sizes = self._blocking()
+        batcher = MicroBatcher(predict, max_batch_size=3, max_wait_ms=1000)
+        first = batcher.submit(np.array([[1.0]]))
+        self.assertTrue(started.wait(5))
+        # Queued behind the first; fills a batch of three without waiting out max_wait
+        futures = [batcher.submit(np.array([[float(i)]])) for i in (2, 3, 4)]
+        release.set()
+
+        self.assertEqual(first.result(5).tolist(), [[2.0]])
+        self.assertEqual([f.result(5).tolist() for f in futures], [[[4.0]], [[6.0]], [[8.0]]])
+        self.assertEqual(sizes, [1, 3])
+        self.assertEqual(batcher.stats()['requests'], 4)
+
+    def test_caller_rows_never_split(self):
+        predict, started, release, sizes = self._blocking()
+        batcher = MicroBatcher(predict, max_batch_size=3, max_wait_ms=0)
+        batcher.submit(np.zeros((1, 1)))
+        self.assertTrue(started.wait(5))
+        futures = [batcher.submit(np.zeros((2, 1))) for _ in range(2)]
+        release.set()
+        for future in futures:
+            self.assertEqual(len(future.result(5)), 2)
+        self.assertEqual(sizes, [1, 2, 2])
+
+    def test_error_reaches_every_caller_in_the_batch(self):
+        predict, started, release, sizes = self._blocking()
+
+        def failing(batch):
+            if -1 in batch:
+                raise ValueError('bad batch')
+            return predict(batch)
+
+        batcher = MicroBatcher(failing, max_batch_size=2, max_wait_ms=1000)
+        batcher.submit(np.array([[1.0]]))
+        self.assertTrue(started.wait(5))
+        futures = [batcher.submit(np.array([[-1.0]])), batcher.submit(np.array([[5.0]]))]
+        release.set()
+        for future in futures:
+            with self.assertRaisesRegex(ValueError, 'bad batch'):
+                future.result(5)
+        # The worker keeps serving
+        self.assertEqual(batcher.predict(np.array([[3.0]]), timeout=5).tolist(), [[6.0]])
+
+    def test_lone_request_does_not_wait(self):
+        batcher = MicroBatcher(lambda batch: batch, max_batch_size=16, max_wait_ms=10000)
+        started = time.perf_counter()
+        batcher.predict(np.zeros((1, 1)), timeout=5)
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+
+def _png(shade):
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), (shade, shade, shade)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class _StubModel:
+    """Stands in for EfficientNet: every row is scored [0.1, 0.9] (Positive, High)."""
+
+    def __init__(self, on_predict=None):
+        self.calls = 0
+        self.on_predict = on_predict
+
+    def predict(self, batch, verbose=0):
+        self.calls += 1
+        if self.on_predict:
+            self.on_predict()
+        return np.tile(np.array([[0.1, 0.9]], dtype=np.float32), (len(batch), 1))
+
+
+@override_settings(ML_MODEL_RELOAD_CHECK_SECONDS=0, ML_SERVER_SOCKET=None)
+class StubModelTestCase(TestCase):
+    """Installs stub models in model_registry and a clean prediction cache for each test."""
+
+    def setUp(self):
+        saved = (model_registry._current, model_registry._loaded, model_registry._signature)
+
+        def restore():
+            model_registry._current, model_registry._loaded, model_registry._signature = saved
+        self.addCleanup(restore)
+        prediction_cache.clear()
+        self.addCleanup(prediction_cache.clear)
+
+    def install(self, version, **kwargs):
+        model = _StubModel(**kwargs)
+        model_registry.register_model(model, version)
+        return model
+
+
+class ModelSwapTests(StubModelTestCase):
+
+    def test_predictions_cached_under_the_version_that_ran(self):
+        image = _png(40)
+        # Swapped between the caller reading v1 and the batch running
+        self.install('v1')
+        new = _StubModel()
+        real_load = ml_engine._load_into
+
+        def load_then_swap(image_file, out):
+            real_load(image_file, out)
+            model_registry.register_model(new, 'v2')
+
+        with mock.patch.object(ml_engine, '_load_into', load_then_swap):
+            self.assertEqual(ml_engine.predict_xray(io.BytesIO(image)), ('Positive', 90.0, 'High'))
+
+        self.assertEqual(new.calls, 1)
+        digest = prediction_cache.digest(image)
+        self.assertIsNone(prediction_cache.get(prediction_cache.make_key(digest, 'v1')))
+        self.assertIsNotNone(prediction_cache.get(prediction_cache.make_key(digest, 'v2')))
+
+    def test_tagged_batcher_returns_each_caller_the_tag(self):
+        batcher = MicroBatcher(lambda batch: (batch * 2, 'v7'), max_batch_size=4, max_wait_ms=0, tagged=True)
+        rows, tag = batcher.predict(np.ones((2, 1), dtype=np.float32))
+        self.assertEqual(tag, 'v7')
+        self.assertEqual(rows.tolist(), [[2.0], [2.0]])
+
+
+class PredictionCacheTests(StubModelTestCase):
+    """Repeat uploads skip inference; only real predictions from the current model are reused."""
+
+    def test_repeat_upload_served_from_cache(self):
+        model = self.install('v1')
+        image = _png(80)
+        first = ml_engine.predict_xray(io.BytesIO(image))
+        self.assertEqual(ml_engine.predict_xray(io.BytesIO(image)), first)
+        self.assertEqual(model.calls, 1)
+        # Different bytes are a different key
+        ml_engine.predict_xray(io.BytesIO(_png(81)))
+        self.assertEqual(model.calls, 2)
+
+    def test_model_version_change_misses(self):
+        image = _png(80)
+        self.install('v1')
+        ml_engine.predict_xray(io.BytesIO(image))
+        model = self.install('v2')
+        ml_engine.predict_xray(io.BytesIO(image))
+        self.assertEqual(model.calls, 1)
+
+    def test_dummy_results_not_cached(self):
+        model_registry.register_model(None, 'dummy')
+        self.assertEqual(ml_engine.predict_xray(io.BytesIO(_png(80))), ('Negative', 85.5, 'Low'))
+        self.assertEqual(len(prediction_cache._local), 0)
+
+    def test_error_results_not_cached(self):
+        model = self.install('v1')
+        self.assertEqual(ml_engine.predict_xray(io.BytesIO(b'not an image')), ('Error', 0.0, 'Low'))
+
+        image = _png(80)
+        with mock.patch.object(model, 'predict', side_effect=RuntimeError('boom')):
+            self.assertEqual(ml_engine.predict_xray(io.BytesIO(image)), ('Error', 0.0, 'Low'))
+        self.assertEqual(len(prediction_cache._local), 0)
+
+        self.assertEqual(ml_engine.predict_xray(io.BytesIO(image)), ('Positive', 90.0, 'High'))
+        self.assertEqual(model.calls, 1)
+
+
+class ModelServerTests(StubModelTestCase):
+    """Round trips to run_model_server's socket server, with the stub model behind it."""
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.install('v1')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.socket_path = os.path.join(directory.name, 'model.sock')
+        server = model_server.create_server(self.socket_path)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.addCleanup(setattr, model_server, '_client', None)
+        model_server._client = None
+
+    def test_round_trip(self):
+        client = model_server.ModelServerClient(self.socket_path)
+        self.assertEqual(client.model_version(), 'v1')
+        predictions, version = client.predict(np.zeros((3, 8, 8, 3), dtype=np.float32))
+        self.assertEqual(version, 'v1')
+        np.testing.assert_allclose(predictions, [[0.1, 0.9]] * 3)
+
+    def test_server_error_raised_and_connection_kept(self):
+        client = model_server.ModelServerClient(self.socket_path)
+        with mock.patch.object(self.model, 'predict', side_effect=RuntimeError('boom')):
+            with self.assertRaisesRegex(model_server.ModelServerError, 'inference failed: boom'):
+                client.predict(np.zeros((1, 8, 8, 3), dtype=np.float32))
+        # An 'E' reply isn't a dead socket: the client isn't marked down
+        self.assertEqual(client.predict(np.zeros((1, 8, 8, 3), dtype=np.float32))[1], 'v1')
+
+    def test_predictions_go_through_the_server(self):
+        with override_settings(ML_SERVER_SOCKET=self.socket_path):
+            predict, version = ml_engine._select_engine()
+            self.assertEqual(version, 'v1')
+            real = model_server.ModelServerClient.predict
+            with mock.patch.object(model_server.ModelServerClient, 'predict', autospec=True, side_effect=real) as sent:
+                self.assertEqual(predict(np.zeros((1, 8, 8, 3), dtype=np.float32))[1], 'v1')
+            sent.assert_called_once()
+
+    def test_falls_back_in_process_when_socket_down(self):
+        with override_settings(ML_SERVER_SOCKET=os.path.join(os.path.dirname(self.socket_path), 'missing.sock')):
+            predict, version = ml_engine._select_engine()
+            self.assertIs(predict, ml_engine.predict_in_process)
+            self.assertEqual(version, 'v1')
+            self.assertEqual(ml_engine.predict_xray(io.BytesIO(_png(80))), ('Positive', 90.0, 'High'))
+        self.assertEqual(self.model.calls, 1)
+
+
+class _Upload:
+    name = 'xray.jpg'
+    content_type = 'image/jpeg'
+
+    def read(self):
+        return b'not-really-a-jpeg'
+
+
+def _failing_upload(image_bytes, image_name, content_type):
+    raise ConnectionError('storage down')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class PredictionJobTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='patient-uid', email='patient@example.com')
+        self.profile = UserProfile.objects.create(user=user, role='patient')
+
+    @mock.patch.object(prediction_jobs, 'predict_xray', return_value=('Positive', 91.0, 'High'))
+    def test_async_predict_with_failed_upload(self, _predict):
+        job = prediction_jobs.enqueue(self.profile, _Upload(), {'cough': 'yes'})
+
+        with mock.patch.object(prediction_jobs, 'upload_bytes_to_supabase', _failing_upload):
+            prediction_jobs.process(prediction_jobs.claim_next())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        result = job.test_result
+        self.assertEqual(result.xray_image_url, '')
+        # The upload retry points at the same result
+        retry = PredictionJob.objects.get(kind='upload')
+        self.assertEqual(retry.test_result_id, result.id)
+        self.assertEqual(TestResult.objects.count(), 1)
+
+        with mock.patch.object(prediction_jobs, 'upload_bytes_to_supabase', return_value='https://example.com/x.jpg'):
+            prediction_jobs.process(prediction_jobs.claim_next())
+
+        retry.refresh_from_db()
+        result.refresh_from_db()
+        self.assertEqual(retry.status, 'done')
+        self.assertEqual(result.xray_image_url, 'https://example.com/x.jpg')
+        self.assertEqual(TestResult.objects.count(), 1)
+
+    def test_claim_marks_job_running(self):
+        job = prediction_jobs.enqueue(self.profile, _Upload(), {})
+        claimed = prediction_jobs.claim_next()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, 'running', 1))
+        # A running job belongs to its worker until it goes stale
+        self.assertIsNone(prediction_jobs.claim_next())
+
+    @override_settings(PREDICTION_JOB_STALE_SECONDS=60)
+    def test_stale_running_job_reclaimed(self):
+        job = prediction_jobs.enqueue(self.profile, _Upload(), {})
+        prediction_jobs.claim_next()
+        PredictionJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(seconds=61))
+        claimed = prediction_jobs.claim_next()
+        self.assertEqual((claimed.pk, claimed.attempts), (job.pk, 2))
+
+    def test_retry_waits_for_not_before(self):
+        job = prediction_jobs.enqueue(self.profile, _Upload(), {})
+        PredictionJob.objects.filter(pk=job.pk).update(not_before=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(prediction_jobs.claim_next())
+        PredictionJob.objects.filter(pk=job.pk).update(not_before=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(prediction_jobs.claim_next().pk, job.pk)
+
+    def test_lost_claim_race_returns_none(self):
+        job = prediction_jobs.enqueue(self.profile, _Upload(), {})
+        first = QuerySet.first
+
+        def claimed_by_another_worker(queryset):
+            found = first(queryset)
+            PredictionJob.objects.filter(pk=job.pk).update(status='running', started_at=timezone.now(), attempts=1)
+            return found
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=claimed_by_another_worker):
+            self.assertIsNone(prediction_jobs.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+
+    def test_worker_survives_a_crashing_job(self):
+        job = prediction_jobs.enqueue(self.profile, _Upload(), {})
+        stop = threading.Event()
+        # The second poll finds nothing and stops the loop
+        claims = mock.patch.object(prediction_jobs, 'claim_next', side_effect=[prediction_jobs.claim_next(), None])
+        crash = mock.patch.object(prediction_jobs, 'process', side_effect=RuntimeError('bug'))
+        with claims, crash, mock.patch.object(stop, 'wait', side_effect=lambda timeout: stop.set()):
+            prediction_jobs.run_worker(stop)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('bug', job.error)
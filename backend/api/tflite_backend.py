@@ -0,0 +1,70 @@
+import threading
+
+import numpy as np
+
+
+def _interpreter_class():
+    # Prefer the standalone runtime (a few MB) and fall back to full TensorFlow.
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteModel:
+    """
+    Wraps a TFLite interpreter behind the same `predict(batch)` call as a Keras model,
+    so ml_engine and the micro-batcher don't care which backend is loaded.
+    Handles int8-quantized inputs/outputs and resizes the batch dimension on demand.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        Interpreter = _interpreter_class()
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # Interpreters are not thread-safe; the micro-batcher already serializes
+        # calls, this covers the unbatched path.
+        self._lock = threading.Lock()
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self._resize(len(batch))
+
+            self.interpreter.set_tensor(self._input['index'], self._quantize(batch, self._input))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output['index'])
+            return self._dequantize(output, self._output)
+
+    def _resize(self, batch_size):
+        shape = list(self._input['shape'])
+        shape[0] = batch_size
+        self.interpreter.resize_tensor_input(self._input['index'], shape)
+        self.interpreter.allocate_tensors()
+        # Tensor details (and quantization params) must be re-read after allocation
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    @staticmethod
+    def _quantize(batch, details):
+        if details['dtype'] == np.float32:
+            return batch
+        scale, zero_point = details['quantization']
+        info = np.iinfo(details['dtype'])
+        quantized = np.round(batch / scale + zero_point)
+        return np.clip(quantized, info.min, info.max).astype(details['dtype'])
+
+    @staticmethod
+    def _dequantize(output, details):
+        if details['dtype'] == np.float32:
+            return output
+        scale, zero_point = details['quantization']
+        return (output.astype(np.float32) - zero_point) * scale
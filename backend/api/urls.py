@@ -2,8 +2,11 @@ from django.urls import path
 from .views import (
     UserProfileView, 
     PredictionView, 
+    PredictionJobView,
     PatientHistoryView, 
     DoctorDashboardView, 
+    DoctorExportView,
+    EpidemiologyView,
     DownloadReportView,
     PublicStatsView,
     EmailReportView,
@@ -16,8 +19,11 @@ from .views import (
 urlpatterns = [
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('predict/', PredictionView.as_view(), name='predict'),
+    path('predict/jobs/<int:pk>/', PredictionJobView.as_view(), name='prediction-job'),
     path('history/', PatientHistoryView.as_view(), name='history'),
     path('doctor/dashboard/', DoctorDashboardView.as_view(), name='doctor-dashboard'),
+    path('doctor/export/', DoctorExportView.as_view(), name='doctor-export'),
+    path('doctor/epidemiology/', EpidemiologyView.as_view(), name='doctor-epidemiology'),
     path('report/<int:pk>/', DownloadReportView.as_view(), name='download-report'),
     path('stats/', PublicStatsView.as_view(), name='public-stats'),
     path('email-report/<int:pk>/', EmailReportView.as_view(), name='email-report'),
@@ -1,28 +1,41 @@
 from rest_framework import views, response, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-import json
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.urls import reverse
+from django.utils import timezone
+import io
 import os
 from rest_framework.response import Response
 
 # Added Appointment
-from .models import UserProfile, TestResult, Appointment
+from .models import UserProfile, TestResult, Appointment, PredictionJob
 # Added AppointmentSerializer
 from .serializers import UserProfileSerializer, TestResultSerializer, AppointmentSerializer
-from .ml_engine import predict_xray
-from .storage import upload_to_supabase
-from .pdf_generator import generate_medical_pdf 
+from . import daily_stats, epidemiology, exports, listings, pagination, prediction_jobs, public_stats, report_cache, response_cache
+from .filters import filter_results, result_filters, result_ordering
+from .roles import get_profile, is_doctor
 # Added send_appointment_status_email
 from .email_utils import send_html_email, get_medical_email_template, send_appointment_status_email
 
+# Upper bound for ?wait= long-polling on prediction jobs
+MAX_JOB_WAIT_SECONDS = 30
+# Longest weekly trend the epidemiology view returns
+MAX_EPIDEMIOLOGY_WEEKS = 104
+
 class UserProfileView(views.APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
         user = request.user
         data = request.data
-        profile, created = UserProfile.objects.get_or_create(user=user)
+        # Already attached by authentication; only a first-time profile hits the DB
+        profile = get_profile(user)
+        if profile is None:
+            profile, created = UserProfile.objects.get_or_create(user=user)
         
         current_role = str(profile.role).strip().lower() if profile.role else ""
         requested_role = data.get('role', 'patient').strip().lower()
@@ -78,36 +91,61 @@ class PredictionView(views.APIView):
         if not image_file:
             return response.Response({"error": "No image provided"}, status=400)
 
-        try:
-            image_url = upload_to_supabase(image_file)
-        except Exception as e:
-            return response.Response({"error": f"Image upload failed: {str(e)}"}, status=500)
-        
-        image_file.seek(0)
-        result, confidence, risk_level = predict_xray(image_file)
-        
-        test_record = TestResult.objects.create(
-            patient=user_profile,
-            xray_image_url=image_url,
-            result=result,
-            confidence_score=confidence,
-            risk_level=risk_level,
-            symptoms_data=json.loads(symptoms) if isinstance(symptoms, str) else symptoms
+        # mode=async: persist the job and let run_prediction_workers process it
+        mode = request.data.get('mode') or request.query_params.get('mode')
+        if mode == 'async':
+            job = prediction_jobs.enqueue(user_profile, image_file, prediction_jobs.parse_symptoms(symptoms))
+            return response.Response({
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": reverse('prediction-job', args=[job.id]),
+            }, status=status.HTTP_202_ACCEPTED)
+
+        # Read once; storage upload and inference then run concurrently
+        test_record = prediction_jobs.run_prediction(
+            user_profile,
+            image_file.read(),
+            image_file.name,
+            image_file.content_type,
+            prediction_jobs.parse_symptoms(symptoms)
         )
         
         return response.Response(TestResultSerializer(test_record).data)
 
+class PredictionJobView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = get_object_or_404(PredictionJob.objects.defer('image_data'), pk=pk, patient__user=request.user)
+
+        # ?wait=N long-polls up to N seconds for the job to finish
+        try:
+            wait = min(float(request.query_params.get('wait', 0)), MAX_JOB_WAIT_SECONDS)
+        except ValueError:
+            wait = 0
+        if wait > 0:
+            job = prediction_jobs.wait_for(job, wait)
+
+        data = {"job_id": job.id, "status": job.status}
+        if job.status == 'done' and job.test_result_id:
+            data["result"] = TestResultSerializer(job.test_result).data
+        elif job.status == 'failed':
+            data["error"] = job.error
+        return response.Response(data)
+
 class EmailReportView(views.APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
         try:
-            if hasattr(request.user, 'profile') and request.user.profile.role == 'doctor':
-                test_result = get_object_or_404(TestResult, pk=pk)
+            results = TestResult.objects.select_related('patient__user')
+            if is_doctor(request.user):
+                test_result = get_object_or_404(results, pk=pk)
             else:
-                test_result = get_object_or_404(TestResult, pk=pk, patient__user=request.user)
+                test_result = get_object_or_404(results, pk=pk, patient__user=request.user)
             
-            pdf_buffer = generate_medical_pdf(test_result)
+            # Same stored PDF as the download
+            pdf_buffer = io.BytesIO(report_cache.get_report(test_result))
             
             patient_name = test_result.patient.full_name or request.user.username
             date_str = test_result.date_tested.strftime('%B %d, %Y')
@@ -139,13 +177,32 @@ class PatientHistoryView(views.APIView):
     def get(self, request):
         try:
             profile = request.user.profile
-            results = TestResult.objects.filter(patient=profile).order_by('-date_tested')
-            return response.Response(TestResultSerializer(results, many=True).data)
+            # Cached per patient until one of their results or their profile changes
+            data = response_cache.get_or_build(
+                'history', [response_cache.patient_scope(profile.id)], request.query_params,
+                lambda: self._history(request, profile)
+            )
+            return response.Response(data)
         except UserProfile.DoesNotExist:
             return response.Response({"error": "Profile not found"}, status=404)
+        except ValidationError:
+            # Bad ?cursor= / ?page_size= is a 400, not a server error
+            raise
         except Exception as e:
             return response.Response({"error": str(e)}, status=500)
 
+    def _history(self, request, profile):
+        # Flat values() rows; same JSON as TestResultSerializer in one query
+        results = listings.result_rows(TestResult.objects.filter(patient=profile).order_by('-date_tested'))
+        # ?cursor= / ?page_size= opt into {"results", "next_cursor"}; a plain GET keeps the full list
+        if pagination.is_requested(request):
+            page, next_cursor = pagination.paginate(results, request, 'date_tested')
+            return {
+                "results": listings.listing(page),
+                "next_cursor": next_cursor
+            }
+        return listings.listing(results)
+
 class DoctorDashboardView(views.APIView):
     permission_classes = [IsAuthenticated]
     
@@ -157,41 +214,104 @@ class DoctorDashboardView(views.APIView):
         except UserProfile.DoesNotExist:
             return response.Response({"error": "Profile not found"}, status=404)
             
-        state_filter = request.query_params.get('state', 'all')
-        queryset = TestResult.objects.all().select_related('patient').order_by('-date_tested')
-        
-        if state_filter != 'all':
-            queryset = queryset.filter(patient__state__iexact=state_filter)
-            
-        return response.Response({
-            "doctor_name": profile.full_name,
+        # ?state= ?city= ?result= ?risk= ?gender= ?age_min= ?age_max= ?q= ?date_from= ?date_to=
+        # and ?sort= (see filters.result_filters / result_ordering)
+        filters = result_filters(request.query_params)
+        ordering = result_ordering(request.query_params)
+        # Shared by all doctors; a ?state= view only goes stale when that state changes
+        scope = response_cache.state_scope(filters['state']) if 'state' in filters else response_cache.GLOBAL
+        data = response_cache.get_or_build(
+            'dashboard', [scope], request.query_params, lambda: self._dashboard(request, filters, ordering)
+        )
+        return response.Response({"doctor_name": profile.full_name, **data})
+
+    def _dashboard(self, request, filters, ordering):
+        queryset = filter_results(TestResult.objects.all(), filters)
+
+        # Records are paged (newest first unless ?sort=); stats cover the whole filter
+        field, descending = ordering
+        records, next_cursor = pagination.paginate(
+            listings.result_rows(queryset), request, field, descending=descending
+        )
+
+        return {
             "stats": {
-                "total": queryset.count(),
-                "positive": queryset.filter(result='Positive').count(),
-                "negative": queryset.filter(result='Negative').count(),
+                **daily_stats.screening_totals(**filters),
                 "underReview": 0 
             },
-            "records": TestResultSerializer(queryset, many=True).data
-        })
+            "records": listings.listing(records),
+            "next_cursor": next_cursor
+        }
+
+class DoctorExportView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not is_doctor(request.user):
+            return response.Response({"error": "Unauthorized"}, status=403)
+
+        # ?type= rather than ?format=, which DRF reserves for renderer selection
+        export_type = request.query_params.get('type', 'ndjson').lower()
+        if export_type not in exports.CONTENT_TYPES:
+            return response.Response({"error": "type must be ndjson or csv"}, status=400)
+
+        # Same filters as the dashboard; streamed in date order, never held in memory
+        queryset = filter_results(TestResult.objects.all(), result_filters(request.query_params))
+        queryset = queryset.order_by('-date_tested', '-id')
+
+        stream = StreamingHttpResponse(
+            exports.stream(queryset, export_type),
+            content_type=exports.CONTENT_TYPES[export_type]
+        )
+        filename = f"RespireX_Export_{timezone.localdate():%Y%m%d}.{export_type}"
+        stream['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return stream
+
+class EpidemiologyView(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not is_doctor(request.user):
+            return response.Response({"error": "Unauthorized"}, status=403)
+
+        # ?state= narrows to one state's cities; ?weeks= is the trend length
+        state = (request.query_params.get('state') or 'all').strip()
+        try:
+            weeks = int(request.query_params.get('weeks', 12))
+        except (TypeError, ValueError):
+            weeks = 0
+        if not 1 <= weeks <= MAX_EPIDEMIOLOGY_WEEKS:
+            return response.Response({"error": f"weeks must be 1-{MAX_EPIDEMIOLOGY_WEEKS}"}, status=400)
+
+        state = None if state.lower() == 'all' else state
+        return response.Response(epidemiology.report(request.query_params, state=state, weeks=weeks))
 
 class DownloadReportView(views.APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
         try:
-            if hasattr(request.user, 'profile') and request.user.profile.role == 'doctor':
-                test_result = get_object_or_404(TestResult, pk=pk)
+            # Patient and account are read for the report's fingerprint and header
+            results = TestResult.objects.select_related('patient__user')
+            if is_doctor(request.user):
+                test_result = get_object_or_404(results, pk=pk)
             else:
-                test_result = get_object_or_404(TestResult, pk=pk, patient__user=request.user)
-                
-            pdf_buffer = generate_medical_pdf(test_result)
-            
-            filename = f"RespireX_Report_{test_result.id}.pdf"
-            response = HttpResponse(pdf_buffer, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+                test_result = get_object_or_404(results, pk=pk, patient__user=request.user)
+
+            # Reports never change for the same inputs; a matching ETag skips the PDF entirely
+            etag = report_cache.etag(test_result)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                filename = f"RespireX_Report_{test_result.id}.pdf"
+                response = HttpResponse(report_cache.get_report(test_result), content_type='application/pdf')
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
             
             return response
             
+        except Http404:
+            raise
         except Exception as e:
             return Response({"error": "Failed to generate report"}, status=500)
 
@@ -199,8 +319,17 @@ class PublicStatsView(views.APIView):
     permission_classes = [AllowAny] 
 
     def get(self, request):
-        total_count = TestResult.objects.count()
-        return response.Response({"total_tests": total_count})
+        # Shared counters, or one aggregate without a shared cache; browsers and CDNs revalidate with If-None-Match
+        counts = public_stats.get_counts()
+        res = response.Response({
+            "total_tests": counts["total"],
+            "positive": counts["positive"],
+            "negative": counts["negative"],
+        })
+        res['ETag'] = public_stats.etag(counts)
+        patch_cache_control(res, public=True, max_age=getattr(settings, 'PUBLIC_STATS_MAX_AGE', 60))
+        # A 304 carrying the same ETag and Cache-Control when the client's copy is current
+        return get_conditional_response(request, etag=res['ETag'], response=res)
 
 # --- APPOINTMENT SYSTEM VIEWS ---
 
@@ -217,11 +346,19 @@ class AppointmentView(views.APIView):
     def get(self, request):
         try:
             profile = request.user.profile
+            # The serializer reads both profiles and the patient's email
+            appointments = Appointment.objects.select_related('patient__user', 'doctor')
             if profile.role == 'doctor':
-                appointments = Appointment.objects.filter(doctor=profile).order_by('date_time')
+                appointments = appointments.filter(doctor=profile).order_by('date_time')
             else:
-                appointments = Appointment.objects.filter(patient=profile).order_by('date_time')
-            
+                appointments = appointments.filter(patient=profile).order_by('date_time')
+
+            if pagination.is_requested(request):
+                page, next_cursor = pagination.paginate(appointments, request, 'date_time', descending=False)
+                return response.Response({
+                    "results": AppointmentSerializer(page, many=True).data,
+                    "next_cursor": next_cursor
+                })
             return response.Response(AppointmentSerializer(appointments, many=True).data)
         except UserProfile.DoesNotExist:
             return response.Response({"error": "Profile not found"}, status=404)
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', # Must be at top
+    'api.instrumentation.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -92,6 +93,132 @@ CORS_ALLOW_ALL_ORIGINS = True # For development
 # Supabase Settings
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+# One pooled client per process (api/supabase_client.py), shared by auth and storage
+SUPABASE_POOL_SIZE = int(os.getenv('SUPABASE_POOL_SIZE', '10'))
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', '10'))
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '5'))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', '30'))
+
+# Access tokens are verified locally: HS256 with the project's JWT secret, or
+# ES256/RS256 against the JWKS (default: SUPABASE_URL/auth/v1/.well-known/jwks.json).
+# If neither is available, fall back to asking Supabase (auth.get_user).
+SUPABASE_JWT_VERIFY_LOCALLY = os.getenv('SUPABASE_JWT_VERIFY_LOCALLY', 'True') == 'True'
+SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET') or None
+SUPABASE_JWKS_URL = os.getenv('SUPABASE_JWKS_URL') or None
+SUPABASE_JWT_AUDIENCE = os.getenv('SUPABASE_JWT_AUDIENCE', 'authenticated')
+SUPABASE_AUTH_REMOTE_FALLBACK = os.getenv('SUPABASE_AUTH_REMOTE_FALLBACK', 'True') == 'True'
+# Resolved users are cached per token (bounded, never past the token's exp)
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', '4096'))
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', '300'))
+# User + profile pairs, kept in the shared cache under per-user versions that
+# profile saves bump (see api/authentication.py). Like the response cache, a
+# local-memory alias is refused unless AUTH_USER_CACHE_ALLOW_LOCAL (single process only).
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '30'))
+AUTH_USER_CACHE_ALIAS = os.getenv('AUTH_USER_CACHE_ALIAS', 'default')
+AUTH_USER_CACHE_ALLOW_LOCAL = os.getenv('AUTH_USER_CACHE_ALLOW_LOCAL', 'False') == 'True'
+
+# ML Inference Settings
+# Concurrent /predict/ requests are grouped into one forward pass; tune the wait
+# window against p99 latency using ml_engine.get_batching_stats(). A lone
+# request (always the case with sync gunicorn workers) runs without waiting.
+ML_BATCHING_ENABLED = os.getenv('ML_BATCHING_ENABLED', 'True') == 'True'
+ML_BATCH_MAX_SIZE = int(os.getenv('ML_BATCH_MAX_SIZE', '16'))
+ML_BATCH_MAX_WAIT_MS = float(os.getenv('ML_BATCH_MAX_WAIT_MS', '10'))
+# Inference backend: 'keras' (model/efficientnet_b0.h5) or 'tflite' (quantized,
+# see `manage.py convert_tflite`). ML_NUM_THREADS caps intra-op CPU threads.
+ML_BACKEND = os.getenv('ML_BACKEND', 'keras')
+ML_TFLITE_MODEL_PATH = os.getenv('ML_TFLITE_MODEL_PATH') or None
+ML_NUM_THREADS = int(os.getenv('ML_NUM_THREADS', '0')) or None
+
+# Optional shared model server (`manage.py run_model_server`). When set, web
+# workers send preprocessed tensors to it instead of loading their own model,
+# falling back to in-process inference if it is unreachable.
+ML_SERVER_SOCKET = os.getenv('ML_SERVER_SOCKET') or None
+ML_SERVER_TIMEOUT = float(os.getenv('ML_SERVER_TIMEOUT', '30'))
+
+# How often (seconds) to check whether the weights file was swapped; 0 disables
+ML_MODEL_RELOAD_CHECK_SECONDS = int(os.getenv('ML_MODEL_RELOAD_CHECK_SECONDS', '30'))
+
+# Prediction cache for re-uploaded images, keyed by image digest + model version.
+# Set ML_PREDICTION_CACHE_SHARED_ALIAS to a CACHES alias (e.g. 'default' with
+# REDIS_URL) to share hits across gunicorn workers.
+ML_PREDICTION_CACHE_ENABLED = os.getenv('ML_PREDICTION_CACHE_ENABLED', 'True') == 'True'
+ML_PREDICTION_CACHE_SIZE = int(os.getenv('ML_PREDICTION_CACHE_SIZE', '1024'))
+ML_PREDICTION_CACHE_TTL = int(os.getenv('ML_PREDICTION_CACHE_TTL', '3600'))
+ML_PREDICTION_CACHE_SHARED_ALIAS = os.getenv('ML_PREDICTION_CACHE_SHARED_ALIAS') or None
+
+# Cache
+# Local memory by default; set REDIS_URL to share the cache across workers.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Storage upload runs alongside inference on a bounded I/O pool. If it fails or
+# exceeds the timeout, the prediction is still saved and the upload finished later.
+PREDICTION_IO_WORKERS = int(os.getenv('PREDICTION_IO_WORKERS', '4'))
+PREDICTION_UPLOAD_TIMEOUT = float(os.getenv('PREDICTION_UPLOAD_TIMEOUT', '15'))
+
+# Async prediction jobs (POST /api/predict/ with mode=async, processed by
+# `manage.py run_prediction_workers`)
+PREDICTION_JOB_MAX_ATTEMPTS = int(os.getenv('PREDICTION_JOB_MAX_ATTEMPTS', '3'))
+# A running job whose worker hasn't finished within this many seconds is re-claimed
+PREDICTION_JOB_STALE_SECONDS = int(os.getenv('PREDICTION_JOB_STALE_SECONDS', '300'))
+# Failed attempts are retried after PREDICTION_JOB_RETRY_DELAY seconds, doubling
+# each time up to PREDICTION_JOB_MAX_RETRY_DELAY
+PREDICTION_JOB_RETRY_DELAY = int(os.getenv('PREDICTION_JOB_RETRY_DELAY', '10'))
+PREDICTION_JOB_MAX_RETRY_DELAY = int(os.getenv('PREDICTION_JOB_MAX_RETRY_DELAY', '600'))
+
+# Per-phase timing spans: Server-Timing response header and Prometheus /metrics
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'False') == 'True'
+
+# Keyset pagination for the dashboard, history and appointment lists
+PAGINATION_PAGE_SIZE = int(os.getenv('PAGINATION_PAGE_SIZE', '50'))
+PAGINATION_MAX_PAGE_SIZE = int(os.getenv('PAGINATION_MAX_PAGE_SIZE', '200'))
+
+# Rows fetched per round trip when streaming /api/doctor/export/
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Dashboard/public totals read the DailyScreeningStats summary table; when off,
+# they're one conditional-aggregation query over TestResult (and the table isn't
+# maintained; run rebuild_daily_stats before turning it back on)
+DAILY_STATS_ENABLED = os.getenv('DAILY_STATS_ENABLED', 'True') == 'True'
+
+# /api/stats/ counters are kept in the shared cache and recomputed from the database
+# once they are this many seconds old; responses may be cached for PUBLIC_STATS_MAX_AGE.
+# Without a shared cache (REDIS_URL) each read is one aggregate query, unless
+# PUBLIC_STATS_ALLOW_LOCAL (single process only).
+PUBLIC_STATS_RECONCILE_SECONDS = int(os.getenv('PUBLIC_STATS_RECONCILE_SECONDS', '300'))
+PUBLIC_STATS_ALLOW_LOCAL = os.getenv('PUBLIC_STATS_ALLOW_LOCAL', 'False') == 'True'
+PUBLIC_STATS_MAX_AGE = int(os.getenv('PUBLIC_STATS_MAX_AGE', '60'))
+
+# Dashboard and history responses, cached under per-scope versions that result
+# and profile saves bump (see api/response_cache.py). The versions have to be
+# shared by every process, so it's on by default only with REDIS_URL; a
+# local-memory alias is refused unless RESPONSE_CACHE_ALLOW_LOCAL (single process only).
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True' if os.getenv('REDIS_URL') else 'False') == 'True'
+RESPONSE_CACHE_ALLOW_LOCAL = os.getenv('RESPONSE_CACHE_ALLOW_LOCAL', 'False') == 'True'
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '300'))
+# Closed weeks of /api/doctor/epidemiology/ only change through writes that bump
+# their version, so they can be kept much longer
+EPIDEMIOLOGY_HISTORY_TTL = int(os.getenv('EPIDEMIOLOGY_HISTORY_TTL', '86400'))
+
+# Rendered PDF reports (see api/report_cache.py): 'local' keeps them in
+# REPORT_CACHE_DIR, 'supabase' in the private REPORT_CACHE_BUCKET bucket
+REPORT_CACHE_ENABLED = os.getenv('REPORT_CACHE_ENABLED', 'True') == 'True'
+REPORT_CACHE_BACKEND = os.getenv('REPORT_CACHE_BACKEND', 'local')
+REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', os.path.join(BASE_DIR, 'report_cache'))
+REPORT_CACHE_BUCKET = os.getenv('REPORT_CACHE_BUCKET', 'reports')
 
 # DRF Config
 REST_FRAMEWORK = {
@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from api.instrumentation import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    # Prometheus scrape target (404 unless INSTRUMENTATION_ENABLED)
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'respirex_backend.settings')
 
 application = get_wsgi_application()
+
+# Optional: load the X-ray model and trace its graph before the first request
+# instead of during it. Runs once per worker process.
+if os.getenv('ML_WARMUP_ON_START', 'False') == 'True':
+    from api.model_registry import warmup
+    warmup()
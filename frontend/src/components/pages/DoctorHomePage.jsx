@@ -111,6 +111,8 @@ const DoctorHomePage = ({ onNavigate, onLogout, user, darkMode, toggleTheme }) =
   const [selectedState, setSelectedState] = useState('all');
   const [stats, setStats] = useState({ total: 0, positive: 0, negative: 0, underReview: 0 });
   const [patients, setPatients] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [selectedPatient, setSelectedPatient] = useState(null);
   const [doctorName, setDoctorName] = useState('');
@@ -137,41 +139,46 @@ const DoctorHomePage = ({ onNavigate, onLogout, user, darkMode, toggleTheme }) =
     fetchProfile();
   }, []);
 
+  const stateParam = selectedState === 'All States' ? 'all' : selectedState;
+
+  // Dashboard records are keyset-paginated: follow next_cursor until it is null
+  const mapRecord = (record) => {
+    const confidence = record.confidence_score ? Math.round(record.confidence_score) : 0;
+    let calculatedRisk = record.risk_level;
+    if (record.result === 'Positive') {
+      if (confidence > 80) calculatedRisk = 'High';
+      else if (confidence >= 50) calculatedRisk = 'Medium';
+      else calculatedRisk = 'Low';
+    } else {
+      calculatedRisk = 'Low';
+    }
+    return {
+      id: record.id,
+      name: record.patient_name || record.full_name || "Unknown Patient", 
+      age: record.age || "N/A",
+      gender: record.gender || "N/A",
+      state: record.state || "",
+      city: record.city || "",
+      address: record.address || record.street_address || "", 
+      email: record.email || record.patient_email || "Not provided", 
+      phone: record.phone || record.phone_number || record.contact || "Not provided",
+      lastTest: new Date(record.date_tested).toLocaleDateString('en-US', {
+        year: 'numeric', month: 'long', day: 'numeric'
+      }),
+      result: record.result,
+      riskLevel: calculatedRisk,
+      confidence: confidence
+    };
+  };
+
   useEffect(() => {
     const fetchData = async () => {
       setLoading(true);
       try {
-        const response = await api.get(`/doctor/dashboard/?state=${selectedState === 'All States' ? 'all' : selectedState}`);
+        const response = await api.get(`/doctor/dashboard/?state=${stateParam}`);
         setStats(response.data.stats);
-        const mappedPatients = response.data.records.map(record => {
-          const confidence = record.confidence_score ? Math.round(record.confidence_score) : 0;
-          let calculatedRisk = record.risk_level;
-          if (record.result === 'Positive') {
-            if (confidence > 80) calculatedRisk = 'High';
-            else if (confidence >= 50) calculatedRisk = 'Medium';
-            else calculatedRisk = 'Low';
-          } else {
-            calculatedRisk = 'Low';
-          }
-          return {
-            id: record.id,
-            name: record.patient_name || record.full_name || "Unknown Patient", 
-            age: record.age || "N/A",
-            gender: record.gender || "N/A",
-            state: record.state || "",
-            city: record.city || "",
-            address: record.address || record.street_address || "", 
-            email: record.email || record.patient_email || "Not provided", 
-            phone: record.phone || record.phone_number || record.contact || "Not provided",
-            lastTest: new Date(record.date_tested).toLocaleDateString('en-US', {
-              year: 'numeric', month: 'long', day: 'numeric'
-            }),
-            result: record.result,
-            riskLevel: calculatedRisk,
-            confidence: confidence
-          };
-        });
-        setPatients(mappedPatients);
+        setPatients(response.data.records.map(mapRecord));
+        setNextCursor(response.data.next_cursor);
       } catch (err) {
         console.error("Failed to load dashboard:", err);
       } finally {
@@ -181,6 +188,20 @@ const DoctorHomePage = ({ onNavigate, onLogout, user, darkMode, toggleTheme }) =
     fetchData();
   }, [selectedState]);
 
+  const loadMoreRecords = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get(`/doctor/dashboard/?state=${stateParam}&cursor=${encodeURIComponent(nextCursor)}`);
+      setPatients(prev => [...prev, ...response.data.records.map(mapRecord)]);
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      console.error("Failed to load more records:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     if (activeTab === 'appointments') fetchAppointments();
   }, [activeTab]);
@@ -330,6 +351,13 @@ const DoctorHomePage = ({ onNavigate, onLogout, user, darkMode, toggleTheme }) =
                                     </div>
                                 </div>
                             ))}
+                            {nextCursor && (
+                                <div className="p-4 text-center">
+                                    <button onClick={loadMoreRecords} disabled={loadingMore} className="px-4 py-2 border border-gray-200 dark:border-gray-600 rounded-lg text-sm font-medium hover:bg-gray-100 dark:hover:bg-gray-700 text-gray-700 dark:text-gray-300 transition disabled:opacity-50">
+                                        {loadingMore ? 'Loading...' : 'Load More'}
+                                    </button>
+                                </div>
+                            )}
                         </div>
                     )}
                 </div>